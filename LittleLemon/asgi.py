@@ -1,16 +1,23 @@
-"""
-ASGI config for LittleLemon project.
-
-It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
-"""
-
-import os
-
-from django.core.asgi import get_asgi_application
-
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
-
-application = get_asgi_application()
+"""
+ASGI config for LittleLemon project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
+# Read endpoints with an async view run it on the event loop (ASYNC_READ_VIEWS in settings.py)
+os.environ.setdefault("LITTLELEMON_ASYNC_VIEWS", "1")
+
+application = get_asgi_application()
+
+# Warm the worker up before it serves its first request, when LITTLELEMON_WARMUP=1 (WARMUP_ON_START in settings.py)
+from LittleLemonAPI.warmup import warm_up_on_start  # noqa: E402
+
+warm_up_on_start()
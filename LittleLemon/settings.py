@@ -1,144 +1,264 @@
-"""
-Django settings for LittleLemon project.
-
-Generated by 'django-admin startproject' using Django 4.1.6.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.1/topics/settings/
-
-For the full list of settings and their values, see
-https://docs.djangoproject.com/en/4.1/ref/settings/
-"""
-
-from pathlib import Path
-
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-
-# Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/4.1/howto/deployment/checklist/
-
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-_k#wyz3j=#-cecq(myr!n=p*6zh1ogdk@kfad_=$^)9p)1)9d!"
-
-# SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
-
-ALLOWED_HOSTS = []
-
-
-# Application definition
-
-INSTALLED_APPS = [
-    "django.contrib.admin",
-    "django.contrib.auth",
-    "django.contrib.contenttypes",
-    "django.contrib.sessions",
-    "django.contrib.messages",
-    "django.contrib.staticfiles",
-    "djoser", # add djoser app
-    "rest_framework", # add rest framework
-    "rest_framework.authtoken", # add token-base auth
-    "LittleLemonAPI", # add API app
-]
-
-MIDDLEWARE = [
-    "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
-]
-
-ROOT_URLCONF = "LittleLemon.urls"
-
-TEMPLATES = [
-    {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
-        "APP_DIRS": True,
-        "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.debug",
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
-            ],
-        },
-    },
-]
-
-WSGI_APPLICATION = "LittleLemon.wsgi.application"
-
-
-# Database
-# https://docs.djangoproject.com/en/4.1/ref/settings/#databases
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
-
-
-# Password validation
-# https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
-
-AUTH_PASSWORD_VALIDATORS = [
-    {
-        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
-    },
-    {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",},
-    {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",},
-    {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",},
-]
-
-
-# Internationalization
-# https://docs.djangoproject.com/en/4.1/topics/i18n/
-
-LANGUAGE_CODE = "en-us"
-
-TIME_ZONE = "UTC"
-
-USE_I18N = True
-
-USE_TZ = True
-
-
-# Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/4.1/howto/static-files/
-
-STATIC_URL = "static/"
-
-# Default primary key field type
-# https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
-
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
-
-# Add the TokenAuthentication class in the DEFAULT_AUTHENTICATION_CLASSES
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-    ),
-    'DEFAULT_FILTER_CLASSES' : [
-        'rest_framework.filters.OrderingFilter',
-        'rest_framework.filters.SearchFilter',
-    ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 2,
-    'DEFAULT_THROTTLE_RATES' : {
-        "anon" : "10/minute",
-        "user" : "20/minute",
-        "one": "1/minute",
-    }
-}
-
-# Create a section called DJOSER and add the user_id_field (key) and username (value)
-DJOSER = {
-    "USER_ID_FIELD": "username",    
-}
\ No newline at end of file
+"""
+Django settings for LittleLemon project.
+
+Generated by 'django-admin startproject' using Django 4.1.6.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/4.1/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/4.1/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = "django-insecure-_k#wyz3j=#-cecq(myr!n=p*6zh1ogdk@kfad_=$^)9p)1)9d!"
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "djoser", # add djoser app
+    "rest_framework", # add rest framework
+    "rest_framework.authtoken", # add token-base auth
+    "LittleLemonAPI", # add API app
+]
+
+MIDDLEWARE = [
+    "LittleLemonAPI.timing.ServerTimingMiddleware", # first, so its total covers the other middleware
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+ROOT_URLCONF = "LittleLemon.urls"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = "LittleLemon.wsgi.application"
+
+
+# Database
+# https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    }
+}
+
+# Database profile, "development" (the defaults above) or "production".
+# Select it with the LITTLELEMON_DB_PROFILE environment variable.
+DB_PROFILE = os.environ.get("LITTLELEMON_DB_PROFILE", "development")
+
+# PRAGMAs run on every new SQLite connection (see LittleLemonAPI/db.py)
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == "production":
+    # Keep connections open between requests instead of reconnecting every time
+    DATABASES["default"]["CONN_MAX_AGE"] = 600
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL", # readers no longer block the writer (and vice versa)
+        "synchronous": "NORMAL", # safe with WAL, fsync only at checkpoints
+        "cache_size": -64000, # 64 MB page cache per connection
+        "mmap_size": 268435456, # read the first 256 MB through memory mapping
+        "busy_timeout": 5000, # wait up to 5 s for a lock instead of failing
+        "temp_store": "MEMORY",
+    }
+    # Start transactions with BEGIN IMMEDIATE instead of a deferred BEGIN (Django 5.1+). A deferred
+    # transaction only takes the write lock at its first write, and when another connection wrote
+    # in the meantime the upgrade fails straight away with "database is locked", busy_timeout or
+    # not. An immediate one waits for the write lock (up to busy_timeout) before doing anything.
+    # The cost: every atomic() block takes the write lock up front, read-only ones included, so
+    # a read-only atomic() queues behind the writers (and blocks them). Every atomic() in
+    # LittleLemonAPI writes, keep read-only work out of atomic(). Queries outside atomic()
+    # (autocommit, all the API reads) are not affected, and WAL lets them run next to a writer.
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE"}
+
+# Read replica for the menu item, category and order listings (see LittleLemonAPI/replica.py),
+# switched on with LITTLELEMON_READ_REPLICA=1. A copy of the database file, which
+# `manage.py sync_replica` keeps up to date, stands in for it.
+READ_REPLICA = os.environ.get("LITTLELEMON_READ_REPLICA") == "1"
+if READ_REPLICA:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": BASE_DIR / "db-replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["LittleLemonAPI.replica.ReplicaRouter"]
+# File shared by the workers with the time of the replica's last sync and of the users' last writes
+REPLICA_STATE_PATH = BASE_DIR / "replica-state.sqlite3"
+# Seconds a user's reads stay on the primary after they wrote to their cart or orders
+REPLICA_STICKY_SECONDS = 5
+# Reads go back to the primary when the replica's last sync is older than this (seconds)
+REPLICA_MAX_LAG = 30
+
+
+# Password validation
+# https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+    },
+    {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",},
+    {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",},
+    {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",},
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/4.1/topics/i18n/
+
+LANGUAGE_CODE = "en-us"
+
+TIME_ZONE = "UTC"
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/4.1/howto/static-files/
+
+STATIC_URL = "static/"
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Add the TokenAuthentication class in the DEFAULT_AUTHENTICATION_CLASSES
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_FILTER_CLASSES' : [
+        'rest_framework.filters.OrderingFilter',
+        'rest_framework.filters.SearchFilter',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 2,
+    'DEFAULT_THROTTLE_RATES' : {
+        "anon" : "10/minute",
+        "user" : "20/minute",
+        "one": "1/minute",
+        "not_modified": "120/minute", # conditional GETs answered 304, instead of the view's throttles
+    }
+}
+
+# Create a section called DJOSER and add the user_id_field (key) and username (value)
+DJOSER = {
+    "USER_ID_FIELD": "username",    
+}
+
+# Seconds a user's group set is cached across requests (see LittleLemonAPI/roles.py)
+ROLE_CACHE_TIMEOUT = 60
+
+
+# Seconds a rendered menu-items / categories response is cached (see LittleLemonAPI/catalog.py)
+CATALOG_CACHE_TIMEOUT = 300
+
+# SQLite file holding the cache versions shared by all worker processes, a write bumps them to
+# make the entries cached by every process stale at once (see LittleLemonAPI/versions.py)
+VERSION_STORE_PATH = BASE_DIR / "versions.sqlite3"
+
+# Pre-rendered menu items kept per process, enough for the whole catalog (see LittleLemonAPI/fragments.py)
+FRAGMENT_CACHE_SIZE = 20000
+
+
+# Serve the GET of the menu-items, categories, cart and orders lists from async views
+# (see LittleLemonAPI/asyncviews.py). asgi.py switches this on, under WSGI the sync views are used.
+ASYNC_READ_VIEWS = os.environ.get("LITTLELEMON_ASYNC_VIEWS") == "1"
+
+
+# Largest page a client may ask for with ?page_size= in keyset pagination mode
+KEYSET_MAX_PAGE_SIZE = 100
+
+
+# SQLite file holding the throttle token buckets shared by all worker processes (see LittleLemonAPI/throttles.py)
+THROTTLE_STORE_PATH = BASE_DIR / "throttle.sqlite3"
+
+
+# Seconds a resolved auth token is cached and the maximum number of cached tokens (see LittleLemonAPI/authentication.py)
+TOKEN_CACHE_TIMEOUT = 30
+TOKEN_CACHE_SIZE = 10000
+
+
+# Server-Timing header on the API responses, and the buffer of slow request traces at /api/debug/traces:
+# requests slower than SERVER_TIMING_SLOW_MS milliseconds are kept at SERVER_TIMING_SAMPLE_RATE,
+# the newest SERVER_TIMING_BUFFER_SIZE of them per process (see LittleLemonAPI/timing.py)
+SERVER_TIMING = True
+SERVER_TIMING_SLOW_MS = 200
+SERVER_TIMING_SAMPLE_RATE = 1.0
+SERVER_TIMING_BUFFER_SIZE = 100
+
+# Job queue for the work that follows a request (the sales aggregates of checkout), run by
+# `manage.py run_jobs`. JOB_QUEUE = False runs the jobs inside the request instead, for
+# deployments without a worker (see LittleLemonAPI/jobs.py)
+JOB_QUEUE = True
+JOB_BATCH_SIZE = 100
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10 # seconds before the first retry, doubled for every further attempt
+JOB_RETENTION_DAYS = 7
+
+# Delivered orders older than ARCHIVE_AFTER_DAYS are moved to the archive tables by
+# `manage.py archive_orders`, ARCHIVE_BATCH_SIZE per transaction (see LittleLemonAPI/archive.py)
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 500
+
+# Warm each worker up when wsgi.py / asgi.py create the application, before it serves a request:
+# imports, URL resolver, serializers, database connections, catalog and role caches
+# (see LittleLemonAPI/warmup.py). Opt-in: set LITTLELEMON_WARMUP=1 in the environment of the
+# application server, anything else importing wsgi.py / asgi.py starts cold.
+WARMUP_ON_START = os.environ.get("LITTLELEMON_WARMUP") == "1"
+# Host of the warm-up requests, the cached catalog responses are only reused for the same host
+WARMUP_HOST = os.environ.get("LITTLELEMON_WARMUP_HOST")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"LittleLemonAPI.warmup": {"handlers": ["console"], "level": "INFO"}},
+}
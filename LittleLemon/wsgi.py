@@ -1,16 +1,21 @@
-"""
-WSGI config for LittleLemon project.
-
-It exposes the WSGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
-"""
-
-import os
-
-from django.core.wsgi import get_wsgi_application
-
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
-
-application = get_wsgi_application()
+"""
+WSGI config for LittleLemon project.
+
+It exposes the WSGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
+
+application = get_wsgi_application()
+
+# Warm the worker up before it serves its first request, when LITTLELEMON_WARMUP=1 (WARMUP_ON_START in settings.py)
+from LittleLemonAPI.warmup import warm_up_on_start  # noqa: E402
+
+warm_up_on_start()
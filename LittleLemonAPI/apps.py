@@ -1,6 +1,10 @@
-from django.apps import AppConfig
-
-
-class LittlelemonapiConfig(AppConfig):
-    default_auto_field = "django.db.models.BigAutoField"
-    name = "LittleLemonAPI"
+from django.apps import AppConfig
+
+
+class LittlelemonapiConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "LittleLemonAPI"
+
+    def ready(self):
+        # Connect the cache invalidation receivers and register the job handlers
+        from . import sales, signals  # noqa: F401
@@ -0,0 +1,94 @@
+"""
+Hot/cold archiving of the orders.
+
+Orders and their order items are only ever added to, and every order listing scans the
+orders table. archive_orders() (`manage.py archive_orders`, run it daily) moves the
+delivered orders dated more than ARCHIVE_AFTER_DAYS days ago, with their order items,
+into the ArchivedOrder and ArchivedOrderItem tables, ARCHIVE_BATCH_SIZE orders per
+transaction. Orders keep their ids, and archived orders are read-only: the status
+updates, dispatching and the detail view's writes only see the hot table.
+
+The hot window is every order dated on or after archive_cutoff(), and every open one.
+The order list reads the hot table, unless the request reaches outside the window
+(reads_history()): ?history=true, or a ?date= before the cutoff. Those requests read the
+OrderHistory and OrderHistoryItem database views, the UNION ALL of the hot and the
+archive tables, with the same filters, ordering and pagination. The order detail view
+falls back to the archive for the GETs of an order that is not in the hot table, and
+the export and the sales rebuild read the views. Archiving leaves the sales aggregates
+alone, an archived order is still sold.
+
+Migration 0008 creates the views. SQLite checks a view against the tables it reads when
+a table is renamed, so migrations that alter Order, OrderItem or their archive tables
+must drop the views first and create them again afterwards, with their own copy of the SQL.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# Delivered orders are archived once they are older than this many days
+ARCHIVE_AFTER_DAYS = getattr(settings, "ARCHIVE_AFTER_DAYS", 90)
+# Orders moved per transaction, the write lock is held for one batch at a time
+ARCHIVE_BATCH_SIZE = getattr(settings, "ARCHIVE_BATCH_SIZE", 500)
+
+HISTORY_PARAM = "history"
+
+
+def columns(model):
+    qn = connection.ops.quote_name
+    return ", ".join(qn(field.column) for field in model._meta.concrete_fields)
+
+
+def archive_cutoff(today=None):
+    """The first day of the hot window: delivered orders dated before it are archived."""
+    return (today or date.today()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def reads_history(request):
+    """True when a list request reaches outside the hot window and has to read the archive as well."""
+    if request.query_params.get(HISTORY_PARAM, "").lower() in ("1", "true"):
+        return True
+    try:
+        return date.fromisoformat(request.query_params.get("date", "")) < archive_cutoff()
+    except ValueError: # no date filter, or one the filter rejects anyway
+        return False
+
+
+def move_rows(source, target, column, ids):
+    """INSERT INTO target the rows of source whose `column` is in ids, and DELETE them from source."""
+    qn = connection.ops.quote_name
+    where = f"WHERE {qn(column)} IN ({', '.join(['%s'] * len(ids))})"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(target._meta.db_table)} ({columns(target)}) "
+            f"SELECT {columns(target)} FROM {qn(source._meta.db_table)} {where}",
+            ids,
+        )
+        cursor.execute(f"DELETE FROM {qn(source._meta.db_table)} {where}", ids)
+
+
+def archive_orders(cutoff=None, batch_size=None):
+    """
+    Move the delivered orders dated before `cutoff` (archive_cutoff() by default) and
+    their order items into the archive tables, oldest id first, one transaction per
+    batch. The rows are copied and deleted by id in the database, they are never loaded.
+    Returns the number of orders moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Order.objects.select_for_update()
+                .filter(status=True, date__lt=cutoff)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size or ARCHIVE_BATCH_SIZE]
+            )
+            if not ids:
+                return moved
+            # Django's foreign keys are checked at commit, the order of the moves does not matter
+            move_rows(Order, ArchivedOrder, Order._meta.pk.column, ids)
+            move_rows(OrderItem, ArchivedOrderItem, OrderItem._meta.get_field("order").column, ids)
+        moved += len(ids)
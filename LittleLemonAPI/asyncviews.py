@@ -0,0 +1,135 @@
+"""
+Async counterparts of DRF's view machinery, for the read endpoints served under ASGI.
+
+DRF views are sync, so under ASGI Django runs every request in a worker thread and
+the number of requests in flight is capped by the thread pool. The views built on
+AsyncAPIView run on the event loop instead: authentication and role lookups only
+reach the database on a cache miss (through the async ORM), the throttle's SQLite
+update runs in a thread and the page is fetched with the async ORM.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions, generics
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .roles import aget_roles
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with an async request cycle: handlers are `async def` and authentication
+    and throttling are awaited. Permission classes are still checked in line, so they
+    must not query the database (the project's permission classes don't).
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response): # options() is inherited from APIView and sync
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """initial(), with authentication and throttling awaited."""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Request._authenticate() with the authenticators awaited (those without an
+        aauthenticate() run in a thread), followed by the role lookup, so that
+        is_manager() and friends are free in the handlers.
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                break
+        else:
+            request._not_authenticated()
+        await aget_roles(request.user)
+
+    async def acheck_throttles(self, request):
+        # The throttles keep their buckets in SQLite (see throttles.py), a blocking write that
+        # may wait on another process's lock, so all of them are checked in one trip to a thread
+        await sync_to_async(self.check_throttles, thread_sensitive = False)(request)
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+
+    async def apaginate_queryset(self, queryset):
+        """paginate_queryset(), awaiting the paginator (one without apaginate_queryset() runs in a thread)."""
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, 'apaginate_queryset'):
+            return await self.paginator.apaginate_queryset(queryset, self.request, view = self)
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view = self)
+
+
+class AsyncListModelMixin:
+    """ListModelMixin.list() for AsyncGenericAPIView views."""
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many = True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many = True)
+        return Response(serializer.data)
+
+
+def read_view(view_class, async_view_class):
+    """
+    The URL callback of an endpoint with an async read path.
+
+    With ASYNC_READ_VIEWS on (asgi.py switches it on) GET and HEAD are served by
+    async_view_class and every other method by view_class, in a thread, which is how
+    Django runs any sync view under ASGI. Under WSGI it is plain view_class, an async
+    view would need an event loop of its own for every request there.
+    """
+    sync_view = view_class.as_view()
+    if not settings.ASYNC_READ_VIEWS:
+        return sync_view
+    async_view = async_view_class.as_view()
+    sync_view_in_thread = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view_in_thread(request, *args, **kwargs)
+
+    view.cls = view_class
+    view.async_cls = async_view_class
+    view.csrf_exempt = True # as the DRF views themselves
+    return view
@@ -0,0 +1,134 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .roles import aget_roles, get_roles
+from .timing import phase
+from .versions import user_key, version_store
+
+# How long (in seconds) a resolved token stays cached, and how many tokens are kept.
+# Revocations (logout, deactivation, group changes) bump the user's version (see
+# versions.py), which every cached entry is checked against before it is used, so no
+# worker process accepts a revoked token once the revocation is made.
+TOKEN_CACHE_TIMEOUT = getattr(settings, "TOKEN_CACHE_TIMEOUT", 30)
+TOKEN_CACHE_SIZE = getattr(settings, "TOKEN_CACHE_SIZE", 10000)
+
+
+class TokenCache:
+    """
+    A small, thread safe LRU cache of token key -> (user, token, roles) with a TTL.
+    An entry is only used while the user's version is the one it was built for.
+    """
+
+    def __init__(self, timeout, size):
+        self.timeout = timeout
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user, token, roles, version = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        if version_store.get(user_key(user.pk)) != version:
+            self.invalidate_key(key)
+            return None
+        return user, token, roles
+
+    def set(self, key, user, token, roles, version):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic() + self.timeout, user, token, roles, version)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate_key(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_TIMEOUT, TOKEN_CACHE_SIZE)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches the token -> user resolution (and the user's
+    group set) instead of joining authtoken_token to auth_user on every request.
+    """
+    cache = token_cache
+
+    def authenticate(self, request):
+        with phase("auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            # Read before the roles: a revocation from here on bumps the version past the entry's
+            version = version_store.get(user_key(user.pk))
+            roles = get_roles(user)
+            self.cache.set(key, user, token, roles, version)
+            cached = user, token, roles
+        return self.cached_credentials(*cached)
+
+    @staticmethod
+    def cached_credentials(user, token, roles):
+        # Every request, the one that filled the cache entry included, gets its own copy
+        # of the user: per-request state is kept on it and must not reach the shared entry
+        user = copy.copy(user)
+        user._roles = roles
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views. A cached token is resolved without leaving the
+        event loop; a cache miss is looked up with the async ORM.
+        """
+        with phase("auth"):
+            auth = get_authorization_header(request).split()
+            if not auth or auth[0].lower() != self.keyword.lower().encode():
+                return None
+            if len(auth) == 1:
+                raise exceptions.AuthenticationFailed(_("Invalid token header. No credentials provided."))
+            elif len(auth) > 2:
+                raise exceptions.AuthenticationFailed(_("Invalid token header. Token string should not contain spaces."))
+            try:
+                key = auth[1].decode()
+            except UnicodeError:
+                raise exceptions.AuthenticationFailed(
+                    _("Invalid token header. Token string should not contain invalid characters.")
+                )
+            return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.cached_credentials(*cached)
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related("user").aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        version = version_store.get(user_key(token.user.pk))
+        roles = await aget_roles(token.user)
+        self.cache.set(key, token.user, token, roles, version)
+        return self.cached_credentials(token.user, token, roles)
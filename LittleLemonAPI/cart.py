@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.db import DataError, connection, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Cart, MenuItem
+
+# Most items one cart request may add
+CART_BATCH_SIZE = 100
+
+# The largest primary key the database holds (64-bit integers): a larger menu item id
+# makes the driver raise OverflowError instead of finding nothing
+MAX_ID = 2**63 - 1
+
+# The largest quantity and line price the cart columns hold (SmallIntegerField, DecimalField(6, 2))
+MAX_QUANTITY = 32767
+MAX_PRICE = Decimal("9999.99")
+
+
+def add_to_cart(user, items):
+    """
+    Add a list of (menu item id, quantity) pairs to the user's cart, in one transaction.
+
+    Prices come from the menu items (one query for the whole batch), never from the
+    client. A menu item that is already in the cart has the quantity added to it and
+    is re-priced at the current price. Returns the resulting cart rows, one per menu
+    item in the order they were first given.
+
+    Raises ValidationError, with one error dict per input item, and writes nothing
+    when a menu item does not exist or a resulting row would not fit its columns.
+    """
+    quantities = {}
+    for menuitem_id, quantity in items:
+        quantities[menuitem_id] = quantities.get(menuitem_id, 0) + quantity
+
+    with transaction.atomic():
+        prices = dict(MenuItem.objects.filter(pk__in=quantities).values_list("pk", "price"))
+        errors = [
+            {} if menuitem_id in prices else {"menuitem": [f'Invalid pk "{menuitem_id}" - object does not exist.']}
+            for menuitem_id, _ in items
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+
+        rows = [(menuitem_id, quantity, prices[menuitem_id]) for menuitem_id, quantity in quantities.items()]
+        try:
+            if connection.features.supports_update_conflicts_with_target:
+                upsert(user, rows)
+            else:
+                merge(user, rows)
+        except DataError: # a database that checks the column bounds itself
+            raise ValidationError([{"quantity": ["The cart cannot hold this quantity."]} for _ in items])
+
+        cart_items = Cart.objects.filter(user=user, menuitem_id__in=quantities)
+        # Checked in the database: SQLite stores the oversized values, which could not be read back
+        too_large = set(
+            cart_items.filter(Q(quantity__gt=MAX_QUANTITY) | Q(price__gt=MAX_PRICE)).values_list("menuitem_id", flat=True)
+        )
+        if too_large:
+            raise ValidationError([ # rolls the whole batch back
+                {"quantity": ["The cart cannot hold this quantity."]} if menuitem_id in too_large else {}
+                for menuitem_id, _ in items
+            ])
+        cart = {item.menuitem_id: item for item in cart_items}
+    return [cart[menuitem_id] for menuitem_id in quantities]
+
+
+def upsert(user, rows):
+    """
+    Insert all rows with a single INSERT ... ON CONFLICT DO UPDATE on the (menuitem, user)
+    unique constraint, letting the database add the quantity to a row that already exists.
+    """
+    qn = connection.ops.quote_name
+    table = qn(Cart._meta.db_table)
+    user_id, menuitem_id, quantity, unit_price, price = (
+        qn(Cart._meta.get_field(name).column) for name in ("user", "menuitem", "quantity", "unit_price", "price")
+    )
+    new_quantity = f"{table}.{quantity} + excluded.{quantity}"
+    sql = (
+        f"INSERT INTO {table} ({user_id}, {menuitem_id}, {quantity}, {unit_price}, {price}) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))} "
+        f"ON CONFLICT ({menuitem_id}, {user_id}) DO UPDATE SET "
+        f"{quantity} = {new_quantity}, "
+        f"{unit_price} = excluded.{unit_price}, "
+        f"{price} = ROUND(({new_quantity}) * excluded.{unit_price}, 2)"
+    )
+    params = []
+    for item_id, item_quantity, item_price in rows:
+        params += [user.pk, item_id, item_quantity, item_price, item_quantity * item_price]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def merge(user, rows):
+    """upsert() for databases without INSERT ... ON CONFLICT: the existing rows are locked and updated."""
+    existing = {
+        item.menuitem_id: item
+        for item in Cart.objects.select_for_update().filter(user=user, menuitem_id__in=[row[0] for row in rows])
+    }
+    new = []
+    for menuitem_id, quantity, unit_price in rows:
+        item = existing.get(menuitem_id)
+        if item is None:
+            new.append(Cart(user=user, menuitem_id=menuitem_id, quantity=quantity,
+                            unit_price=unit_price, price=quantity * unit_price))
+        else:
+            item.quantity += quantity
+            item.unit_price = unit_price
+            item.price = item.quantity * unit_price
+    Cart.objects.bulk_update(existing.values(), ["quantity", "unit_price", "price"])
+    Cart.objects.bulk_create(new)
@@ -0,0 +1,109 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .timing import phase
+from .versions import bump_versions, version_store
+
+# How long (in seconds) a rendered catalog response stays in the cache.
+# Writes bump the catalog version (shared by all processes, see versions.py), which makes
+# every older entry unreachable at once.
+CATALOG_CACHE_TIMEOUT = getattr(settings, "CATALOG_CACHE_TIMEOUT", 300)
+
+VERSION_KEY = "catalog"
+
+
+def get_catalog_version():
+    return version_store.get(VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response, in every process. Called whenever a MenuItem or Category is written."""
+    bump_versions(VERSION_KEY)
+
+
+class CatalogCacheMixin:
+    """
+    Caches the rendered list responses of a catalog view (menu items, categories).
+
+    Entries are keyed by the catalog version and the normalized values of
+    `cache_query_params`, so requests that only differ in parameter order or in unrelated
+    parameters share an entry. Only the JSON renderings are cached: the browsable API
+    page shows the user it was rendered for. Responses carry a strong ETag computed from
+    the rendered body and a matching If-None-Match gets a 304 Not Modified.
+    """
+    cache_query_params = ()
+    cache_renderer_format = "json"
+
+    def is_cacheable(self, request):
+        return request.accepted_renderer.format == self.cache_renderer_format
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (name, request.query_params.get(name))
+            for name in self.cache_query_params
+            if request.query_params.get(name)
+        )
+        # Pagination links are absolute, so the host is part of the key as well
+        params.append(("host", request.build_absolute_uri("/")))
+        digest = hashlib.sha1(urlencode(params).encode()).hexdigest()
+        return "littlelemon:catalog:%s:%s:%s" % (get_catalog_version(), type(self).__name__, digest)
+
+    def get_cached_response(self, key):
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        content, content_type, etag, vary = cached
+        response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        if vary:
+            response["Vary"] = vary
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        response = self.get_cached_response(key)
+        if response is not None:
+            return response
+        response = super().list(request, *args, **kwargs)
+        response.catalog_cache_key = key # rendered and stored in finalize_response()
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        """list() for the async views (see asyncviews.py), a cache hit never touches the database."""
+        if not self.is_cacheable(request):
+            return await super().alist(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        response = self.get_cached_response(key)
+        if response is not None:
+            return response
+        response = await super().alist(request, *args, **kwargs)
+        response.catalog_cache_key = key
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(response, "catalog_cache_key", None)
+        if key is not None and response.status_code == 200:
+            with phase("render"):
+                response.render()
+            response["ETag"] = '"%s"' % hashlib.sha1(response.content).hexdigest()
+            cache.set(
+                key,
+                (response.content, response["Content-Type"], response["ETag"], response.get("Vary")),
+                CATALOG_CACHE_TIMEOUT,
+            )
+        etag = response.get("ETag") if request.method == "GET" else None
+        if etag and etag in parse_etags(request.headers.get("If-None-Match", "")):
+            not_modified = HttpResponseNotModified()
+            not_modified["ETag"] = etag
+            if response.has_header("Vary"):
+                not_modified["Vary"] = response["Vary"]
+            return not_modified
+        return response
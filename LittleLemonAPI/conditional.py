@@ -0,0 +1,74 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .throttles import NotModifiedRateThrottle
+
+
+def make_etag(updated_at, format):
+    """A weak ETag for one version (updated_at, to the microsecond) of an object in one response format."""
+    return 'W/"%d%06d-%s"' % (int(updated_at.timestamp()), updated_at.microsecond, format)
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for a detail view of a model with an updated_at timestamp.
+
+    GET responses carry an ETag and a Last-Modified header. A request with a matching
+    If-None-Match (or, without one, an If-Modified-Since at or after Last-Modified) is
+    answered 304 Not Modified from a lookup of updated_at by primary key alone: the object
+    is neither loaded nor serialized. Those requests are checked against
+    not_modified_throttle_classes instead of the view's throttles, a lighter budget.
+    Last-Modified only has whole seconds, so clients should prefer the ETag.
+
+    The view's get() must start with `if self.not_modified is not None: return self.not_modified`.
+    """
+    not_modified_throttle_classes = [NotModifiedRateThrottle]
+    not_modified = None
+    object_updated_at = None
+
+    def get_updated_at(self, request):
+        """The updated_at of the requested object, or None if it does not exist or the user may not read it."""
+        model = self.get_queryset().model
+        return model.objects.filter(pk=self.kwargs[self.lookup_field]).values_list("updated_at", flat=True).first()
+
+    def set_validators(self, request, response, updated_at):
+        response["ETag"] = make_etag(updated_at, request.accepted_renderer.format)
+        response["Last-Modified"] = http_date(updated_at.timestamp())
+
+    def get_not_modified(self, request):
+        """The 304 (or 412) response to a conditional GET, or None when the view has to answer it."""
+        if not (request.headers.get("If-None-Match") or request.headers.get("If-Modified-Since")):
+            return None # unconditional requests skip the lookup
+        updated_at = self.get_updated_at(request)
+        if updated_at is None:
+            return None
+        validators = HttpResponse()
+        self.set_validators(request, validators, updated_at)
+        response = get_conditional_response(
+            request, etag=validators["ETag"], last_modified=int(updated_at.timestamp()), response=validators
+        )
+        return None if response is validators else response
+
+    def check_throttles(self, request):
+        # Throttles are checked after authentication and permissions and before the handler runs,
+        # decide here whether the request is answered from updated_at, so it is charged to the right budget
+        if request.method in ("GET", "HEAD"):
+            self.not_modified = self.get_not_modified(request)
+        super().check_throttles(request)
+
+    def get_throttles(self):
+        if self.not_modified is not None:
+            return [throttle() for throttle in self.not_modified_throttle_classes]
+        return super().get_throttles()
+
+    def get_object(self):
+        obj = super().get_object()
+        self.object_updated_at = obj.updated_at
+        return obj
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and response.status_code == 200 and self.object_updated_at is not None:
+            self.set_validators(request, response, self.object_updated_at)
+        return response
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+
+def apply_sqlite_pragmas(connection):
+    """Run the SQLITE_PRAGMAS of the active database profile on a new SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+class SQLiteFileStore:
+    """
+    A small SQLite file, next to the Django databases, that every worker process on the
+    host shares (the throttle buckets, the read replica state). Subclasses give the path
+    (a property, so tests can point it at a temporary file through the settings) and
+    the CREATE statements of their tables.
+    """
+    schema = ()
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @property
+    def path(self):
+        raise NotImplementedError
+
+    def connection(self):
+        # One connection per thread, per process (a forked worker must not reuse its
+        # parent's connection) and per path (tests point the store at a temporary file)
+        key = (os.getpid(), self.path)
+        if getattr(self.local, "key", None) != key:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            self.local.key, self.local.conn = key, conn
+        return self.local.conn
+
+
+def upsert_add(model, rows, unique_fields, add_fields, using=None):
+    """
+    Insert rows (dicts of field name -> value) of `model`, or, where a row with the same
+    `unique_fields` exists, add the `add_fields` values to it. A single
+    INSERT ... ON CONFLICT DO UPDATE SET f = f + excluded.f where the database has it,
+    so concurrent writers never lose an increment. Call it inside a transaction.
+    """
+    if not rows:
+        return
+    connection = transaction.get_connection(using)
+    fields = [model._meta.get_field(name) for name in (*unique_fields, *add_fields)]
+    if not connection.features.supports_update_conflicts_with_target:
+        manager = model._default_manager.using(connection.alias)
+        for row in rows:
+            # Foreign keys are given as ids, hence attname (menuitem_id)
+            values = {field.attname: row[field.name] for field in fields}
+            keys = {field.attname: row[field.name] for field in fields[:len(unique_fields)]}
+            if not manager.filter(**keys).update(**{name: F(name) + row[name] for name in add_fields}):
+                manager.create(**values)
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+
+    def added(field):
+        column = qn(field.column)
+        total = f"{table}.{column} + excluded.{column}"
+        # Keep decimal sums exact on SQLite, which adds them as floating point numbers
+        return f"ROUND({total}, {field.decimal_places})" if field.get_internal_type() == "DecimalField" else total
+
+    placeholders = "(%s)" % ", ".join(["%s"] * len(fields))
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(field.column) for field in fields)}) "
+        f"VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({', '.join(qn(field.column) for field in fields[:len(unique_fields)])}) DO UPDATE SET "
+        + ", ".join(f"{qn(field.column)} = {added(field)}" for field in fields[len(unique_fields):])
+    )
+    params = [
+        field.get_db_prep_save(row[field.name], connection) for row in rows for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
@@ -0,0 +1,99 @@
+import heapq
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Order
+from .roles import DELIVERY_CREW
+
+# Most orders one status update may change
+STATUS_BATCH_SIZE = 500
+
+
+def dispatch_orders():
+    """
+    Assign every open order that has no delivery crew member (status False, delivery_crew
+    NULL), oldest first, to the member of the delivery crew with the fewest open orders
+    at that point. The loads are kept in a heap of (open orders, user id), so ties go to
+    the lowest user id. The orders are read and all assignments written in one
+    transaction, the unassigned orders locked on databases that support it.
+
+    Returns (number of orders assigned, the crew members by id as dicts with id,
+    username, assigned and open_orders), or (0, []) when there is no delivery crew.
+    """
+    with transaction.atomic():
+        crew = list(User.objects.filter(groups__name=DELIVERY_CREW).order_by("pk").values("pk", "username"))
+        if not crew:
+            return 0, []
+        open_orders = dict(
+            Order.objects.filter(status=False, delivery_crew__in=[member["pk"] for member in crew])
+            .order_by()
+            .values_list("delivery_crew")
+            .annotate(Count("pk"))
+        )
+        unassigned = list(
+            Order.objects.select_for_update()
+            .filter(delivery_crew__isnull=True, status=False)
+            .order_by("date", "pk")
+            .values_list("pk", flat=True)
+        )
+
+        heap = [(open_orders.get(member["pk"], 0), member["pk"]) for member in crew]
+        heapq.heapify(heap)
+        now = timezone.now()
+        assignments = []
+        for order_id in unassigned:
+            load, crew_id = heap[0]
+            heapq.heapreplace(heap, (load + 1, crew_id))
+            assignments.append(Order(pk=order_id, delivery_crew_id=crew_id, updated_at=now))
+        Order.objects.bulk_update(assignments, ["delivery_crew", "updated_at"]) # bulk_update() skips auto_now
+
+    assigned = {}
+    for order in assignments:
+        assigned[order.delivery_crew_id] = assigned.get(order.delivery_crew_id, 0) + 1
+    loads = {crew_id: load for load, crew_id in heap}
+    return len(assignments), [
+        {
+            "id": member["pk"],
+            "username": member["username"],
+            "assigned": assigned.get(member["pk"], 0),
+            "open_orders": loads[member["pk"]],
+        }
+        for member in crew
+    ]
+
+
+def set_status(order_ids, status, crew=None):
+    """
+    Set the status of the given orders with a single UPDATE. With a delivery crew member
+    as crew, only the orders assigned to them are changed.
+
+    Returns one result per distinct id, in the order given: "updated", "not found", or
+    "not assigned to you" (a crew member's request for another member's order).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    with transaction.atomic():
+        found = dict(Order.objects.filter(pk__in=order_ids).values_list("pk", "delivery_crew"))
+        results = {order_id: status_result(order_id, found, crew) for order_id in order_ids}
+        allowed = [order_id for order_id, result in results.items() if result == "updated"]
+        if allowed:
+            # The UPDATE checks the crew again: an order reassigned or deleted since it was read is skipped
+            orders = Order.objects.filter(pk__in=allowed)
+            if crew is not None:
+                orders = orders.filter(delivery_crew=crew)
+            if orders.update(status=status, updated_at=timezone.now()) < len(allowed):
+                # The UPDATE took the write lock, the rows read now are the ones it saw
+                found = dict(Order.objects.filter(pk__in=allowed).values_list("pk", "delivery_crew"))
+                results.update((order_id, status_result(order_id, found, crew)) for order_id in allowed)
+    return [{"id": order_id, "result": result} for order_id, result in results.items()]
+
+
+def status_result(order_id, found, crew):
+    """The result of the status update of an order, `found` maps the ids read to their delivery crew."""
+    if order_id not in found:
+        return "not found"
+    if crew is not None and found[order_id] != crew.pk:
+        return "not assigned to you"
+    return "updated"
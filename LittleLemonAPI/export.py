@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+# Number of orders fetched (with their order items) per database round trip while exporting
+EXPORT_CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+ORDER_FIELDS = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
+ORDER_ITEM_FIELDS = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
+
+
+def order_row(order):
+    """The same shape as OrderSerializer, built without the serializer machinery."""
+    return {
+        'id': order.id,
+        'user': order.user_id,
+        'delivery_crew': order.delivery_crew_id,
+        'status': order.status,
+        'total': order.total,
+        'date': order.date,
+        'order_items': [
+            {
+                'id': item.id,
+                'menuitem': item.menuitem_id,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'price': item.price,
+            }
+            for item in order.order_items.all()
+        ],
+    }
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Renderers for the streaming order export. stream() turns an iterator of orders into
+    an iterator of text chunks: header(), then line() for every order, one JSON object
+    per line unless a subclass overrides them. astream() does the same from an async
+    iterator, for ASGI. render() is only used for error responses, which are sent as a
+    single JSON object.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+    def header(self):
+        return ''
+
+    def line(self, row):
+        return self.encoder.encode(row) + '\n'
+
+    def stream(self, orders):
+        header = self.header()
+        if header:
+            yield header
+        for order in orders:
+            yield self.line(order_row(order))
+
+    async def astream(self, orders):
+        header = self.header()
+        if header:
+            yield header
+        async for order in orders:
+            yield self.line(order_row(order))
+
+
+class NDJSONRenderer(ExportRenderer):
+    pass
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def write(self, values):
+        self.writer.writerow(values)
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+    def header(self):
+        return self.write(ORDER_FIELDS + ['order_items'])
+
+    def line(self, row):
+        # One line per order, the order items are inlined as a JSON array
+        return self.write([row[field] for field in ORDER_FIELDS] + [self.encoder.encode(row['order_items'])])
@@ -0,0 +1,299 @@
+"""
+Sparse fieldsets (?fields= / ?expand=) for list endpoints, and a fast way of rendering them.
+
+The regular path builds a model instance for every row and runs every serializer field's
+to_representation() on it. ValuesSerializer reads the same columns with QuerySet.values()
+and builds the output dicts directly. It is derived from the endpoint's (possibly trimmed)
+serializer, so both paths give the same output; a serializer with a field it cannot
+reproduce exactly keeps the regular path.
+"""
+import datetime
+import decimal
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .timing import phase
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def split_param(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    A ModelSerializer that takes two optional keyword arguments:
+    `fields`, the names of the fields to output (all of them by default), and `expand`,
+    the nested relations to keep nested; the others are output as primary keys
+    (all of them stay nested by default).
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        if fields is not None:
+            unknown = sorted(set(fields) - set(readable))
+            if unknown:
+                raise ValidationError({FIELDS_PARAM: ['Unknown field: %s' % name for name in unknown]})
+            for name in readable:
+                if name not in fields:
+                    self.fields.pop(name)
+        if expand is not None:
+            nested = {name for name, field in self.fields.items() if isinstance(field, serializers.BaseSerializer)}
+            unknown = sorted(set(expand) - nested - set(readable))
+            if unknown:
+                raise ValidationError({EXPAND_PARAM: ['Unknown field: %s' % name for name in unknown]})
+            for name in nested - set(expand):
+                field = self.fields[name]
+                kwargs = {'source': field.source} if field.source != name else {}
+                self.fields[name] = PrimaryKeyRelatedField(
+                    read_only=True, many=isinstance(field, serializers.ListSerializer), **kwargs
+                )
+
+
+class SparseFieldsetMixin:
+    """
+    For GenericAPIView list endpoints whose serializer has SparseFieldsetSerializerMixin:
+    GET requests pass ?fields= and ?expand= (comma separated) on to the serializer, and
+    list() / alist() render the page through ValuesSerializer whenever it can.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method in ('GET', 'HEAD'):
+            for name in (FIELDS_PARAM, EXPAND_PARAM):
+                if name in self.request.query_params:
+                    kwargs.setdefault(name, split_param(self.request.query_params[name]))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_values_serializer(self, queryset):
+        """The ValuesSerializer for a GET list of queryset, or None when the regular path must be used."""
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        # Built for the queryset's model, which may be a stand-in with the same fields (OrderHistory for Order)
+        values_serializer = ValuesSerializer.for_serializer(self.get_serializer(), queryset.model)
+        if values_serializer is None:
+            return None
+        # Pagination needs the ordering columns of the rows (keyset cursors are built from them)
+        ordering = OrderingFilter().get_ordering(self.request, queryset, self) or []
+        values_serializer.extra = ['id'] + [field.lstrip('-') for field in ordering] + list(queryset.query.extra_select)
+        return values_serializer
+
+    def list(self, request, *args, **kwargs):
+        return self.list_queryset(self.filter_queryset(self.get_queryset()))
+
+    def list_queryset(self, queryset, paginate=True):
+        """ListModelMixin.list() for an already filtered queryset."""
+        values_serializer = self.get_values_serializer(queryset)
+        if values_serializer is not None:
+            queryset = values_serializer.values(queryset)
+        page = self.paginate_queryset(queryset) if paginate else None
+        rows = queryset if page is None else page
+        with phase('serialize'):
+            if values_serializer is not None:
+                data = values_serializer.to_representation(rows)
+            else:
+                data = self.get_serializer(rows, many=True).data
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.alist_queryset(self.filter_queryset(self.get_queryset()))
+
+    async def alist_queryset(self, queryset, paginate=True):
+        """list_queryset() for the async views, the rows are fetched with the async ORM."""
+        values_serializer = self.get_values_serializer(queryset)
+        if values_serializer is not None:
+            queryset = values_serializer.values(queryset)
+        page = await self.apaginate_queryset(queryset) if paginate else None
+        rows = [row async for row in queryset] if page is None else page
+        with phase('serialize'):
+            if values_serializer is not None:
+                data = await values_serializer.ato_representation(rows)
+            else:
+                data = self.get_serializer(rows, many=True).data
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+
+def decimal_converter(field):
+    """DecimalField.to_representation() with the quantize context built once."""
+    if field.decimal_places is None or field.localize:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        value = value.quantize(exponent, rounding=rounding, context=context)
+        return '{:f}'.format(value) if coerce else value
+    return convert
+
+
+def date_converter(field):
+    if getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+        return datetime.date.isoformat
+    return field.to_representation
+
+
+# The serializer fields whose output ValuesSerializer reproduces, and how.
+# None means the database value is output as it is.
+CONVERTERS = {
+    serializers.IntegerField: None,
+    serializers.CharField: None,
+    serializers.SlugField: None,
+    serializers.BooleanField: None,
+    serializers.DecimalField: decimal_converter,
+    serializers.DateField: date_converter,
+}
+
+if hasattr(serializers, 'BigIntegerField'): # DRF >= 3.15 maps BigAutoField to it
+    CONVERTERS[serializers.BigIntegerField] = lambda field: (
+        str if getattr(field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING) else None
+    )
+
+VALUE, OBJECT, MANY, PKS = 'value', 'object', 'many', 'pks'
+
+
+class ValuesSerializer:
+    """
+    Renders rows read with QuerySet.values() the way a ModelSerializer renders instances.
+
+    Plain fields and primary key relations are read as columns, nested serializers of a
+    foreign key through a join (`category__title`), and nested or primary key lists of a
+    reverse foreign key (`order_items`) with one more query for the whole page.
+    """
+
+    def __init__(self, model, prefix=''):
+        self.model = model
+        self.prefix = prefix
+        self.fields = [] # (output name, kind, values() lookup or relation, converter or nested ValuesSerializer)
+        self.extra = [] # columns needed by the view (ordering, pagination) but not output
+
+    @classmethod
+    def for_serializer(cls, serializer, model=None, prefix=''):
+        """Build the ValuesSerializer of a ModelSerializer, None if one of its fields is not supported."""
+        model = model or serializer.Meta.model
+        values_serializer = cls(model, prefix)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist: # '*', dotted sources, methods and properties
+                return None
+            lookup = prefix + field.source
+            if isinstance(field, serializers.ListSerializer) or isinstance(field, ManyRelatedField):
+                if not model_field.one_to_many:
+                    return None
+                if isinstance(field, ManyRelatedField):
+                    if type(field.child_relation) is not PrimaryKeyRelatedField or field.child_relation.pk_field:
+                        return None
+                    values_serializer.fields.append((name, PKS, model_field, None))
+                    continue
+                child = cls.for_serializer(field.child, model_field.related_model)
+                if child is None:
+                    return None
+                values_serializer.fields.append((name, MANY, model_field, child))
+            elif isinstance(field, serializers.BaseSerializer):
+                if not model_field.many_to_one:
+                    return None
+                nested = cls.for_serializer(field, model_field.related_model, lookup + '__')
+                if nested is None or nested.related_fields():
+                    return None
+                values_serializer.fields.append((name, OBJECT, lookup, nested))
+            elif type(field) is PrimaryKeyRelatedField:
+                if field.pk_field is not None or not model_field.many_to_one:
+                    return None
+                values_serializer.fields.append((name, VALUE, lookup, None))
+            elif type(field) in CONVERTERS and model_field.concrete and not model_field.is_relation:
+                make_converter = CONVERTERS[type(field)]
+                values_serializer.fields.append((name, VALUE, lookup, make_converter and make_converter(field)))
+            else:
+                return None
+        return values_serializer
+
+    def related_fields(self):
+        return [entry for entry in self.fields if entry[1] in (MANY, PKS)]
+
+    def columns(self):
+        """The values() lookups of the output (the primary key as well, to fetch reverse relations)."""
+        columns = []
+        for name, kind, lookup, nested in self.fields:
+            if kind == VALUE:
+                columns.append(lookup)
+            elif kind == OBJECT:
+                columns.append(lookup)
+                columns += nested.columns()
+        pk = self.prefix + self.model._meta.pk.name
+        if self.related_fields() and pk not in columns:
+            columns.append(pk)
+        return columns
+
+    def values(self, queryset):
+        columns = self.columns()
+        # values() ignores select_related(), prefetch_related() would be applied to the dicts
+        return queryset.prefetch_related(None).values(*columns, *[column for column in self.extra if column not in columns])
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        related = {}
+        for name, kind, relation, child in self.related_fields():
+            child_rows = list(self.related_queryset(rows, relation, child))
+            related[name] = self.group(relation, child, child_rows, child and child.to_representation(child_rows))
+        return [self.render(row, related) for row in rows]
+
+    async def ato_representation(self, rows):
+        related = {}
+        for name, kind, relation, child in self.related_fields():
+            child_rows = [row async for row in self.related_queryset(rows, relation, child)]
+            related[name] = self.group(relation, child, child_rows, child and await child.ato_representation(child_rows))
+        return [self.render(row, related) for row in rows]
+
+    def related_queryset(self, rows, relation, child):
+        """
+        The rows of a reverse foreign key for the whole page, in the order (the related
+        model's default one) prefetch_related() would read them in.
+        """
+        parent = relation.field.name
+        pk = self.prefix + self.model._meta.pk.name
+        queryset = relation.related_model._default_manager.filter(**{parent + '__in': [row[pk] for row in rows]})
+        if child is None:
+            return queryset.values(parent, 'pk')
+        return queryset.values(parent, *[column for column in child.columns() if column != parent])
+
+    @staticmethod
+    def group(relation, child, child_rows, rendered):
+        """Map each parent primary key to the list of its rendered related rows (or their primary keys)."""
+        parent = relation.field.name
+        grouped = defaultdict(list)
+        if child is None:
+            for row in child_rows:
+                grouped[row[parent]].append(row['pk'])
+        else:
+            for row, output in zip(child_rows, rendered):
+                grouped[row[parent]].append(output)
+        return grouped
+
+    def render(self, row, related=None):
+        output = {}
+        for name, kind, lookup, converter in self.fields:
+            if kind == VALUE:
+                value = row[lookup]
+                output[name] = value if converter is None or value is None else converter(value)
+            elif kind == OBJECT:
+                output[name] = None if row[lookup] is None else converter.render(row)
+            else:
+                output[name] = related[name].get(row[self.prefix + self.model._meta.pk.name], [])
+        return output
@@ -0,0 +1,166 @@
+"""
+Pre-rendered JSON fragments of list rows.
+
+The menu item list renders each item (with its category) to JSON once and keeps the bytes
+in an in-process LRU cache, keyed by the item's id and updated_at. A page is then a query
+for the ids and timestamps of its rows, one dict lookup per row, and a join of the
+fragments; only the items missing from the cache are read in full and rendered. A fragment
+is never invalidated: a change to an item, or to its category (see signals.py), moves
+updated_at and so the key. The outdated fragments fall out of the LRU.
+
+The fragments are only used for the JSON renderer and the full representation, requests
+with ?fields= / ?expand= take the regular path.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .fieldsets import EXPAND_PARAM, FIELDS_PARAM, ValuesSerializer
+from .timing import phase
+
+# How many rendered rows a process keeps
+FRAGMENT_CACHE_SIZE = getattr(settings, "FRAGMENT_CACHE_SIZE", 20000)
+
+# Stands in for the fragments while the rest of the response is rendered. JSON escapes
+# the NUL characters, and an escaped NUL can appear nowhere else in the output.
+PLACEHOLDER = "\x00fragments\x00"
+
+
+class Fragments(list):
+    """The rendered JSON (bytes) of the rows of a list response, in order."""
+
+
+class FragmentCache:
+    """
+    A small, thread safe LRU cache of (model label, primary key, updated_at) -> rendered JSON.
+    Kept in the process rather than in the Django cache: a page looks up every one of its
+    rows, which must cost less than rendering them.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                fragment = self.entries.get(key)
+                if fragment is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = fragment
+        return found
+
+    def set_many(self, fragments):
+        with self.lock:
+            self.entries.update(fragments)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_SIZE)
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer for responses whose rows (the data, or its "results" when paginated) are
+    Fragments: the fragments are joined into the rendered body as they are.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data.get("results") if isinstance(data, dict) else data
+        if not isinstance(rows, Fragments):
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Pretty printed output (the browsable API, Accept: ...; indent=4) re-renders the rows
+            rows = [json.loads(fragment) for fragment in rows]
+            data = {**data, "results": rows} if isinstance(data, dict) else rows
+            return super().render(data, accepted_media_type, renderer_context)
+        joined = b"[" + b",".join(rows) + b"]"
+        if not isinstance(data, dict):
+            return joined
+        rendered = super().render({**data, "results": PLACEHOLDER}, accepted_media_type, renderer_context)
+        return rendered.replace(super().render(PLACEHOLDER), joined, 1)
+
+
+class FragmentCacheMixin:
+    """
+    For SparseFieldsetMixin list views of a model with an updated_at timestamp, whose
+    renderer_classes start with FragmentJSONRenderer: list_queryset() / alist_queryset()
+    answer full-representation JSON requests from the fragment cache.
+    """
+    cache = fragment_cache
+
+    def get_fragment_serializer(self, queryset):
+        """The ValuesSerializer that renders the missing fragments, or None when the request takes the regular path."""
+        params = self.request.query_params
+        if FIELDS_PARAM in params or EXPAND_PARAM in params:
+            return None
+        if not isinstance(self.request.accepted_renderer, FragmentJSONRenderer):
+            return None
+        # The one of the regular fast path, its extra columns are the ones pagination needs
+        return self.get_values_serializer(queryset)
+
+    def fragment_rows(self, queryset, values_serializer):
+        """The rows of the list, just the columns pagination and the fragment keys need."""
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*values_serializer.extra, "updated_at"]))
+
+    def cached_fragments(self, rows):
+        """(the keys of the rows, the cached fragments by key, the rows whose fragment is missing)."""
+        label = self.get_queryset().model._meta.label_lower
+        keys = [(label, row["id"], row["updated_at"]) for row in rows]
+        cached = self.cache.get_many(keys)
+        missing = {row["id"]: key for row, key in zip(rows, keys) if key not in cached}
+        return keys, cached, missing
+
+    def store_fragments(self, missing, items, cached):
+        renderer = FragmentJSONRenderer()
+        rendered = {missing[item["id"]]: renderer.render(item) for item in items}
+        self.cache.set_many(rendered)
+        cached.update(rendered)
+
+    def missing_queryset(self, values_serializer, missing):
+        return self.get_queryset().filter(pk__in=list(missing)).values(*values_serializer.columns())
+
+    def fragments_response(self, keys, cached, page):
+        # An item deleted since the rows were read has no fragment, it is left out
+        data = Fragments(cached[key] for key in keys if key in cached)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def list_queryset(self, queryset, paginate=True):
+        values_serializer = self.get_fragment_serializer(queryset)
+        if values_serializer is None:
+            return super().list_queryset(queryset, paginate)
+        queryset = self.fragment_rows(queryset, values_serializer)
+        page = self.paginate_queryset(queryset) if paginate else None
+        rows = list(queryset) if page is None else page
+        with phase("serialize"):
+            keys, cached, missing = self.cached_fragments(rows)
+            if missing:
+                items = values_serializer.to_representation(self.missing_queryset(values_serializer, missing))
+                self.store_fragments(missing, items, cached)
+            return self.fragments_response(keys, cached, page)
+
+    async def alist_queryset(self, queryset, paginate=True):
+        values_serializer = self.get_fragment_serializer(queryset)
+        if values_serializer is None:
+            return await super().alist_queryset(queryset, paginate)
+        queryset = self.fragment_rows(queryset, values_serializer)
+        page = await self.apaginate_queryset(queryset) if paginate else None
+        rows = [row async for row in queryset] if page is None else page
+        with phase("serialize"):
+            keys, cached, missing = self.cached_fragments(rows)
+            if missing:
+                missing_rows = [row async for row in self.missing_queryset(values_serializer, missing)]
+                items = await values_serializer.ato_representation(missing_rows)
+                self.store_fragments(missing, items, cached)
+            return self.fragments_response(keys, cached, page)
@@ -0,0 +1,101 @@
+"""
+A small job queue in the database, for work that need not hold up the request that causes it.
+
+enqueue() inserts a Job row in the caller's transaction, so the job exists exactly when
+the request's writes commit. The run_jobs management command is the worker: it drains the
+due jobs in batches, each batch in one transaction together with the writes of its
+handlers. A job whose handler only writes to the database therefore takes effect exactly
+once, even when the worker dies half-way through a batch. A failing job is retried with
+exponential backoff and marked failed after JOB_MAX_ATTEMPTS.
+
+With JOB_QUEUE = False in the settings, enqueue() runs the handler straight away instead,
+in the caller's transaction (for deployments without a worker).
+"""
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+# Jobs one worker transaction runs
+BATCH_SIZE = getattr(settings, "JOB_BATCH_SIZE", 100)
+# Attempts before a job is marked failed, the retries wait JOB_RETRY_DELAY seconds, then twice that, ...
+MAX_ATTEMPTS = getattr(settings, "JOB_MAX_ATTEMPTS", 5)
+RETRY_DELAY = getattr(settings, "JOB_RETRY_DELAY", 10)
+# Finished jobs are kept this long, and their keys with them
+RETENTION = timedelta(days=getattr(settings, "JOB_RETENTION_DAYS", 7))
+
+# Job name -> function taking the payload
+HANDLERS = {}
+
+
+def handler(name):
+    """Register the decorated function as the handler of the jobs called `name`."""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload, key=None, delay=0):
+    """
+    Queue a `name` job with a JSON payload, to run `delay` seconds from now at the earliest.
+
+    A job is enqueued once per key: while an earlier job with the same key is kept (pending,
+    or finished less than JOB_RETENTION_DAYS ago), enqueueing it again does nothing. Without
+    a key the job is always added. Call it inside the transaction of the writes the job follows.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f"No job handler called {name!r}")
+    if not getattr(settings, "JOB_QUEUE", True):
+        HANDLERS[name](payload)
+        return
+    job = Job(
+        key=key or uuid.uuid4().hex,
+        name=name,
+        payload=payload,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    # INSERT ... ON CONFLICT DO NOTHING on the key
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+
+
+def run_jobs(batch_size=None):
+    """
+    Run one batch of due jobs, oldest first, in one transaction. A job that raises is rolled
+    back on its own (savepoint) and rescheduled. Returns (jobs done, jobs that failed).
+    """
+    now = timezone.now()
+    done, failed = [], []
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True) # lets several workers share the queue
+            .filter(state=Job.PENDING, run_after__lte=now)
+            .order_by("run_after", "pk")[:batch_size or BATCH_SIZE]
+        )
+        for job in jobs:
+            try:
+                with transaction.atomic():
+                    HANDLERS[job.name](job.payload)
+            except Exception as exc:
+                job.attempts += 1
+                job.last_error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+                if job.attempts >= MAX_ATTEMPTS:
+                    job.state = Job.FAILED
+                else:
+                    job.run_after = now + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+                failed.append(job)
+            else:
+                done.append(job.pk)
+        Job.objects.filter(pk__in=done).update(state=Job.DONE, run_after=now)
+        Job.objects.bulk_update(failed, ["attempts", "last_error", "state", "run_after"])
+    return len(done), len(failed)
+
+
+def purge_jobs():
+    """Delete the jobs that finished more than JOB_RETENTION_DAYS ago. Returns how many."""
+    return Job.objects.filter(state=Job.DONE, run_after__lt=timezone.now() - RETENTION).delete()[0]
@@ -0,0 +1,139 @@
+"""
+Shared helpers for the benchmark management commands.
+
+Benchmarks never touch db.sqlite3: they run against a throwaway test database
+that is created before the run and destroyed afterwards.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def bench_database(test_name=None):
+    """
+    Create a fresh, migrated test database for the duration of a benchmark.
+    The test environment is set up as well, so request factories can use 'testserver'.
+    Pass a file name as test_name when several processes need to share the database
+    (the SQLite test database is in memory by default).
+    """
+    setup_test_environment()
+    if test_name is not None:
+        connection.settings_dict['TEST']['NAME'] = test_name
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(func, *args, **kwargs):
+    """Call func and return (elapsed milliseconds, result)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def summarize(samples):
+    """Return p50/p95/p99/mean (in ms) for a list of millisecond samples."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': pct(50),
+        'p95': pct(95),
+        'p99': pct(99),
+    }
+
+
+@contextmanager
+def throttles_disabled():
+    """Switch off the throttles of every API view, benchmarks measure the server, not the rate limits."""
+    from LittleLemonAPI import urls
+
+    views = {pattern.callback.cls for pattern in urls.urlpatterns}
+    # Endpoints with an async read view (see asyncviews.read_view) when ASYNC_READ_VIEWS is on
+    views.update(pattern.callback.async_cls for pattern in urls.urlpatterns if hasattr(pattern.callback, 'async_cls'))
+    # The views answering conditional GETs have a throttle budget of their own for 304s (see conditional.py)
+    attributes = ('throttle_classes', 'not_modified_throttle_classes')
+    saved = {(view, name): view.__dict__.get(name) for view in views for name in attributes}
+    for view, name in saved:
+        setattr(view, name, [])
+    try:
+        yield
+    finally:
+        for (view, name), throttle_classes in saved.items():
+            if throttle_classes is None:
+                delattr(view, name)
+            else:
+                setattr(view, name, throttle_classes)
+
+
+def seed(menu_items=200, categories=10, customers=20, orders=1000, items_per_order=3):
+    """
+    Fill the benchmark database with a catalog, one user per role (plus extra
+    customers) and orders spread over those customers and the delivery crew.
+    Returns a dict with the created users by role.
+    """
+    from datetime import date, timedelta
+
+    from django.contrib.auth.models import Group, User
+
+    from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+    from LittleLemonAPI.sales import rebuild_sales
+
+    managers = Group.objects.create(name='Manager')
+    crew = Group.objects.create(name='Delivery crew')
+    users = {
+        'manager': User.objects.create_user('bench_manager', password='bench'),
+        'delivery_crew': User.objects.create_user('bench_crew', password='bench'),
+        'customer': User.objects.create_user('bench_customer', password='bench'),
+    }
+    managers.user_set.add(users['manager'])
+    crew.user_set.add(users['delivery_crew'])
+    all_customers = [users['customer']] + [
+        User.objects.create_user(f'bench_customer{i}', password='bench') for i in range(1, customers)
+    ]
+
+    category_objects = Category.objects.bulk_create(
+        Category(slug=f'category-{i}', title=f'Category {i}') for i in range(categories)
+    )
+    menu_item_objects = MenuItem.objects.bulk_create(
+        MenuItem(title=f'Dish {i}', price=5 + i % 20, featured=i % 10 == 0, category=category_objects[i % categories])
+        for i in range(menu_items)
+    )
+    start = date(2023, 1, 1)
+    order_objects = Order.objects.bulk_create(
+        (
+            Order(
+                user=all_customers[i % customers],
+                delivery_crew=users['delivery_crew'] if i % 2 else None,
+                status=i % 4 == 0,
+                total=5 * items_per_order,
+                date=start + timedelta(days=i // 20),
+            )
+            for i in range(orders)
+        ),
+        batch_size=5000,
+    )
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(order=order, menuitem=menu_item_objects[(order.pk + j) % menu_items],
+                      quantity=1, unit_price=5, price=5)
+            for order in order_objects
+            for j in range(items_per_order)
+        ),
+        batch_size=5000,
+    )
+    # The orders were inserted directly, bring the sales aggregates in line with them
+    rebuild_sales()
+    return users
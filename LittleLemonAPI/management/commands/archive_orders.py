@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.archive import ARCHIVE_BATCH_SIZE, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the delivered orders older than ARCHIVE_AFTER_DAYS, with their order items, into the archive "
+        "tables (see LittleLemonAPI/archive.py). Run it daily; it can run while the API serves requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="archive the delivered orders dated before this day (YYYY-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="orders moved per transaction")
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = date.fromisoformat(options['before']) if options['before'] else archive_cutoff()
+        except ValueError:
+            raise CommandError("--before must be a date (YYYY-MM-DD)")
+        moved = archive_orders(cutoff, options['batch_size'])
+        self.stdout.write(f"Archived {moved} order(s) dated before {cutoff}")
@@ -0,0 +1,120 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI.archive import archive_cutoff, archive_orders
+from LittleLemonAPI.models import MenuItem, Category, Order, OrderItem
+from LittleLemonAPI.views import OrdersListCreateView
+from ._bench import bench_database, summarize, timed
+
+# (role, query parameters) of the order list requests measured
+REQUESTS = [
+    ('manager', {}),
+    ('manager', {'ordering': '-date', 'pagination': 'keyset'}),
+    ('delivery_crew', {}),
+    ('delivery_crew', {'ordering': '-date', 'pagination': 'keyset'}),
+    ('customer', {}),
+    ('customer', {'ordering': '-date', 'pagination': 'keyset'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of GET /api/orders per role with every order in the hot table, then after archiving the "
+        "delivered orders older than ARCHIVE_AFTER_DAYS (see LittleLemonAPI/archive.py), for the default "
+        "listings and for ?history=true, which reads the hot and the archived orders together."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=730, help="the orders are spread over this many days up to today")
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            users = self.seed(options['orders'], options['days'], options['customers'])
+            # p50 ms: every order in the hot table, after archiving, after archiving with ?history=true
+            self.stdout.write(f"{'role':>14} {'parameters':<42} {'unarchived':>10} {'archived':>10} {'history':>10}")
+            before = [self.measure(users[role], params, options['repeat']) for role, params in REQUESTS]
+            elapsed, moved = timed(archive_orders)
+            after = [self.measure(users[role], params, options['repeat']) for role, params in REQUESTS]
+            history = [
+                self.measure(users[role], {**params, 'history': 'true'}, options['repeat']) for role, params in REQUESTS
+            ]
+            for (role, params), *samples in zip(REQUESTS, before, after, history):
+                label = '&'.join(f'{name}={value}' for name, value in params.items()) or '(default)'
+                self.stdout.write(
+                    f"{role:>14} {label:<42} " + ' '.join(
+                        f"{summarize(sample)['p50']:>10.2f}" for sample in samples
+                    ) + ' ms'
+                )
+            self.stdout.write(
+                f"Archived {moved} of {options['orders']} orders in {elapsed / 1000:.1f} s "
+                f"({moved / (elapsed / 1000):.0f} orders/s), {Order.objects.count()} left in the hot table"
+            )
+
+    def seed(self, orders, days, customers):
+        manager = User.objects.create_user('bench_manager', password='bench')
+        crew = User.objects.create_user('bench_crew', password='bench')
+        Group.objects.create(name='Manager').user_set.add(manager)
+        Group.objects.create(name='Delivery crew').user_set.add(crew)
+        customer_ids = [
+            user.pk for user in User.objects.bulk_create(User(username=f'bench_customer{i}') for i in range(customers))
+        ]
+        category = Category.objects.create(slug='mains', title='Mains')
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Dish {i}', price=5, featured=False, category=category) for i in range(20)
+        )
+        start = time.perf_counter()
+        first_day = date.today() - timedelta(days=days)
+        recent = date.today() - timedelta(days=2)
+        # Oldest first, as checkout writes them: everything but the last two days is delivered
+        Order.objects.bulk_create(
+            (
+                Order(
+                    user_id=customer_ids[i % customers],
+                    delivery_crew=crew if i % 2 else None,
+                    status=first_day + timedelta(days=i * days // orders) < recent,
+                    total=10,
+                    date=first_day + timedelta(days=i * days // orders),
+                )
+                for i in range(orders)
+            ),
+            batch_size=5000,
+        )
+        order_ids = Order.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000)
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(order_id=order_id, menuitem=menu_items[(order_id + j) % len(menu_items)],
+                          quantity=1, unit_price=5, price=5)
+                for order_id in order_ids
+                for j in range(2)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f"Seeded {orders} orders over {days} days in {time.perf_counter() - start:.0f} s, "
+            f"the hot window starts {archive_cutoff()}"
+        )
+        return {
+            'manager': manager,
+            'delivery_crew': crew,
+            # A customer with an order in the hot window
+            'customer': User.objects.get(pk=Order.objects.latest('pk').user_id),
+        }
+
+    def measure(self, user, params, repeat):
+        view = OrdersListCreateView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        samples = []
+        for _ in range(repeat):
+            request = factory.get('/api/orders', params)
+            force_authenticate(request, user=user)
+            elapsed, response = timed(view, request)
+            assert response.status_code == 200, response.data
+            samples.append(elapsed)
+        return samples
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import importlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.urls import clear_url_caches
+from rest_framework.authtoken.models import Token
+
+from LittleLemonAPI.throttles import TokenBucketThrottle
+from ._bench import bench_database, seed, summarize
+
+# (name, role, path, query parameters)
+SCENARIOS = [
+    ('menu-items anonymous', None, '/api/menu-items', {}),
+    ('menu-items search', 'customer', '/api/menu-items', {'search': 'dish 1'}),
+    ('categories', 'customer', '/api/categories', {}),
+    ('cart', 'customer', '/api/cart/menu-items', {}),
+    ('orders customer', 'customer', '/api/orders', {'ordering': '-date'}),
+    ('orders crew', 'delivery_crew', '/api/orders', {}),
+    ('orders manager keyset', 'manager', '/api/orders', {'pagination': 'keyset', 'ordering': '-date'}),
+]
+
+
+@contextmanager
+def async_read_views(enabled):
+    """Rebuild the URL conf with ASYNC_READ_VIEWS on or off (it is read when the URL conf is imported)."""
+    from LittleLemon import urls as project_urls
+    from LittleLemonAPI import urls as api_urls
+
+    def rebuild():
+        importlib.reload(api_urls)
+        importlib.reload(project_urls)
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_READ_VIEWS=enabled):
+            rebuild()
+            yield
+    finally:
+        rebuild()
+
+
+def wsgi_request(handler, environ):
+    """One request through the WSGI handler, returns (status code, body)."""
+    status = []
+    response = handler(dict(environ), lambda code, headers: status.append(code))
+    try:
+        body = b''.join(response)
+    finally:
+        response.close() # sends request_finished, like a WSGI server does
+    return int(status[0].split()[0]), body
+
+
+async def asgi_request(handler, scope):
+    """One request through the ASGI handler, returns (status code, body)."""
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait() # the client stays connected
+
+    async def send(message):
+        messages.append(message)
+
+    await handler(scope, receive, send)
+    body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return messages[0]['status'], body
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput of the read endpoints under concurrent clients, served by Django's WSGI handler from a "
+        "thread pool (like gunicorn --threads) and by its ASGI handler from one event loop, with the sync "
+        "views and with the async menu-items, categories, cart and orders GETs. Throttles stay on, at a rate "
+        "high enough never to refuse a request, so their cost is part of every request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="requests per scenario and server")
+        parser.add_argument('--clients', type=int, default=32, help="concurrent clients")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+        parser.add_argument('--menu-items', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rates = {scope: '1000000/s' for scope in TokenBucketThrottle.THROTTLE_RATES}
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(THROTTLE_STORE_PATH=os.path.join(directory, 'throttle.sqlite3')):
+            # A database file rather than memory, the WSGI threads each open their own connection
+            with bench_database(os.path.join(directory, 'bench.sqlite3')):
+                users = seed(menu_items=options['menu_items'], orders=options['orders'])
+                tokens = {role: Token.objects.create(user=user).key for role, user in users.items()}
+                with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates):
+                    self.run(tokens, options)
+
+    def run(self, tokens, options):
+        self.stdout.write(
+            f"{'scenario':>24} {'server':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for name, role, path, params in SCENARIOS:
+            headers = {'HTTP_AUTHORIZATION': f'Token {tokens[role]}'} if role else {}
+            environ = RequestFactory().get(path, params, **headers).environ
+            scope = self.scope(path, params, headers)
+            bodies = set()
+            # ASGI with the sync views tells the async views' share apart from the server's
+            for server, async_views, run in (
+                ('wsgi', False, lambda: self.run_wsgi(environ, options)),
+                ('asgi-sync', False, lambda: asyncio.run(self.run_asgi(scope, options))),
+                ('asgi', True, lambda: asyncio.run(self.run_asgi(scope, options))),
+            ):
+                with async_read_views(async_views):
+                    bodies.add(self.report(name, server, run()))
+            if len(bodies) > 1:
+                raise CommandError(f"{name}: the WSGI and ASGI responses differ")
+
+    def report(self, name, server, result):
+        elapsed, samples, statuses, body = result
+        if statuses != {200}:
+            raise CommandError(f"{name} ({server}) answered {sorted(statuses)}")
+        stats = summarize(samples)
+        self.stdout.write(
+            f"{name:>24} {server:>9} {len(samples) / elapsed:>9.0f} {stats['p50']:>8.2f} {stats['p99']:>8.2f}"
+        )
+        return hashlib.sha1(body).hexdigest()
+
+    def run_wsgi(self, environ, options):
+        handler = WSGIHandler()
+        cache.clear()
+        wsgi_request(handler, environ) # warm up
+
+        def request(_):
+            start = time.perf_counter()
+            status, body = wsgi_request(handler, environ)
+            return (time.perf_counter() - start) * 1000, status, body
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            results = list(pool.map(request, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        return elapsed, [r[0] for r in results], {r[1] for r in results}, results[-1][2]
+
+    async def run_asgi(self, scope, options):
+        handler = ASGIHandler()
+        cache.clear()
+        await asgi_request(handler, scope) # warm up
+        results = []
+
+        async def client(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                status, body = await asgi_request(handler, dict(scope))
+                results.append(((time.perf_counter() - start) * 1000, status, body))
+
+        clients = options['clients']
+        counts = [options['requests'] // clients + (i < options['requests'] % clients) for i in range(clients)]
+        start = time.perf_counter()
+        await asyncio.gather(*(client(count) for count in counts))
+        elapsed = time.perf_counter() - start
+        return elapsed, [r[0] for r in results], {r[1] for r in results}, results[-1][2]
+
+    @staticmethod
+    def scope(path, params, headers):
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': urlencode(params).encode(),
+            'root_path': '',
+            'headers': [(b'host', b'testserver')] + [
+                (b'authorization', value.encode()) for value in headers.values()
+            ],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
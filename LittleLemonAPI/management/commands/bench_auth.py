@@ -0,0 +1,46 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from LittleLemonAPI.authentication import CachedTokenAuthentication
+from LittleLemonAPI.roles import get_roles
+from ._bench import bench_database, summarize, timed
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request cost of token authentication (plus role lookup) with and without the token cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options['requests'])
+
+    def run(self, requests):
+        user = User.objects.create_user('bench_manager', password='bench')
+        Group.objects.create(name='Manager').user_set.add(user)
+        token = Token.objects.create(user=user)
+        request = APIRequestFactory().get('/api/orders', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.stdout.write(f"{'authentication':>28} {'mean us':>10} {'p99 us':>10} {'queries/req':>12}")
+        for authentication in (TokenAuthentication(), CachedTokenAuthentication()):
+            def authenticate():
+                user, _ = authentication.authenticate(request)
+                # Views check the user's roles on almost every request
+                return get_roles(user)
+
+            authenticate() # warm up
+            samples = []
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(requests):
+                    samples.append(timed(authenticate)[0] * 1000)
+            stats = summarize(samples)
+            self.stdout.write(
+                f"{type(authentication).__name__:>28} {stats['mean']:>10.1f} {stats['p99']:>10.1f} "
+                f"{len(queries) / requests:>12.2f}"
+            )
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI.jobs import run_jobs
+from LittleLemonAPI.models import Cart, Category, MenuItem
+from LittleLemonAPI.views import OrdersListCreateView
+from ._bench import bench_database, summarize, timed
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure checkout (POST /api/orders) latency as the cart grows, with the sales aggregates "
+        "updated inside the request (JOB_QUEUE = False) and on the job queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50, 100, 500])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options['sizes'], options['repeat'])
+
+    def run(self, sizes, repeat):
+        customer = User.objects.create_user('bench_customer', password='bench')
+        category = Category.objects.create(slug='bench', title='Bench')
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i}', price=1, featured=False, category=category)
+            for i in range(max(sizes))
+        )
+        # Throttling is per class, not per benchmark; keep it out of the numbers
+        view = OrdersListCreateView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+
+        def checkout(size):
+            Cart.objects.bulk_create(
+                Cart(user=customer, menuitem=item, quantity=1, unit_price=1, price=1)
+                for item in menu_items[:size]
+            )
+            request = factory.post('/api/orders')
+            force_authenticate(request, user=customer)
+            elapsed, response = timed(view, request)
+            assert response.status_code == 200, response.data
+            # The worker's share, untimed: in production it runs in its own process
+            run_jobs()
+            return elapsed
+
+        self.stdout.write(
+            f"{'cart size':>10} {'inline p50':>11} {'inline p99':>11} {'queued p50':>11} {'queued p99':>11}"
+        )
+        for size in sizes:
+            inline, queued = [], []
+            # Alternate the two modes so drift during the run affects both alike
+            for _ in range(repeat):
+                with override_settings(JOB_QUEUE=False):
+                    inline.append(checkout(size))
+                queued.append(checkout(size))
+            inline, queued = summarize(inline), summarize(queued)
+            self.stdout.write(
+                f"{size:>10} {inline['p50']:>11.2f} {inline['p99']:>11.2f} {queued['p50']:>11.2f} {queued['p99']:>11.2f}"
+            )
@@ -0,0 +1,233 @@
+import json
+import logging
+import platform
+import time
+
+import django
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from LittleLemonAPI import urls
+from LittleLemonAPI.conditional import make_etag
+from LittleLemonAPI.models import Cart, MenuItem, Order, OrderItem
+from ._bench import bench_database, seed, summarize, throttles_disabled
+
+ROLES = ['anonymous', 'customer', 'delivery_crew', 'manager']
+
+
+class Scenario:
+    """One request shape: a role calling a method on a path, with an optional untimed setup step."""
+
+    def __init__(self, name, role, method, path, data=None, before=None, params=None, headers=None):
+        self.name = name
+        self.role = role
+        self.method = method
+        self.path = path
+        self.data = data
+        self.before = before
+        self.params = params
+        self.headers = headers or {}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every route in LittleLemonAPI/urls.py as each role on a freshly seeded database and report "
+        "throughput, p50/p95/p99 latency and queries per request. Throttles are disabled for the run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="timed requests per scenario")
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--menu-items', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--only', help="run only the scenarios whose name contains this text")
+        parser.add_argument('--output', help="write the results to this JSON file")
+        parser.add_argument('--compare', help="compare the results with an earlier --output file")
+
+    def handle(self, *args, **options):
+        # Scenarios that are refused on purpose (e.g. anonymous GET orders) would log every request
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with bench_database(), throttles_disabled():
+            users = seed(menu_items=options['menu_items'], orders=options['orders'])
+            clients = self.clients(users)
+            scenarios = self.scenarios(users)
+            self.check_coverage(scenarios)
+            if options['only']:
+                scenarios = [s for s in scenarios if options['only'] in s.name]
+            results = {}
+            for scenario in scenarios:
+                results[scenario.name] = self.run(clients[scenario.role], scenario, options['requests'], options['warmup'])
+                self.report(scenario.name, results[scenario.name])
+
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'requests': options['requests'],
+                'menu_items': options['menu_items'],
+                'orders': options['orders'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def clients(self, users):
+        clients = {'anonymous': APIClient()}
+        for role, user in users.items():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+            clients[role] = client
+        superuser = User.objects.create_superuser('bench_admin', password='bench')
+        clients['superuser'] = APIClient()
+        clients['superuser'].credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=superuser).key}')
+        return clients
+
+    def scenarios(self, users):
+        customer, crew, manager = users['customer'], users['delivery_crew'], users['manager']
+        menu_item = MenuItem.objects.order_by('id').first()
+        crew_order = Order.objects.filter(delivery_crew=crew).order_by('id').first()
+        customer_order = Order.objects.filter(user=customer).order_by('id').first()
+        crew_orders = list(Order.objects.filter(delivery_crew=crew).order_by('id').values_list('id', flat=True)[:50])
+        spare = User.objects.create_user('bench_spare', password='bench')
+        managers = Group.objects.get(name='Manager')
+        delivery_crew = Group.objects.get(name='Delivery crew')
+
+        def fill_cart():
+            Cart.objects.filter(user=customer).delete()
+            Cart.objects.bulk_create(
+                Cart(user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                for item in MenuItem.objects.order_by('id')[:3]
+            )
+
+        def new_order():
+            order = Order.objects.create(user=customer, total=5, date=customer_order.date)
+            OrderItem.objects.create(order=order, menuitem=menu_item, quantity=1, unit_price=5, price=5)
+            return order
+
+        scenarios = []
+        for role in ROLES:
+            scenarios += [
+                Scenario(f'{role} GET menu-items', role, 'get', '/api/menu-items'),
+                Scenario(f'{role} GET menu-items sorted page 2', role, 'get', '/api/menu-items',
+                         params={'ordering': '-price', 'page': 2}),
+                Scenario(f'{role} GET categories', role, 'get', '/api/categories'),
+                Scenario(f'{role} GET menu-items/<pk>', role, 'get', f'/api/menu-items/{menu_item.pk}'),
+                Scenario(f'{role} GET orders', role, 'get', '/api/orders'),
+            ]
+        scenarios += [
+            Scenario('customer GET cart/menu-items', 'customer', 'get', '/api/cart/menu-items', before=fill_cart),
+            Scenario('customer POST cart/menu-items', 'customer', 'post', '/api/cart/menu-items',
+                     data={'menuitem': menu_item.pk, 'quantity': 1, 'unit_price': '5.00', 'price': '5.00'},
+                     before=lambda: Cart.objects.filter(user=customer).delete()),
+            Scenario('customer DELETE cart/menu-items', 'customer', 'delete', '/api/cart/menu-items', before=fill_cart),
+            Scenario('customer POST orders (checkout)', 'customer', 'post', '/api/orders', before=fill_cart),
+            Scenario('customer GET orders/<pk>', 'customer', 'get', f'/api/orders/{customer_order.pk}'),
+            Scenario('customer GET orders/<pk> (304)', 'customer', 'get', f'/api/orders/{customer_order.pk}',
+                     headers={'HTTP_IF_NONE_MATCH': make_etag(customer_order.updated_at, 'json')}),
+            Scenario('customer GET menu-items/<pk> (304)', 'customer', 'get', f'/api/menu-items/{menu_item.pk}',
+                     headers={'HTTP_IF_NONE_MATCH': make_etag(menu_item.updated_at, 'json')}),
+            Scenario('delivery_crew PATCH orders/<pk>', 'delivery_crew', 'patch', f'/api/orders/{crew_order.pk}',
+                     data={'status': True}),
+            Scenario('delivery_crew POST orders/status', 'delivery_crew', 'post', '/api/orders/status',
+                     data={'orders': crew_orders, 'status': True}),
+            Scenario('manager PATCH orders/<pk>', 'manager', 'patch', f'/api/orders/{crew_order.pk}',
+                     data={'delivery_crew': crew.pk}),
+            Scenario('manager DELETE orders/<pk>', 'manager', 'delete', lambda: f'/api/orders/{new_order().pk}'),
+            Scenario('manager GET orders/export', 'manager', 'get', '/api/orders/export'),
+            Scenario('manager POST orders/dispatch', 'manager', 'post', '/api/orders/dispatch',
+                     before=lambda: [new_order() for _ in range(20)]),
+            Scenario('manager GET reports/sales', 'manager', 'get', '/api/reports/sales'),
+            Scenario('superuser GET debug/traces', 'superuser', 'get', '/api/debug/traces'),
+            Scenario('superuser GET debug/replica', 'superuser', 'get', '/api/debug/replica'),
+            Scenario('manager POST menu-items', 'manager', 'post', '/api/menu-items',
+                     data={'title': 'Special', 'price': '9.99', 'featured': False,
+                           'category_id': menu_item.category_id}),
+            Scenario('manager PATCH menu-items/<pk>', 'manager', 'patch', f'/api/menu-items/{menu_item.pk}',
+                     data={'featured': True}),
+            Scenario('manager POST categories', 'manager', 'post', '/api/categories',
+                     data={'slug': 'specials', 'title': 'Specials'}),
+            Scenario('manager GET groups/manager/users', 'manager', 'get', '/api/groups/manager/users'),
+            Scenario('manager POST groups/manager/users', 'manager', 'post', '/api/groups/manager/users',
+                     data={'username': spare.username}, before=lambda: managers.user_set.remove(spare)),
+            Scenario('manager DELETE groups/manager/users/<pk>', 'manager', 'delete',
+                     f'/api/groups/manager/users/{spare.pk}', before=lambda: managers.user_set.add(spare)),
+            Scenario('manager GET groups/delivery-crew/users', 'manager', 'get', '/api/groups/delivery-crew/users'),
+            Scenario('manager POST groups/delivery-crew/users', 'manager', 'post', '/api/groups/delivery-crew/users',
+                     data={'username': spare.username}, before=lambda: managers.user_set.remove(spare)),
+            Scenario('manager DELETE groups/delivery-crew/users/<pk>', 'manager', 'delete',
+                     f'/api/groups/delivery-crew/users/{spare.pk}', before=lambda: delivery_crew.user_set.add(spare)),
+        ]
+        return scenarios
+
+    def check_coverage(self, scenarios):
+        """Every route in LittleLemonAPI/urls.py must be driven by at least one scenario."""
+        covered = set()
+        for scenario in scenarios:
+            path = scenario.path() if callable(scenario.path) else scenario.path
+            covered.add(resolve(path).route)
+        missing = [str(pattern.pattern) for pattern in urls.urlpatterns if 'api/' + str(pattern.pattern) not in covered]
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(missing)}")
+
+    def run(self, client, scenario, requests, warmup):
+        samples, queries, statuses = [], 0, {}
+        for i in range(warmup + requests):
+            if scenario.before:
+                scenario.before()
+            path = scenario.path() if callable(scenario.path) else scenario.path
+            data = scenario.params if scenario.method == 'get' else scenario.data
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(client, scenario.method)(
+                    path, data, format=None if scenario.method == 'get' else 'json', **scenario.headers
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+            if i >= warmup:
+                samples.append(elapsed)
+                queries += len(captured)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        stats = summarize(samples)
+        return {
+            'throughput': len(samples) / (sum(samples) / 1000),
+            'p50': stats['p50'],
+            'p95': stats['p95'],
+            'p99': stats['p99'],
+            'queries_per_request': queries / len(samples),
+            'status': {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    def report(self, name, result):
+        statuses = ' '.join(f'{code}x{count}' for code, count in result['status'].items())
+        self.stdout.write(
+            f"{name:<48} {result['throughput']:>8.1f} req/s  p50 {result['p50']:>7.2f}  p95 {result['p95']:>7.2f}  "
+            f"p99 {result['p99']:>7.2f} ms  {result['queries_per_request']:>5.1f} q/req  {statuses}"
+        )
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        self.stdout.write(f"\nCompared with {path} (negative is faster):")
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            self.stdout.write(
+                f"{name:<48} p50 {self.change(before['p50'], result['p50'])}  p99 {self.change(before['p99'], result['p99'])}"
+                f"  q/req {before['queries_per_request']:.1f} -> {result['queries_per_request']:.1f}"
+            )
+
+    @staticmethod
+    def change(before, after):
+        return f"{(after - before) / before * 100:>+7.1f}%"
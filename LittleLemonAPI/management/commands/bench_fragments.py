@@ -0,0 +1,86 @@
+import gc
+from contextlib import nullcontext
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.catalog import bump_catalog_version
+from LittleLemonAPI.fieldsets import SparseFieldsetMixin
+from LittleLemonAPI.fragments import FragmentCacheMixin, fragment_cache
+from LittleLemonAPI.pagination import PageNumberOrKeysetPagination
+from ._bench import bench_database, seed, summarize, throttles_disabled
+
+# (name, patch that selects the path, whether the fragment cache is emptied before every request)
+MODES = [
+    ('serializer', lambda: mock.patch.object(SparseFieldsetMixin, 'get_values_serializer', return_value=None), False),
+    ('values', lambda: mock.patch.object(FragmentCacheMixin, 'get_fragment_serializer', return_value=None), False),
+    ('fragments cold', nullcontext, True),
+    ('fragments warm', nullcontext, False),
+]
+
+
+def phases(response):
+    """The Server-Timing durations of a response, by name."""
+    durations = {}
+    for metric in response['Server-Timing'].split(','):
+        name, *params = metric.strip().split(';')
+        durations[name] = next(float(param[4:]) for param in params if param.startswith('dur='))
+    return durations
+
+
+class Command(BaseCommand):
+    help = (
+        "Render cost of a GET /api/menu-items page (serialize + render, from the Server-Timing header) "
+        "on the serializer path, the .values() path and the JSON fragment cache, cold and warm. "
+        "The catalog response cache is bypassed for every request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=2000)
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        # Page number pages have the fixed PAGE_SIZE, let the benchmark choose it
+        page_size = mock.patch.multiple(PageNumberOrKeysetPagination, page_size_query_param='page_size', max_page_size=None)
+        with bench_database(), throttles_disabled(), page_size:
+            seed(menu_items=options['menu_items'], orders=10)
+            self.run(options['page_sizes'], options['repeat'], options['menu_items'])
+
+    def run(self, page_sizes, repeat, menu_items):
+        client = APIClient()
+        self.stdout.write(f"{'mode':>16} {'page size':>10} {'render p50 ms':>14} {'total p50 ms':>13} {'per item us':>12}")
+        for page_size in page_sizes:
+            # Cycle over the first pages, which a warm-up round puts in the fragment cache
+            pages = max(1, min(10, menu_items // page_size))
+            expected = None
+            for name, patch, cold in MODES:
+                render_samples, total_samples = [], []
+
+                def get(page):
+                    bump_catalog_version() # never answered from the catalog response cache
+                    response = client.get('/api/menu-items', {'ordering': 'title', 'page_size': page_size, 'page': page})
+                    if response.status_code != 200:
+                        raise CommandError(f"{name}: {response.status_code} {response.content[:200]}")
+                    return response
+
+                with patch():
+                    for page in range(1, pages + 1):
+                        get(page)
+                    for i in range(repeat):
+                        if cold:
+                            fragment_cache.clear()
+                        gc.collect()
+                        durations = phases(get(i % pages + 1))
+                        render_samples.append(durations.get('serialize', 0) + durations.get('render', 0))
+                        total_samples.append(durations['total'])
+                    last = get(1).content
+                if expected is not None and last != expected:
+                    raise CommandError(f"{name}: the page differs from the serializer path")
+                expected = last
+                render_ms = summarize(render_samples)['p50']
+                self.stdout.write(
+                    f"{name:>16} {page_size:>10} {render_ms:>14.2f} {summarize(total_samples)['p50']:>13.2f} "
+                    f"{render_ms * 1000 / page_size:>12.1f}"
+                )
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI.models import Order
+from LittleLemonAPI.pagination import KeysetPagination
+from LittleLemonAPI.views import OrdersListCreateView
+from ._bench import bench_database, summarize, timed
+
+
+class Command(BaseCommand):
+    help = "Compare page number and keyset pagination latency of GET /api/orders at increasing depth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options['orders'], options['repeat'])
+
+    def run(self, orders, repeat):
+        manager = User.objects.create_user('bench_manager', password='bench')
+        Group.objects.create(name='Manager').user_set.add(manager)
+        customer = User.objects.create_user('bench_customer', password='bench')
+        start = date(2020, 1, 1)
+        Order.objects.bulk_create(
+            (Order(user=customer, total=10, date=start + timedelta(days=i // 50)) for i in range(orders)),
+            batch_size=5000,
+        )
+
+        view = OrdersListCreateView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        keyset = KeysetPagination()
+        keyset.ordering = ['-date', '-id']
+        keyset.nullable = set()
+        # Both modes use the default PAGE_SIZE so the pages are the same size
+        page_size = keyset.page_size
+
+        def get(params):
+            request = factory.get('/api/orders', params)
+            force_authenticate(request, user=manager)
+            elapsed, response = timed(view, request)
+            assert response.status_code == 200, response.data
+            return elapsed
+
+        self.stdout.write(f"{'depth (rows)':>14} {'page p50 ms':>12} {'keyset p50 ms':>14}")
+        for fraction in (0, 0.25, 0.5, 0.75, 0.99):
+            offset = int(orders * fraction) // page_size * page_size
+            # The cursor a client would hold after walking to this depth
+            params = {'pagination': 'keyset', 'ordering': '-date'}
+            if offset:
+                last = Order.objects.order_by('-date', '-id')[offset - 1]
+                params['cursor'] = keyset.encode_cursor([last.date, last.id])
+            page_samples = []
+            keyset_samples = []
+            for _ in range(repeat):
+                page_samples.append(get({'ordering': '-date', 'page': offset // page_size + 1}))
+                keyset_samples.append(get(params))
+            self.stdout.write(
+                f"{offset:>14} {summarize(page_samples)['p50']:>12.2f} {summarize(keyset_samples)['p50']:>14.2f}"
+            )
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import Cart, MenuItem
+from LittleLemonAPI.replica import REPLICA, replica_configured, replica_state, sync_replica
+from ._bench import bench_database, seed, summarize, throttles_disabled, timed
+from .bench_sqlite_writes import PRODUCTION
+
+
+def reader(manager_id, deadline):
+    """List the orders as a manager until the deadline; returns the latencies (ms)."""
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=manager_id))
+    samples = []
+    while time.time() < deadline:
+        elapsed, response = timed(client.get, '/api/orders', {'pagination': 'keyset', 'ordering': '-date'})
+        assert response.status_code == 200, response.status_code
+        samples.append(elapsed)
+    connections.close_all()
+    return samples
+
+
+def writer(customer_id, menu_item_ids, deadline):
+    """Fill the cart and check out until the deadline; returns the checkout latencies (ms)."""
+    customer = User.objects.get(pk=customer_id)
+    menu_items = list(MenuItem.objects.filter(pk__in=menu_item_ids))
+    client = APIClient()
+    client.force_authenticate(customer)
+    samples = []
+    while time.time() < deadline:
+        Cart.objects.bulk_create(
+            Cart(user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price) for item in menu_items
+        )
+        elapsed, response = timed(client.post, '/api/orders')
+        assert response.status_code == 200, response.status_code
+        samples.append(elapsed)
+    connections.close_all()
+    return samples
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of the order listing (GET /api/orders as a manager) from several processes while others check "
+        "out carts, with every read on the primary and with the reads on a replica synced every --sync-interval "
+        "seconds. Production database profile (concurrent writers need it). Needs LITTLELEMON_READ_REPLICA=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--sync-interval', type=float, default=1.0)
+        parser.add_argument('--orders', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database is configured, set LITTLELEMON_READ_REPLICA=1")
+        self.stdout.write(f"{'reads from':>10} {'reads/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'checkouts/s':>12} {'p99 ms':>8}")
+        with tempfile.TemporaryDirectory() as directory, override_settings(**PRODUCTION):
+            # Both databases are files, the replica a copy of the primary
+            connections[REPLICA].settings_dict['NAME'] = os.path.join(directory, 'replica.sqlite3')
+            state = override_settings(REPLICA_STATE_PATH=os.path.join(directory, 'state.sqlite3'))
+            with bench_database(os.path.join(directory, 'primary.sqlite3')), state, throttles_disabled():
+                users = seed(customers=options['writers'], orders=options['orders'])
+                for mode in ('primary', 'replica'):
+                    self.run(mode, users, options)
+
+    def run(self, mode, users, options):
+        replica_state.clear() # never synced: every read goes to the primary
+        if mode == 'replica':
+            sync_replica()
+        menu_items = list(MenuItem.objects.values_list('pk', flat=True)[:3])
+        customers = User.objects.filter(username__startswith='bench_customer').values_list('pk', flat=True)
+        # Each forked process must open its own connection
+        connections.close_all()
+
+        deadline = time.time() + options['seconds']
+        with multiprocessing.get_context('fork').Pool(options['readers'] + options['writers']) as pool:
+            reads = pool.starmap_async(reader, [(users['manager'].pk, deadline)] * options['readers'])
+            writes = pool.starmap_async(writer, [(customer, menu_items, deadline) for customer in customers])
+            while mode == 'replica' and time.time() < deadline:
+                sync_replica()
+                time.sleep(options['sync_interval'])
+            reads = [sample for samples in reads.get() for sample in samples]
+            writes = [sample for samples in writes.get() for sample in samples]
+        read_stats, write_stats = summarize(reads), summarize(writes)
+        self.stdout.write(
+            f"{mode:>10} {len(reads) / options['seconds']:>8.1f} {read_stats['p50']:>8.2f} "
+            f"{read_stats['p99']:>8.2f} {len(writes) / options['seconds']:>12.1f} {write_stats['p99']:>8.2f}"
+        )
@@ -0,0 +1,77 @@
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.search import MenuItemSearchFilter
+from LittleLemonAPI.views import MenuItemsView
+from ._bench import bench_database, summarize, timed
+
+WORDS = [
+    'lemon', 'chicken', 'grilled', 'roasted', 'greek', 'salad', 'bruschetta', 'tomato', 'basil', 'feta',
+    'olive', 'lamb', 'souvlaki', 'pita', 'hummus', 'falafel', 'garlic', 'spinach', 'pie', 'baklava',
+    'honey', 'walnut', 'yogurt', 'cucumber', 'pepper', 'shrimp', 'octopus', 'calamari', 'rice', 'orzo',
+]
+CATEGORIES = ['Starters', 'Mains', 'Desserts', 'Drinks', 'Sides', 'Icecream', 'Salads', 'Seafood']
+TERMS = ['lemon', 'chick', 'greek salad', 'bakl', 'Icecream', 'octopus gar']
+
+
+class Command(BaseCommand):
+    help = "Compare ?search= on menu items (full-text index) with LIKE scans on a large catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options['items'], options['repeat'])
+
+    def run(self, items, repeat):
+        rng = random.Random(42)
+        # A realistic vocabulary is large: pad the dish words with made up ones so that
+        # a search term matches a small share of the catalog, as it would in practice
+        syllables = ['ka', 'lo', 'mi', 'ta', 're', 'so', 'pa', 'ni', 'vo', 'de', 'ri', 'fu']
+        vocabulary = WORDS + list({''.join(rng.choices(syllables, k=4)) for _ in range(5000)})
+        categories = Category.objects.bulk_create(Category(slug=title.lower(), title=title) for title in CATEGORIES)
+        MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    title=' '.join(rng.sample(vocabulary, 3)).title(),
+                    price=rng.randint(2, 30),
+                    featured=False,
+                    category=rng.choice(categories),
+                )
+                for _ in range(items)
+            ),
+            batch_size=5000,
+        )
+
+        queryset = MenuItem.objects.select_related('category')
+        factory = APIRequestFactory()
+        view = MenuItemsView()
+
+        def fts(term):
+            request = Request(factory.get('/api/menu-items', {'search': term}))
+            return MenuItemSearchFilter().filter_queryset(request, queryset, view)
+
+        strategies = {
+            'full-text index': fts,
+            'title icontains': lambda term: queryset.filter(title__icontains=term),
+            'slug startswith (old)': lambda term: queryset.filter(category__slug__startswith=term.lower()),
+        }
+
+        self.stdout.write(f"{items} menu items, first page (PAGE_SIZE rows) + COUNT, p50 ms")
+        self.stdout.write(f"{'term':>14} " + ' '.join(f'{name:>22}' for name in strategies))
+        for term in TERMS:
+            row = []
+            for build in strategies.values():
+                def page():
+                    results = build(term)
+                    return results.count(), list(results[:MenuItemsView.pagination_class.page_size])
+                samples = [timed(page)[0] for _ in range(repeat)]
+                matches = page()[0]
+                row.append(f"{summarize(samples)['p50']:>12.2f} ({matches:>6})")
+            self.stdout.write(f"{term:>14} " + ' '.join(f'{cell:>22}' for cell in row))
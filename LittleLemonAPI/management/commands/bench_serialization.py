@@ -0,0 +1,82 @@
+import gc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI.fieldsets import ValuesSerializer
+from LittleLemonAPI.models import Cart, MenuItem, Order
+from LittleLemonAPI.serializers import CartItemSerializer, MenuItemSerializer, OrderSerializer
+from ._bench import bench_database, seed, summarize, timed
+
+# (name, serializer class, serializer kwargs (?fields= / ?expand=), queryset)
+SCENARIOS = [
+    ('menu-items', MenuItemSerializer, {}, lambda: MenuItem.objects.select_related('category')),
+    ('menu-items flat', MenuItemSerializer, {'expand': []}, lambda: MenuItem.objects.select_related('category')),
+    ('menu-items id,title', MenuItemSerializer, {'fields': ['id', 'title']}, lambda: MenuItem.objects.all()),
+    ('orders', OrderSerializer, {},
+     lambda: Order.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')),
+    ('orders flat', OrderSerializer, {'expand': []},
+     lambda: Order.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')),
+    ('orders id,total', OrderSerializer, {'fields': ['id', 'total']}, lambda: Order.objects.all()),
+    ('cart', CartItemSerializer, {}, lambda: Cart.objects.all()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Cost of rendering list rows, per 10k rows: DRF serializers on model instances against "
+        "fieldsets.ValuesSerializer on .values() rows, both including the queries, for the full "
+        "items and for ?expand= / ?fields= trimmed ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="menu items, orders and cart rows")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with bench_database():
+            users = seed(menu_items=rows, orders=rows)
+            Cart.objects.bulk_create(
+                (Cart(user=users['customer'], menuitem=item, quantity=2, unit_price=item.price, price=2 * item.price)
+                 for item in MenuItem.objects.all()),
+                batch_size=5000,
+            )
+            self.run(rows, options['repeat'])
+
+    def run(self, rows, repeat):
+        per_10k = 10000 / rows
+        self.stdout.write(
+            f"{'scenario':>20} {'drf ms':>9} {'(serialize)':>12} {'values ms':>10} {'speedup':>8}   per 10k rows"
+        )
+        for name, serializer_class, kwargs, queryset in SCENARIOS:
+            values_serializer = ValuesSerializer.for_serializer(serializer_class(**kwargs))
+            if values_serializer is None:
+                raise CommandError(f"{name}: the serializer has no .values() path")
+
+            def drf():
+                instances = list(queryset().order_by('id'))
+                elapsed, data = timed(lambda: serializer_class(instances, many=True, **kwargs).data)
+                return elapsed, data
+
+            def values():
+                return values_serializer.to_representation(values_serializer.values(queryset().order_by('id')))
+
+            drf_samples, serialize_samples, values_samples = [], [], []
+            for _ in range(repeat):
+                gc.collect() # the garbage of the previous run is not charged to the next one
+                elapsed, (serialize_elapsed, drf_data) = timed(drf)
+                drf_samples.append(elapsed)
+                serialize_samples.append(serialize_elapsed)
+                gc.collect()
+                elapsed, values_data = timed(values)
+                values_samples.append(elapsed)
+            if JSONRenderer().render(drf_data) != JSONRenderer().render(values_data):
+                raise CommandError(f"{name}: the two paths render different output")
+
+            drf_ms = summarize(drf_samples)['p50'] * per_10k
+            values_ms = summarize(values_samples)['p50'] * per_10k
+            self.stdout.write(
+                f"{name:>20} {drf_ms:>9.1f} {summarize(serialize_samples)['p50'] * per_10k:>12.1f} "
+                f"{values_ms:>10.1f} {drf_ms / values_ms:>7.1f}x"
+            )
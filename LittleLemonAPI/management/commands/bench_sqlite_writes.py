@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.views import CartItemsView, OrdersListCreateView
+from ._bench import bench_database, summarize, timed
+
+# The PRAGMAs and database OPTIONS of the production database profile, see LittleLemon/settings.py
+PRODUCTION = (
+    {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+    {'transaction_mode': 'IMMEDIATE'},
+)
+DEVELOPMENT = ({}, {})
+
+
+@contextmanager
+def database_options(options):
+    """Add OPTIONS to the default database for the connections opened meanwhile."""
+    saved = connection.settings_dict['OPTIONS']
+    connection.settings_dict['OPTIONS'] = {**saved, **options}
+    try:
+        yield
+    finally:
+        connection.settings_dict['OPTIONS'] = saved
+
+
+def worker(customer_id, menu_item_ids, rounds):
+    """Fill the cart and check out, `rounds` times; returns (latencies ms, locked errors)."""
+    customer = User.objects.get(pk=customer_id)
+    factory = APIRequestFactory()
+    add_to_cart = CartItemsView.as_view(throttle_classes=[])
+    checkout = OrdersListCreateView.as_view(throttle_classes=[])
+    samples, errors = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        try:
+            for menu_item_id in menu_item_ids:
+                request = factory.post('/api/cart/menu-items', {
+                    'menuitem': menu_item_id, 'quantity': 1, 'unit_price': '5.00', 'price': '5.00',
+                })
+                force_authenticate(request, user=customer)
+                add_to_cart(request)
+            request = factory.post('/api/orders')
+            force_authenticate(request, user=customer)
+            checkout(request)
+        except OperationalError:
+            errors += 1
+            # Leave nothing behind for the next round
+            customer.cart_set.all().delete()
+        samples.append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+    return samples, errors
+
+
+class Command(BaseCommand):
+    help = "Concurrent cart + checkout writes from several processes, development vs production SQLite profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--items', type=int, default=3, help="cart items added before each checkout")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'profile':>12} {'checkouts/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7}")
+        for name, (pragmas, database) in (('development', DEVELOPMENT), ('production', PRODUCTION)):
+            with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS=pragmas):
+                with database_options(database), bench_database(os.path.join(directory, 'bench.sqlite3')):
+                    self.run(name, options['processes'], options['rounds'], options['items'])
+
+    def run(self, name, processes, rounds, items):
+        category = Category.objects.create(slug='bench', title='Bench')
+        menu_items = [
+            MenuItem.objects.create(title=f'Item {i}', price=5, featured=False, category=category).pk
+            for i in range(items)
+        ]
+        customers = [User.objects.create_user(f'bench_customer{i}', password='bench').pk for i in range(processes)]
+        # Each forked process must open its own connection
+        connections.close_all()
+
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            elapsed, results = timed(pool.starmap, worker, [(c, menu_items, rounds) for c in customers])
+        samples = [sample for worker_samples, _ in results for sample in worker_samples]
+        errors = sum(worker_errors for _, worker_errors in results)
+        stats = summarize(samples)
+        throughput = (len(samples) - errors) / (elapsed / 1000)
+        self.stdout.write(f"{name:>12} {throughput:>12.1f} {stats['p50']:>8.1f} {stats['p99']:>8.1f} {errors:>7}")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.queryplan import audit
+from ._bench import bench_database, seed, throttles_disabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the hot order and cart requests on a seeded database and check the EXPLAIN QUERY PLAN "
+        "of every query they send for full scans and temporary B-tree sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--verbose-plans', action='store_true', help="print the plan of every query")
+
+    def handle(self, *args, **options):
+        with bench_database(), throttles_disabled():
+            users = seed(orders=options['orders'])
+            clients = {}
+            for role, user in users.items():
+                clients[role] = APIClient()
+                clients[role].force_authenticate(user)
+            findings = audit(clients)
+
+        failed = 0
+        for role, path, params, sql, plan, problems in findings:
+            if not problems and not options['verbose_plans']:
+                continue
+            failed += bool(problems)
+            self.stdout.write(f"{'PROBLEM' if problems else 'ok':<8} {role} GET {path} {params}")
+            self.stdout.write(f"    {sql}")
+            for line in plan:
+                self.stdout.write(f"    {'!!' if line in problems else '  '} {line}")
+        if failed:
+            raise CommandError(f"{failed} hot path queries scan or sort")
+        self.stdout.write(self.style.SUCCESS(f"{len(findings)} queries checked, no full scans or temp B-tree sorts"))
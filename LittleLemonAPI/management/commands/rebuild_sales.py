@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.sales import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the sales aggregates behind /api/reports/sales from the orders. Checkout and order "
+        "deletion keep them current (through the job queue); run this after orders were changed any other way."
+    )
+
+    def handle(self, *args, **options):
+        days, items = rebuild_sales()
+        self.stdout.write(f"Rebuilt the sales of {days} days ({items} menu item rows)")
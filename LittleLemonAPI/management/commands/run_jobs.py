@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.jobs import BATCH_SIZE, purge_jobs, run_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Job queue worker: run the queued jobs (see LittleLemonAPI/jobs.py) in batches as they become due. "
+        "Several workers may run side by side. With --once, drain the due jobs and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="exit once no job is due")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="jobs run per transaction")
+        parser.add_argument('--interval', type=float, default=1.0, help="seconds to wait when no job is due")
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = run_jobs(options['batch_size'])
+                total_done += done
+                total_failed += failed
+                if failed:
+                    self.stderr.write(f"{failed} job(s) failed, see the last_error of the Job rows")
+                if done or failed:
+                    continue
+                # Nothing due: tidy up while idle
+                purge_jobs()
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Ran {total_done} job(s), {total_failed} failed")
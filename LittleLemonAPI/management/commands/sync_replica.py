@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.replica import replica_configured, sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the read replica (see LittleLemonAPI/replica.py) up to date: copy the primary database into it "
+        "every --interval seconds. With --once, copy it once and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true')
+        parser.add_argument('--interval', type=float, default=1.0, help="seconds between the starts of two copies")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database is configured, set LITTLELEMON_READ_REPLICA=1")
+        try:
+            while True:
+                started = time.monotonic()
+                seconds = sync_replica()
+                if options['once']:
+                    self.stdout.write(f"Replica synced in {seconds * 1000:.1f} ms")
+                    break
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
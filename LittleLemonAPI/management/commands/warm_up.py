@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.warmup import warm_up
+from ._bench import bench_database, seed
+
+# Run in a fresh interpreter: start-up time (import of LittleLemon.wsgi, which warms up when
+# LITTLELEMON_WARMUP=1) and the duration of the first and second request to each path
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
+from django.conf import settings
+settings.DATABASES["default"]["NAME"] = sys.argv[1]
+settings.THROTTLE_STORE_PATH = sys.argv[4]
+from LittleLemon.wsgi import application
+result = {"startup": (time.perf_counter() - start) * 1000, "requests": {}}
+for path in json.loads(sys.argv[2]):
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80", "HTTP_HOST": sys.argv[3], "REMOTE_ADDR": "127.0.0.1", "wsgi.url_scheme": "http",
+        "wsgi.input": sys.stdin.buffer, "wsgi.errors": sys.stderr,
+    }
+    samples = []
+    for _ in range(2):
+        status = []
+        request_start = time.perf_counter()
+        b"".join(application(environ, lambda code, headers: status.append(code)))
+        samples.append(((time.perf_counter() - request_start) * 1000, int(status[0].split()[0])))
+    result["requests"][path] = samples
+print(json.dumps(result))
+'''
+
+# The paths the comparison requests, anonymous
+PATHS = ['/api/menu-items', '/api/categories', '/api/menu-items/1', '/api/orders']
+
+
+class Command(BaseCommand):
+    help = (
+        "Warm this process up (see LittleLemonAPI/warmup.py) and report the time of each step. "
+        "With --compare, start fresh processes with the start-up warm-up off and on instead, and report "
+        "their start-up time and the duration of their first (and second) request to a few endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true')
+        parser.add_argument('--rounds', type=int, default=5, help="processes started per mode with --compare")
+
+    def handle(self, *args, **options):
+        if not options['compare']:
+            report = warm_up()
+            for name, ms, detail in report:
+                self.stdout.write(f"{name:>14} {ms:>9.1f} ms  {detail}")
+            self.stdout.write(f"{'total':>14} {sum(ms for _, ms, _ in report):>9.1f} ms")
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            # The children open the file database by name
+            db_path = os.path.join(directory, 'warmup.sqlite3')
+            with bench_database(test_name=db_path):
+                seed(menu_items=500, orders=100)
+                self.compare(db_path, options['rounds'])
+
+    def compare(self, db_path, rounds):
+        host = settings.WARMUP_HOST or 'localhost'
+        self.stdout.write(f"{'warm-up':>8} {'start-up ms':>12} " + ' '.join(f"{path:>20}" for path in PATHS))
+        for warmup in ('0', '1'):
+            results = [self.child(db_path, warmup, host, round) for round in range(rounds)]
+            startup = statistics.median(result['startup'] for result in results)
+            for index, label in ((0, 'first'), (1, 'second')):
+                cells = []
+                for path in PATHS:
+                    ms = statistics.median(result['requests'][path][index][0] for result in results)
+                    cells.append(f"{ms:>13.2f} ms {results[0]['requests'][path][index][1]}")
+                self.stdout.write(
+                    f"{('off' if warmup == '0' else 'on') if index == 0 else '':>8} "
+                    f"{f'{startup:.1f}' if index == 0 else '':>12} "
+                    + ' '.join(f"{cell:>20}" for cell in cells) + f"  {label} request"
+                )
+
+    def child(self, db_path, warmup, host, round):
+        env = {**os.environ, 'LITTLELEMON_WARMUP': warmup, 'LITTLELEMON_WARMUP_HOST': host}
+        # Fresh throttle buckets for every process, the anonymous rates are a few requests per minute
+        throttle_store = os.path.join(os.path.dirname(db_path), f'throttle-{warmup}-{round}.sqlite3')
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD, db_path, json.dumps(PATHS), host, throttle_store],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.splitlines()[-1])
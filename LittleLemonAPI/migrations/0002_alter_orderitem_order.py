@@ -1,23 +1,23 @@
-# Generated by Django 4.1.6 on 2023-02-04 05:51
-
-from django.db import migrations, models
-import django.db.models.deletion
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ("LittleLemonAPI", "0001_initial"),
-    ]
-
-    operations = [
-        migrations.AlterField(
-            model_name="orderitem",
-            name="order",
-            field=models.ForeignKey(
-                on_delete=django.db.models.deletion.CASCADE,
-                related_name="order_items",
-                to="LittleLemonAPI.order",
-            ),
-        ),
-    ]
+# Generated by Django 4.1.6 on 2023-02-04 05:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="orderitem",
+            name="order",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="order_items",
+                to="LittleLemonAPI.order",
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# The full-text index as of this migration. The SQL is copied here rather than imported
+# from LittleLemonAPI.search, so that the migration keeps doing the same thing whatever
+# the app code becomes.
+FTS_TABLE = "LittleLemonAPI_menuitem_fts"
+
+# One row per menu item (rowid = menu item id) with the item title and its category's
+# title and slug, kept in sync with every write to either table by the triggers
+FTS_TRIGGERS = {
+    "menuitem_fts_insert": f"""
+    CREATE TRIGGER IF NOT EXISTS menuitem_fts_insert AFTER INSERT ON LittleLemonAPI_menuitem BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, category_title, category_slug)
+        SELECT NEW.id, NEW.title, title, slug FROM LittleLemonAPI_category WHERE id = NEW.category_id;
+    END
+    """,
+    "menuitem_fts_update": f"""
+    CREATE TRIGGER IF NOT EXISTS menuitem_fts_update AFTER UPDATE OF title, category_id ON LittleLemonAPI_menuitem BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        INSERT INTO {FTS_TABLE} (rowid, title, category_title, category_slug)
+        SELECT NEW.id, NEW.title, title, slug FROM LittleLemonAPI_category WHERE id = NEW.category_id;
+    END
+    """,
+    "menuitem_fts_delete": f"""
+    CREATE TRIGGER IF NOT EXISTS menuitem_fts_delete AFTER DELETE ON LittleLemonAPI_menuitem BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+    END
+    """,
+    "category_fts_update": f"""
+    CREATE TRIGGER IF NOT EXISTS category_fts_update AFTER UPDATE OF title, slug ON LittleLemonAPI_category BEGIN
+        UPDATE {FTS_TABLE} SET category_title = NEW.title, category_slug = NEW.slug
+        WHERE rowid IN (SELECT id FROM LittleLemonAPI_menuitem WHERE category_id = NEW.id);
+    END
+    """,
+}
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite's, other databases search with SearchFilter (see LittleLemonAPI.search)
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, category_title, category_slug, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for trigger in FTS_TRIGGERS.values():
+        schema_editor.execute(trigger)
+    schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, category_title, category_slug) "
+        "SELECT m.id, m.title, c.title, c.slug FROM LittleLemonAPI_menuitem m "
+        "JOIN LittleLemonAPI_category c ON c.id = m.category_id"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in FTS_TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0006_job_queue'),
+    ]
+
+    # SQLite rebuilds the menu item and category tables to add the columns, which the
+    # full-text index triggers do not survive: drop the index first, rebuild it after
+    operations = [
+        migrations.RunPython(drop_index, create_index),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.1.6 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The history views as of this migration: (view, hot table, archive table, columns).
+# Copied here rather than imported from LittleLemonAPI.archive, so that the migration
+# keeps doing the same thing whatever the app code becomes.
+HISTORY_VIEWS = [
+    (
+        'LittleLemonAPI_orderhistory', 'LittleLemonAPI_order', 'LittleLemonAPI_archivedorder',
+        ['id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date', 'updated_at'],
+    ),
+    (
+        'LittleLemonAPI_orderhistoryitem', 'LittleLemonAPI_orderitem', 'LittleLemonAPI_archivedorderitem',
+        ['id', 'order_id', 'menuitem_id', 'quantity', 'unit_price', 'price'],
+    ),
+]
+
+
+def create_views(apps, schema_editor):
+    qn = schema_editor.quote_name
+    for view, hot, archive, columns in HISTORY_VIEWS:
+        columns = ', '.join(qn(column) for column in columns)
+        schema_editor.execute(
+            f'CREATE VIEW {qn(view)} AS SELECT {columns} FROM {qn(hot)} UNION ALL SELECT {columns} FROM {qn(archive)}'
+        )
+
+
+def drop_views(apps, schema_editor):
+    for view, _, _, _ in HISTORY_VIEWS:
+        schema_editor.execute(f'DROP VIEW IF EXISTS {schema_editor.quote_name(view)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.BooleanField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'LittleLemonAPI_orderhistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderHistoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.SmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+            ],
+            options={
+                'db_table': 'LittleLemonAPI_orderhistoryitem',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.BooleanField(default=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('delivery_crew', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.SmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LittleLemonAPI.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='LittleLemonAPI.archivedorder')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'date'], name='archived_order_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['delivery_crew', 'date'], name='archived_order_crew_date_idx'),
+        ),
+        # OrderHistory and OrderHistoryItem are views of the hot and the archive tables
+        migrations.RunPython(create_views, drop_views),
+    ]
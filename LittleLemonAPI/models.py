@@ -1,64 +1,167 @@
-# Import the necessary modules for defining models in Django
-from django.db import models 
-# Import the built-in User model
-from django.contrib.auth.models import User 
-
-# A field will be indexed in the database for faster querying (db_index = True)
-
-# db_index=True in Django is a flag that tells the database to create an index
-# for the field. An index is a data structure that allows the database to quickly
-# locate and retrieve the data for a specific field.
-
-# An index does not create a copy of the values in the database. Instead, it creates
-# a separate data structure that maps the values in the field to their location in
-# the table. This mapping allows the database to quickly find the relevant rows when
-# querying the field.
-
-# When you update a value of an entry after indexing, the index is automatically updated
-# to reflect the changes. This is because the index is linked to the data in the database,
-# and any changes to the data will also be reflected in the index.
-
-# Create your models here.
-
-class Category(models.Model):
-    slug = models.SlugField()
-    title = models.CharField(max_length=255, db_index=True) 
-    
-class MenuItem(models.Model):
-    title = models.CharField(max_length=255, db_index=True)
-    price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
-    featured = models.BooleanField(db_index=True)
-    category = models.ForeignKey(Category, on_delete=models.PROTECT)
-
-class Cart(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
-    quantity = models.SmallIntegerField()
-    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
-    price = models.DecimalField(max_digits=6, decimal_places=2)
-    
-    class Meta:
-        unique_together = ('menuitem', 'user') # a Cart object cannot have duplicate menuitem and user combinations.
-
-class Order(models.Model):
-    # on_delete = models.CASCADE => deletion of a User will also result in deletion of the associated Order objects. 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    # on_delete = models.SET_NULL => if a User is deleted, the associated delivery_crew field will be set to NULL
-    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="delivery_crew", null=True)
-    status = models.BooleanField(db_index=True, default=0)
-    total = models.DecimalField(max_digits=6, decimal_places=2)
-    date = models.DateField(db_index=True)
-    
-class OrderItem(models.Model):
-    # on_delete = models.CASCADE => deletion of a User will also result in deletion of the associated OrderItem objects. 
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="order_items")
-    # on_delete = models.CASCADE => deletion of a MenuItem will also result in deletion of the associated OrderItem objects. 
-    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
-    quantity = models.SmallIntegerField()
-    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
-    price = models.DecimalField(max_digits=6, decimal_places=2)
-    
-    class Meta:
-        unique_together = ('order', 'menuitem') # a OrderItem object cannot have duplicate order and menuitem combinations.
-        
-        
\ No newline at end of file
+# Import the necessary modules for defining models in Django
+from django.db import models 
+# Import the built-in User model
+from django.contrib.auth.models import User 
+
+# A field will be indexed in the database for faster querying (db_index = True)
+
+# db_index=True in Django is a flag that tells the database to create an index
+# for the field. An index is a data structure that allows the database to quickly
+# locate and retrieve the data for a specific field.
+
+# An index does not create a copy of the values in the database. Instead, it creates
+# a separate data structure that maps the values in the field to their location in
+# the table. This mapping allows the database to quickly find the relevant rows when
+# querying the field.
+
+# When you update a value of an entry after indexing, the index is automatically updated
+# to reflect the changes. This is because the index is linked to the data in the database,
+# and any changes to the data will also be reflected in the index.
+
+# Create your models here.
+
+# updated_at is the validator of the conditional GETs (ETag, Last-Modified) of the detail views,
+# see conditional.py. Writes that bypass save() (QuerySet.update(), bulk_update()) set it themselves.
+
+class Category(models.Model):
+    slug = models.SlugField()
+    title = models.CharField(max_length=255, db_index=True) 
+    updated_at = models.DateTimeField(auto_now=True) # saving a category touches its menu items as well (signals.py)
+    
+class MenuItem(models.Model):
+    title = models.CharField(max_length=255, db_index=True)
+    price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
+    featured = models.BooleanField(db_index=True)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class Cart(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    
+    class Meta:
+        unique_together = ('menuitem', 'user') # a Cart object cannot have duplicate menuitem and user combinations.
+
+class Order(models.Model):
+    # on_delete = models.CASCADE => deletion of a User will also result in deletion of the associated Order objects. 
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # on_delete = models.SET_NULL => if a User is deleted, the associated delivery_crew field will be set to NULL
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="delivery_crew", null=True)
+    status = models.BooleanField(db_index=True, default=0)
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        # Composite indexes for the role-scoped order listings (checked by the explain_queries command):
+        # customers filter on user and delivery crew on delivery_crew, then both sort by date or status.
+        indexes = [
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            models.Index(fields=['delivery_crew', 'date'], name='order_crew_date_idx'),
+            models.Index(fields=['delivery_crew', 'status', 'date'], name='order_crew_status_date_idx'),
+        ]
+    
+class OrderItem(models.Model):
+    # on_delete = models.CASCADE => deletion of a User will also result in deletion of the associated OrderItem objects. 
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="order_items")
+    # on_delete = models.CASCADE => deletion of a MenuItem will also result in deletion of the associated OrderItem objects. 
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    
+    class Meta:
+        unique_together = ('order', 'menuitem') # a OrderItem object cannot have duplicate order and menuitem combinations.
+
+# Delivered orders older than ARCHIVE_AFTER_DAYS are moved, with their order items, out of the
+# hot tables above into the archive tables below (see archive.py). They keep their ids, and
+# from then on they are read-only.
+class ArchivedOrder(models.Model):
+    # The id of the order in the hot table, never generated here; an auto field to be SQLite's rowid,
+    # which the indexes end with, so (user, date, id) orderings are read from the index
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="+", null=True)
+    status = models.BooleanField(default=True) # only delivered orders are archived
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField(db_index=True)
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        # The same role-scoped listings as the hot table, see Order.Meta
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archived_order_user_date_idx'),
+            models.Index(fields=['delivery_crew', 'date'], name='archived_order_crew_date_idx'),
+        ]
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigAutoField(primary_key=True) # the id of the order item in the hot table
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name="order_items")
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+# Every order, hot or archived: database views (UNION ALL of the hot and the archive table,
+# see migration 0008) that the order listings read when a request reaches outside the hot window
+class OrderHistory(models.Model):
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="+")
+    delivery_crew = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="+", null=True)
+    status = models.BooleanField()
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        managed = False
+        db_table = 'LittleLemonAPI_orderhistory'
+
+class OrderHistoryItem(models.Model):
+    order = models.ForeignKey(OrderHistory, on_delete=models.DO_NOTHING, related_name="order_items")
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.DO_NOTHING, related_name="+")
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    
+    class Meta:
+        managed = False
+        db_table = 'LittleLemonAPI_orderhistoryitem'
+
+# Sales aggregates behind the manager sales report. Checkout and order deletion queue a job
+# in their transaction that brings them up to date (see sales.py), so the report never sums
+# order items. They lag the orders by as long as the run_jobs worker takes to get to the job.
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ('date', 'menuitem') # one row per menu item and day, also serves date range queries
+
+# Deferred work, written in the transaction of the request that creates it and run later
+# by the run_jobs worker (see jobs.py)
+class Job(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed' # gave up after JOB_MAX_ATTEMPTS
+    
+    key = models.CharField(max_length=255, unique=True) # a job is enqueued once per key
+    name = models.CharField(max_length=100) # the handler, see jobs.handler()
+    payload = models.JSONField(default=dict)
+    state = models.CharField(max_length=7, default=PENDING)
+    attempts = models.SmallIntegerField(default=0)
+    run_after = models.DateTimeField() # when a pending job is due, when a finished job ran
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        # The worker takes the pending jobs that are due, oldest first
+        indexes = [models.Index(fields=['state', 'run_after'], name='job_state_run_after_idx')]
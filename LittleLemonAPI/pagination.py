@@ -0,0 +1,258 @@
+import base64
+import json
+from collections import OrderedDict
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination.
+
+    The rows of a page are selected with a WHERE clause on the ordering columns of the
+    last row of the previous page, plus the primary key as a tie breaker, e.g.
+    `WHERE date < :date OR (date = :date AND id < :id) ORDER BY date DESC, id DESC`.
+    Unlike OFFSET pagination this costs the same at any depth, and no COUNT(*) is run.
+
+    The ordering comes from the view's OrderingFilter (`?ordering=`), so every
+    ordering_fields value the view already accepts works here too.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 100)
+    invalid_cursor_message = 'Invalid cursor'
+    # Raised when the values of a cursor don't fit the ordering columns: a bad date or
+    # decimal, a string for a number, an integer too large for the database
+    cursor_value_errors = (TypeError, ValueError, OverflowError, ValidationError)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        try:
+            results = list(queryset)
+        except self.cursor_value_errors:
+            raise ParseError(self.invalid_cursor_message)
+        return self.set_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, the page is fetched with the async ORM."""
+        queryset = self.page_queryset(queryset, request, view)
+        try:
+            results = [row async for row in queryset]
+        except self.cursor_value_errors:
+            raise ParseError(self.invalid_cursor_message)
+        return self.set_page(results)
+
+    def page_queryset(self, queryset, request, view):
+        """The (unevaluated) queryset of the requested page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.nullable = {
+            field.lstrip('-') for field in self.ordering if self.is_nullable(queryset.model, field.lstrip('-'))
+        }
+        queryset = queryset.order_by(*[self.order_expression(field) for field in self.ordering])
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.after(cursor))
+            except self.cursor_value_errors:
+                raise ParseError(self.invalid_cursor_message)
+
+        # Fetch one row more than needed to find out if there is a next page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        The ordering requested through the view's OrderingFilter (or the view's default),
+        always ending with the primary key so every position in the result is unique.
+        """
+        ordering = list(OrderingFilter().get_ordering(request, queryset, view) or [])
+        ordering = [field for field in ordering if field.lstrip('-') not in ('id', 'pk')]
+        last = ordering[-1] if ordering else 'id'
+        ordering.append('-id' if last.startswith('-') else 'id')
+        return ordering
+
+    @staticmethod
+    def is_nullable(model, path):
+        """True if the value at the end of a field path (e.g. delivery_crew__username) can be NULL."""
+        nullable = False
+        for name in path.split('__'):
+            field = model._meta.get_field(name)
+            nullable = nullable or field.null
+            model = field.related_model
+        return nullable
+
+    def order_expression(self, field):
+        name = field.lstrip('-')
+        if name not in self.nullable:
+            return field
+        # Pin down where NULLs go, after() relies on it and databases disagree on the default
+        if field.startswith('-'):
+            return F(name).desc(nulls_last=True)
+        return F(name).asc(nulls_first=True)
+
+    def after(self, values):
+        """
+        Build the filter selecting every row that sorts strictly after the given
+        ordering values: (a > x) OR (a = x AND b > y) OR ...
+        """
+        clauses = []
+        for position, field in enumerate(self.ordering):
+            equal = [self.equal(f, v) for f, v in zip(self.ordering[:position], values)]
+            clauses.append(reduce(and_, equal + [self.greater(field, values[position])]))
+        condition = reduce(or_, clauses)
+        # Repeat the bound on the leading column on its own (a >= x AND (...)), so the
+        # database can seek into its index instead of scanning up to the position
+        first, value = self.ordering[0], values[0]
+        if value is not None and first.lstrip('-') not in self.nullable:
+            lookup = '__lte' if first.startswith('-') else '__gte'
+            condition = Q(**{first.lstrip('-') + lookup: value}) & condition
+        return condition
+
+    def equal(self, field, value):
+        name = field.lstrip('-')
+        return Q(**{name + '__isnull': True}) if value is None else Q(**{name: value})
+
+    def greater(self, field, value):
+        """Rows that sort after `value` on this single field (NULLs first ascending, last descending)."""
+        name = field.lstrip('-')
+        if field.startswith('-'):
+            if value is None:
+                return Q(pk__in=[]) # nothing sorts after the trailing NULLs
+            if name in self.nullable:
+                return Q(**{name + '__lt': value}) | Q(**{name + '__isnull': True})
+            return Q(**{name + '__lt': value})
+        if value is None:
+            return Q(**{name + '__isnull': False})
+        return Q(**{name + '__gt': value})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [self.field_value(last, field.lstrip('-')) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values))
+
+    @staticmethod
+    def field_value(instance, path):
+        if isinstance(instance, dict): # a .values() row (see fieldsets.ValuesSerializer)
+            return instance[path]
+        for attr in path.split('__'):
+            if instance is None:
+                return None
+            instance = getattr(instance, attr)
+        return instance
+
+    def encode_cursor(self, values):
+        # The ordering is part of the cursor so a cursor is never applied to another ordering
+        payload = json.dumps([self.ordering, values], cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            ordering, values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise ParseError(self.invalid_cursor_message)
+        if ordering != self.ordering or not isinstance(values, list) or len(values) != len(ordering):
+            raise ParseError(self.invalid_cursor_message)
+        if any(isinstance(value, (list, dict)) for value in values):
+            raise ParseError(self.invalid_cursor_message)
+        return values
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    The project's default page number pagination, with an opt-in keyset mode.
+    Clients switch to keyset pagination with `?pagination=keyset` (next links carry
+    a `cursor` parameter, which keeps them in that mode).
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'keyset'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.keyset_class() if self.use_keyset(request) else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views: the count and the page rows are fetched
+        with the async ORM, the rest is PageNumberPagination's own logic.
+        """
+        self.keyset = self.keyset_class() if self.use_keyset(request) else None
+        if self.keyset is not None:
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount() # the paginator would otherwise count synchronously
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        self.page.object_list = [row async for row in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
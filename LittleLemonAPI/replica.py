@@ -0,0 +1,221 @@
+"""
+Read replica routing, with read-your-writes stickiness.
+
+The safe-method requests of the views with ReplicaReadMixin (the menu item, category and
+order listings) run their queries against the "replica" database when one is configured
+(READ_REPLICA in the settings). Everything else, writes and the other views, uses the
+primary ("default").
+
+The replica lags behind the primary. So that users see their own writes, the successful
+write requests of the views with StickyWriteMixin (the cart and order endpoints) record
+when the user wrote, and that user's reads stay on the primary for REPLICA_STICKY_SECONDS,
+and for as long as the replica is older than the write. Catalog writes (see signals.py)
+are recorded the same way for everyone: the catalog listings are read from the primary
+until the replica has caught up, so that no stale page gets into the catalog cache. When
+the replica lags more than REPLICA_MAX_LAG seconds, or was never synced, all reads go to
+the primary.
+
+Here the replica is a copy of the SQLite file that `manage.py sync_replica` refreshes
+with SQLite's online backup. The time of the last sync and the times of the recorded
+writes are kept in a small SQLite file all the worker processes share. Responses read
+from the replica carry its lag in their Server-Timing header, superusers can read it at
+/api/debug/replica.
+"""
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+from .db import SQLiteFileStore
+from .timing import add_value
+
+REPLICA = "replica"
+
+# Seconds a user's reads stay on the primary after they wrote to their cart or orders
+STICKY_SECONDS = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+# Reads go back to the primary when the replica is older than this (seconds)
+MAX_LAG = getattr(settings, "REPLICA_MAX_LAG", 30)
+
+# The write scope of the catalog (menu items and categories), the users' are user_scope(pk)
+CATALOG = "catalog"
+
+# Set while a request of a ReplicaReadMixin view reads from the replica
+_use_replica = ContextVar("littlelemon_use_replica", default=False)
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaState(SQLiteFileStore):
+    """When the replica was last synced, and when each write scope was last written to (Unix times)."""
+    schema = [
+        "CREATE TABLE IF NOT EXISTS sync (id INTEGER PRIMARY KEY CHECK (id = 1), synced_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS write (scope TEXT PRIMARY KEY, written_at REAL NOT NULL)",
+    ]
+
+    @property
+    def path(self):
+        return str(getattr(settings, "REPLICA_STATE_PATH", settings.BASE_DIR / "replica-state.sqlite3"))
+
+    def get(self, scopes=()):
+        """(time of the last sync, time of the last write to any of `scopes`), either None when unknown."""
+        placeholders = ", ".join("?" * len(scopes)) or "NULL"
+        return self.connection().execute(
+            "SELECT (SELECT synced_at FROM sync WHERE id = 1), "
+            f"(SELECT MAX(written_at) FROM write WHERE scope IN ({placeholders}))",
+            list(scopes),
+        ).fetchone()
+
+    def set_synced_at(self, synced_at):
+        self.connection().execute(
+            "INSERT INTO sync (id, synced_at) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET synced_at = excluded.synced_at",
+            (synced_at,),
+        )
+
+    def record_write(self, scope):
+        self.connection().execute(
+            "INSERT INTO write (scope, written_at) VALUES (?, ?) "
+            "ON CONFLICT(scope) DO UPDATE SET written_at = excluded.written_at",
+            (scope, time.time()),
+        )
+
+    def purge(self, before):
+        """Forget the writes older than `before`, they no longer keep anyone on the primary."""
+        self.connection().execute("DELETE FROM write WHERE written_at < ?", (before,))
+
+    def clear(self):
+        self.connection().execute("DELETE FROM sync")
+        self.connection().execute("DELETE FROM write")
+
+
+replica_state = ReplicaState()
+
+
+def record_write(scope):
+    """Keep the reads of `scope` on the primary until the replica has the current transaction's writes."""
+    if replica_configured():
+        # Recorded once committed: a replica synced after that time has the writes
+        transaction.on_commit(lambda: replica_state.record_write(scope))
+
+
+def replica_lag():
+    """Seconds since the replica's last sync, None when it was never synced."""
+    synced_at, _ = replica_state.get()
+    return None if synced_at is None else time.time() - synced_at
+
+
+def sync_replica():
+    """
+    Copy the primary database into the replica with SQLite's online backup, which gives
+    a consistent snapshot while the primary keeps taking writes. Returns the seconds it took.
+    """
+    primary, replica = (str(connections[alias].settings_dict["NAME"]) for alias in (DEFAULT_DB_ALIAS, REPLICA))
+    # The snapshot has every write committed before the copy starts
+    started = time.time()
+    source = sqlite3.connect(primary, timeout=5)
+    target = sqlite3.connect(replica, timeout=5)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    replica_state.set_synced_at(started)
+    replica_state.purge(started - STICKY_SECONDS)
+    return time.time() - started
+
+
+class ReplicaRouter:
+    """Sends the reads of ReplicaReadMixin views to the replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if _use_replica.get() else None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica's rows are the primary's
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the migrated primary
+        return False if db == REPLICA else None
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe-method requests of the view from the replica, unless the user (or one
+    of the view's `write_scopes`) wrote too recently for the replica to have it.
+    """
+    write_scopes = ()
+
+    def use_replica(self, request):
+        if request.method not in SAFE_METHODS or not replica_configured():
+            return False
+        scopes = list(self.write_scopes)
+        if request.user.is_authenticated:
+            scopes.append(user_scope(request.user.pk))
+        synced_at, written_at = replica_state.get(scopes)
+        now = time.time()
+        if synced_at is None or now - synced_at > MAX_LAG:
+            return False
+        if written_at is not None and (written_at >= synced_at or now - written_at < STICKY_SECONDS):
+            return False
+        add_value("replica", (now - synced_at) * 1000, "lag")
+        return True
+
+    def start_replica_reads(self, request):
+        if self.use_replica(request):
+            self.replica_token = _use_replica.set(True)
+
+    def stop_replica_reads(self):
+        token = self.__dict__.pop("replica_token", None)
+        if token is not None:
+            _use_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.start_replica_reads(request)
+
+    async def ainitial(self, request, *args, **kwargs):
+        await super().ainitial(request, *args, **kwargs)
+        # A read of a local file, cheaper than a hop to a thread
+        self.start_replica_reads(request)
+
+    def handle_exception(self, exc):
+        try:
+            return super().handle_exception(exc)
+        except BaseException:
+            # Re-raised to Django: finalize_response() is not called, the flag must not outlive the request
+            self.stop_replica_reads()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        try:
+            return super().finalize_response(request, response, *args, **kwargs)
+        finally:
+            self.stop_replica_reads()
+
+
+class StickyWriteMixin:
+    """Keep the reads of the user behind a successful write request on the primary (see record_write())."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            request.method not in SAFE_METHODS and response.status_code < 400
+            and request.user.is_authenticated and replica_configured()
+        ):
+            # The writes of the request are committed by now
+            replica_state.record_write(user_scope(request.user.pk))
+        return response
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .versions import bump_versions, user_key, version_store
+
+# Group names used for authorization throughout the API
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery crew"
+
+# How long (in seconds) a user's group set is cached across requests.
+# Entries are keyed by the user's version (see versions.py), which membership changes
+# bump (see signals.py): every worker stops using the old entry on its next request.
+ROLE_CACHE_TIMEOUT = getattr(settings, "ROLE_CACHE_TIMEOUT", 60)
+
+
+def _cache_key(user_id, version):
+    return f"littlelemon:roles:{user_id}:{version}"
+
+
+def get_roles(user):
+    """
+    Return the set of group names the user belongs to.
+    The set is loaded at most once per request (it is kept on the user object,
+    which is rebuilt for every request) and shared across requests through the cache.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, "_roles", None)
+    if roles is None:
+        # The version is read first: a change made while the groups are loaded bumps
+        # it past the key they are stored under
+        key = _cache_key(user.pk, version_store.get(user_key(user.pk)))
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+        user._roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    """get_roles() for async views: a cache miss is loaded with the async ORM."""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, "_roles", None)
+    if roles is None:
+        key = _cache_key(user.pk, version_store.get(user_key(user.pk)))
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset([name async for name in user.groups.values_list("name", flat=True)])
+            cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+        user._roles = roles
+    return roles
+
+
+def prime_roles(user_ids):
+    """Load the group sets of the given users into the cache with one query. Returns how many were cached."""
+    roles = {user_id: set() for user_id in user_ids}
+    versions = version_store.get_many(user_key(user_id) for user_id in roles)
+    memberships = User.groups.through.objects.filter(user_id__in=roles).values_list("user_id", "group__name")
+    for user_id, name in memberships:
+        roles[user_id].add(name)
+    cache.set_many(
+        {
+            _cache_key(user_id, versions[user_key(user_id)]): frozenset(names)
+            for user_id, names in roles.items()
+        },
+        ROLE_CACHE_TIMEOUT,
+    )
+    return len(roles)
+
+
+def invalidate_roles(*user_ids):
+    """Make the cached group set of the given users stale, in every process."""
+    bump_versions(*(user_key(user_id) for user_id in user_ids))
+
+
+def is_manager(user):
+    return MANAGER in get_roles(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_roles(user)
+
+
+def is_customer(user):
+    """A customer is any user that is neither a manager nor a delivery crew member."""
+    return not (get_roles(user) & {MANAGER, DELIVERY_CREW})
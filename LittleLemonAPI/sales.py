@@ -0,0 +1,101 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .db import upsert_add
+from .jobs import enqueue, handler
+from .models import DailyMenuItemSales, DailySales, Job, OrderHistory, OrderHistoryItem
+
+RECORD_ORDER_JOB = "sales.record_order"
+
+# An order line as carried in a job payload
+SaleLine = namedtuple("SaleLine", "menuitem_id quantity price")
+
+
+def record_order(day, lines, sign=1):
+    """
+    Add an order to the sales aggregates of `day`, or take it out again with sign=-1.
+    `lines` are its order items (or the cart items it is made from): anything with
+    menuitem_id, quantity and price. Call it inside the transaction that writes the
+    order, so the aggregates commit or roll back together with it.
+    """
+    per_item = {}
+    for line in lines:
+        quantity, revenue = per_item.get(line.menuitem_id, (0, Decimal(0)))
+        per_item[line.menuitem_id] = (quantity + line.quantity, revenue + line.price)
+    revenue = sum((item_revenue for _, item_revenue in per_item.values()), Decimal(0))
+    upsert_add(
+        DailySales,
+        [{"date": day, "orders": sign, "revenue": sign * revenue}],
+        unique_fields=["date"],
+        add_fields=["orders", "revenue"],
+    )
+    upsert_add(
+        DailyMenuItemSales,
+        [
+            {"date": day, "menuitem": menuitem_id, "quantity": sign * quantity, "revenue": sign * item_revenue}
+            for menuitem_id, (quantity, item_revenue) in per_item.items()
+        ],
+        unique_fields=["date", "menuitem"],
+        add_fields=["quantity", "revenue"],
+    )
+
+
+def defer_record_order(day, lines, sign=1, key=None):
+    """
+    record_order() on the job queue (see jobs.py), for the request paths: the lines are
+    copied into the job, so it does not depend on the order still existing when it runs.
+    Call it inside the transaction that writes the order, with a key when the change can
+    only happen once (the checkout or deletion of an order). The aggregates only add, so
+    jobs applied in any order add up to the same totals.
+    """
+    enqueue(
+        RECORD_ORDER_JOB,
+        {
+            "date": day.isoformat(),
+            "sign": sign,
+            "lines": [[line.menuitem_id, line.quantity, str(line.price)] for line in lines],
+        },
+        key=key,
+    )
+
+
+@handler(RECORD_ORDER_JOB)
+def run_record_order(payload):
+    lines = [SaleLine(menuitem_id, quantity, Decimal(price)) for menuitem_id, quantity, price in payload["lines"]]
+    record_order(date.fromisoformat(payload["date"]), lines, sign=payload["sign"])
+
+
+def rebuild_sales():
+    """
+    Recompute every aggregate from the orders, hot and archived (see archive.py), for
+    orders written or removed outside the API (the admin, bulk imports, a deleted user
+    or menu item). Pending aggregate jobs are marked done, the rebuild already covers them.
+    Returns the number of day rows and menu item rows written.
+    """
+    with transaction.atomic():
+        # The rebuild counts the orders the pending jobs would add or take out
+        Job.objects.filter(name=RECORD_ORDER_JOB, state=Job.PENDING).update(state=Job.DONE)
+        DailySales.objects.all().delete()
+        DailyMenuItemSales.objects.all().delete()
+        revenue = dict(OrderHistoryItem.objects.values_list("order__date").annotate(Sum("price")).order_by())
+        days = DailySales.objects.bulk_create(
+            (
+                DailySales(date=day, orders=orders, revenue=revenue.get(day, 0))
+                for day, orders in OrderHistory.objects.values_list("date").annotate(Count("id")).order_by()
+            ),
+            batch_size=1000,
+        )
+        items = DailyMenuItemSales.objects.bulk_create(
+            (
+                DailyMenuItemSales(date=day, menuitem_id=menuitem_id, quantity=quantity, revenue=item_revenue)
+                for day, menuitem_id, quantity, item_revenue in OrderHistoryItem.objects.values_list("order__date", "menuitem")
+                .annotate(Sum("quantity"), Sum("price"))
+                .order_by()
+            ),
+            batch_size=1000,
+        )
+    return len(days), len(items)
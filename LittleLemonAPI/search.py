@@ -0,0 +1,53 @@
+import re
+
+from django.db import connections
+from rest_framework.filters import SearchFilter
+
+# The index holds one row per menu item (rowid = menu item id) with the item title and
+# its category's title and slug. Triggers keep it in sync with every write to either
+# table, including bulk_create() and QuerySet.update(), which bypass model signals.
+# Migration 0003 creates the index and its triggers. SQLite drops a table's triggers
+# when Django rebuilds the table, so migrations that alter MenuItem or Category must
+# drop the index first and create it again afterwards, with their own copy of the SQL
+# (see 0007).
+FTS_TABLE = "LittleLemonAPI_menuitem_fts"
+
+
+def fts_available(connection):
+    return connection.vendor == "sqlite"
+
+
+def fts_query(terms):
+    """
+    Turn search terms into an FTS5 query: every word must match, as a prefix, in the
+    item title or the category title / slug. 'ice cre' -> '"ice"* AND "cre"*'
+    """
+    words = [word for term in terms for word in re.findall(r"\w+", term)]
+    return " AND ".join(f'"{word}"*' for word in words)
+
+
+class MenuItemSearchFilter(SearchFilter):
+    """
+    ?search= for menu items, answered from the FTS5 index: prefix matching on the
+    item title and category title / slug, ranked by relevance (bm25) unless the
+    client asks for another ordering. On databases without FTS5 it falls back to
+    SearchFilter over the view's search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not fts_available(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = fts_query(terms)
+        if not query:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{table}"."id"', f"{FTS_TABLE} MATCH %s"],
+            params=[query],
+            select={"search_rank": f"{FTS_TABLE}.rank"},
+            order_by=["search_rank", "id"], # ties in a stable order for the pages
+        )
@@ -1,43 +1,77 @@
-from rest_framework import serializers
-from .models import MenuItem, Category, Cart, Order, OrderItem
-from django.contrib.auth.models import User
-
-class CategorySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Category
-        fields = ['id', 'slug', 'title']
-
-class MenuItemSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only = True) # for GET requests
-    category_id = serializers.IntegerField(write_only = True) # for POST, PUT, PATCH requests, it won't appear in GET requests
-    class Meta:
-        model = MenuItem
-        fields = ['id', 'title', 'price', 'featured', 'category', 'category_id']
-
-class UserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = ('id', 'username', 'first_name', 'last_name', 'email')
-        
-class CartItemSerializer(serializers.ModelSerializer):
-    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    class Meta:
-        model = Cart
-        fields = ('id', 'user', 'menuitem', 'quantity', 'unit_price', 'price')
-        
-class OrderItemSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OrderItem
-        fields = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
-
-class OrderSerializer(serializers.ModelSerializer):
-    order_items = OrderItemSerializer(read_only = True, many = True)
-    class Meta:
-        model = Order
-        fields = ('id', 'user', 'delivery_crew', 'status', 'order_items', 'total', 'date')
-        
-class OrderDetailSerializer(serializers.ModelSerializer):
-    order_items = OrderItemSerializer(read_only = True, many = True)
-    class Meta:
-        model = Order
-        fields = ('order_items', )
\ No newline at end of file
+from rest_framework import serializers
+from .models import MenuItem, Category, Cart, Order, OrderItem, DailySales
+from django.contrib.auth.models import User
+from .cart import MAX_ID, MAX_QUANTITY
+from .dispatch import STATUS_BATCH_SIZE
+from .fieldsets import SparseFieldsetSerializerMixin
+
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'slug', 'title']
+
+class MenuItemSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    category = CategorySerializer(read_only = True) # for GET requests
+    category_id = serializers.IntegerField(write_only = True) # for POST, PUT, PATCH requests, it won't appear in GET requests
+    class Meta:
+        model = MenuItem
+        fields = ['id', 'title', 'price', 'featured', 'category', 'category_id']
+
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name', 'email')
+        
+class CartItemSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    class Meta:
+        model = Cart
+        fields = ('id', 'user', 'menuitem', 'quantity', 'unit_price', 'price')
+        read_only_fields = ('unit_price', 'price') # priced by the server from the menu item
+        
+class CartItemAddSerializer(serializers.Serializer):
+    # One item of a POST to the cart. unit_price and price are not accepted from the client,
+    # they are looked up (see cart.add_to_cart), so any sent along are ignored.
+    menuitem = serializers.IntegerField(min_value = 1, max_value = MAX_ID)
+    quantity = serializers.IntegerField(min_value = 1, max_value = MAX_QUANTITY)
+        
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
+
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    order_items = OrderItemSerializer(read_only = True, many = True)
+    class Meta:
+        model = Order
+        fields = ('id', 'user', 'delivery_crew', 'status', 'order_items', 'total', 'date')
+        
+class OrderStatusUpdateSerializer(serializers.Serializer):
+    # The body of a bulk status update: the orders to change and the status they get
+    orders = serializers.ListField(child = serializers.IntegerField(min_value = 1), allow_empty = False, max_length = STATUS_BATCH_SIZE)
+    status = serializers.BooleanField()
+        
+class OrderDetailSerializer(serializers.ModelSerializer):
+    order_items = OrderItemSerializer(read_only = True, many = True)
+    class Meta:
+        model = Order
+        fields = ('order_items', )
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ('date', 'orders', 'revenue')
+
+class MenuItemSalesSerializer(serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    title = serializers.CharField(source = 'menuitem__title')
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits = 14, decimal_places = 2)
+
+class SalesReportSerializer(serializers.Serializer):
+    start = serializers.DateField(allow_null = True)
+    end = serializers.DateField(allow_null = True)
+    orders = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits = 14, decimal_places = 2)
+    days = DailySalesSerializer(many = True)
+    menu_items = MenuItemSalesSerializer(many = True)
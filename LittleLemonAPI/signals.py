@@ -0,0 +1,79 @@
+from django.contrib.auth.models import Group, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .catalog import bump_catalog_version
+from .db import apply_sqlite_pragmas
+from .models import Category, MenuItem
+from .replica import CATALOG, record_write
+from .roles import invalidate_roles
+from .timing import install_query_timer
+
+
+def invalidate_users(*user_ids):
+    # Bumps the users' versions, which the authentication cache (see authentication.py)
+    # checks its entries against as well: they keep the group set along with the user
+    invalidate_roles(*user_ids)
+
+
+# Group membership changes made anywhere (the group management views, the admin,
+# the shell) go through the User.groups relation, so this single receiver keeps
+# the role cache in sync with the database.
+@receiver(m2m_changed, sender=User.groups.through)
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # pk_set is not provided for clear(), remember who was in the group
+        instance._cleared_user_ids = list(instance.user_set.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        invalidate_users(*(pk_set if reverse else [instance.pk]))
+    elif action == "post_clear":
+        invalidate_users(*(getattr(instance, "_cleared_user_ids", []) if reverse else [instance.pk]))
+
+
+# Renaming or deleting a group changes the role names of all its members
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    if instance.pk:
+        invalidate_users(*instance.user_set.values_list("pk", flat=True))
+
+
+# Any write to the catalog, whether through the API or the admin, makes every cached
+# menu-items and categories response stale, and the read replica too until it catches up
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+    record_write(CATALOG)
+
+
+# A menu item is served with its category, so a category change is a change of its menu items
+# for the conditional GETs of the menu item detail view (see conditional.py)
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        MenuItem.objects.filter(category=instance).update(updated_at=instance.updated_at)
+
+
+# Logging out through djoser deletes the user's tokens, deactivating (or otherwise
+# changing) a user must not leave a stale copy behind in the authentication cache
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_users(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_users(instance.pk)
+
+
+# Tune every new database connection for the active database profile (see settings.DB_PROFILE)
+# and time its queries for the Server-Timing header (see timing.py)
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
+    install_query_timer(connection)
@@ -1,3 +1,1544 @@
-from django.test import TestCase
-
-# Create your tests here.
+import base64
+import csv
+import io
+import json
+import multiprocessing
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User, Group
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, close_old_connections, connections
+from django.urls import path
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from .archive import archive_cutoff, archive_orders
+from .cart import MAX_QUANTITY
+from .authentication import CachedTokenAuthentication, token_cache
+from .catalog import bump_catalog_version
+from .signals import invalidate_users
+from .fieldsets import ValuesSerializer
+from .fragments import FragmentCacheMixin, fragment_cache
+from .db import upsert_add
+from .dispatch import set_status
+from . import jobs
+from .pagination import KeysetPagination
+from .models import MenuItem, Category, Cart, ArchivedOrder, ArchivedOrderItem, DailySales, DailyMenuItemSales, Job, Order, OrderHistory, OrderHistoryItem, OrderItem
+from .queryplan import audit
+from . import replica
+from .search import FTS_TABLE
+from .replica import replica_state
+from .roles import get_roles, invalidate_roles, prime_roles
+from .sales import rebuild_sales
+from . import timing
+from .throttles import NotModifiedRateThrottle, OneCallPerMinute, bucket_store
+from .asyncviews import AsyncAPIView, read_view
+from .views import AsyncCartItemsView, AsyncCategoriesView, AsyncMenuItemsView, AsyncOrdersListView, CartItemsView, CategoriesView, MenuItemsView, OrdersListCreateView, OrdersListMixin
+from . import warmup
+from .warmup import STEPS, warm_up
+
+# Create your tests here.
+
+
+class IsolatedThrottleStoreMixin:
+    """Give every test its own, empty throttle bucket store (and read replica state and cache versions)."""
+
+    def setUp(self):
+        super().setUp()
+        directory = self.temp_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = self.settings(
+            THROTTLE_STORE_PATH=Path(directory) / 'throttle.sqlite3',
+            REPLICA_STATE_PATH=Path(directory) / 'replica-state.sqlite3',
+            VERSION_STORE_PATH=Path(directory) / 'versions.sqlite3',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class LargePagePagination(PageNumberPagination):
+    page_size = 50
+
+
+class OrderDataMixin(IsolatedThrottleStoreMixin):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager')
+        cls.crew = User.objects.create_user('crew', password='crew')
+        cls.customer = User.objects.create_user('customer', password='customer')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        Group.objects.create(name='Delivery crew').user_set.add(cls.crew)
+        category = Category.objects.create(slug='mains', title='Mains')
+        cls.menu_items = [
+            MenuItem.objects.create(title=f'Dish {i}', price=5, featured=False, category=category)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        # Start every test with a cold role cache
+        cache.clear()
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, delivery_crew=self.crew, total=15, date=date.today())
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menuitem=item, quantity=1, unit_price=5, price=5)
+                for item in self.menu_items
+            )
+
+
+class CartTests(OrderDataMixin, APITestCase):
+    """
+    Items are added to the cart in one INSERT ... ON CONFLICT, priced by the server,
+    and a batch is written whole or not at all.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.customer)
+
+    def add(self, data):
+        return self.client.post('/api/cart/menu-items', data, format='json')
+
+    def cart(self):
+        return {item.menuitem_id: (item.quantity, item.unit_price, item.price) for item in Cart.objects.filter(user=self.customer)}
+
+    def test_add_and_increment(self):
+        first, second = self.menu_items[:2]
+        response = self.add({'menuitem': first.pk, 'quantity': 2, 'unit_price': '0.01', 'price': '0.02'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['quantity'], response.data['price']), (2, '10.00'))
+
+        MenuItem.objects.filter(pk=first.pk).update(price='6.50')
+        with self.assertNumQueries(6): # the prices, the upsert, the bounds check, the rows, in a savepoint here
+            response = self.add([{'menuitem': first.pk, 'quantity': 1}, {'menuitem': second.pk, 'quantity': 3}, {'menuitem': first.pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['menuitem'] for item in response.data], [first.pk, second.pk])
+        # Re-priced at the current price
+        self.assertEqual(self.cart(), {first.pk: (4, Decimal('6.50'), Decimal('26.00')), second.pk: (3, Decimal('5.00'), Decimal('15.00'))})
+
+    def test_quantity_limit_rolls_back_the_batch(self):
+        first, second = self.menu_items[:2]
+        MenuItem.objects.filter(pk=first.pk).update(price='0.01') # MAX_QUANTITY of them fit in the price column
+        self.assertEqual(self.add({'menuitem': first.pk, 'quantity': MAX_QUANTITY}).status_code, 201)
+        self.assertEqual(self.add({'menuitem': first.pk, 'quantity': MAX_QUANTITY + 1}).status_code, 400)
+        response = self.add([{'menuitem': second.pk, 'quantity': 1}, {'menuitem': first.pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, [{}, {'quantity': ['The cart cannot hold this quantity.']}])
+        self.assertEqual(self.cart(), {first.pk: (MAX_QUANTITY, Decimal('0.01'), Decimal('327.67'))})
+
+    def test_invalid_menu_items(self):
+        for menuitem in (0, 2**63, 2**64, 'dish'):
+            response = self.add([{'menuitem': self.menu_items[0].pk, 'quantity': 1}, {'menuitem': menuitem, 'quantity': 1}])
+            self.assertEqual(response.status_code, 400, menuitem)
+            self.assertIn('menuitem', response.data[1])
+        missing = MenuItem.objects.order_by('pk').last().pk + 1
+        response = self.add([{'menuitem': self.menu_items[0].pk, 'quantity': 1}, {'menuitem': missing, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(self.cart(), {})
+
+    def test_upsert_add(self):
+        day = date.today()
+        rows = [{'date': day, 'menuitem': item.pk, 'quantity': 1, 'revenue': Decimal('0.10')} for item in self.menu_items[:2]]
+        with self.assertNumQueries(1):
+            upsert_add(DailyMenuItemSales, rows, ['date', 'menuitem'], ['quantity', 'revenue'])
+        # Adds to the existing rows, exactly: 0.1 + 0.2 is not 0.3 in floating point
+        upsert_add(DailyMenuItemSales, [{**rows[0], 'quantity': 2, 'revenue': Decimal('0.20')}], ['date', 'menuitem'], ['quantity', 'revenue'])
+        self.assertEqual(
+            set(DailyMenuItemSales.objects.values_list('menuitem', 'quantity', 'revenue')),
+            {(self.menu_items[0].pk, 3, Decimal('0.30')), (self.menu_items[1].pk, 1, Decimal('0.10'))},
+        )
+        with self.assertNumQueries(0):
+            upsert_add(DailyMenuItemSales, [], ['date', 'menuitem'], ['quantity', 'revenue'])
+
+
+class OrderQueryCountTests(OrderDataMixin, APITestCase):
+    """
+    Listing and retrieving orders must cost a fixed number of queries,
+    no matter how many orders (and order items) end up on the page.
+    """
+
+    def assertListQueries(self, user, num):
+        with mock.patch.object(OrdersListMixin, 'pagination_class', LargePagePagination):
+            for count in (1, 10):
+                self.create_orders(count)
+                cache.clear()
+                # A fresh user object, as authentication would give us on a real request
+                self.client.force_authenticate(User.objects.get(pk=user.pk))
+                with self.assertNumQueries(num):
+                    response = self.client.get('/api/orders', {'ordering': '-delivery_crew__username'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), Order.objects.count())
+
+    def test_manager_order_list(self):
+        # roles, count, orders with users, order items, and on the last page whether archived orders match
+        self.assertListQueries(self.manager, 5)
+
+    def test_delivery_crew_order_list(self):
+        self.assertListQueries(self.crew, 5)
+
+    def test_customer_order_list(self):
+        self.assertListQueries(self.customer, 5)
+
+    def test_customer_order_detail(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        self.client.force_authenticate(self.customer)
+        # order with users, order items
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/orders/{order.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['order_items']), 3)
+
+
+
+class QueryPlanTests(OrderDataMixin, APITestCase):
+    """
+    The hot order and cart paths must be answered from indexes: no full table
+    scans and no sorts SQLite has to do in a temporary B-tree.
+    """
+
+    def test_hot_paths_use_indexes(self):
+        self.create_orders(5)
+        clients = {}
+        for role, user in (('manager', self.manager), ('delivery_crew', self.crew), ('customer', self.customer)):
+            clients[role] = self.client_class()
+            clients[role].force_authenticate(User.objects.get(pk=user.pk))
+        problems = [(role, path, params, sql, found) for role, path, params, sql, plan, found in audit(clients) if found]
+        self.assertEqual(problems, [])
+
+
+class MenuSearchTests(OrderDataMixin, APITestCase):
+    """
+    ?search= on the menu items is answered from the FTS5 index, which its triggers keep
+    in sync with the menu item and category tables.
+    """
+
+    def setUp(self):
+        super().setUp()
+        desserts = Category.objects.create(slug='desserts', title='Desserts')
+        for title in ('Grilled fish with lemon butter sauce', 'Lemon lemon sorbet', 'Crème brûlée'):
+            MenuItem.objects.create(title=title, price=6, featured=False, category=desserts)
+
+    def search(self, terms, **params):
+        titles, response = [], self.client.get('/api/menu-items', {'search': terms, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            titles += [item['title'] for item in response.json()['results']]
+            if not response.json()['next']:
+                return titles
+            response = self.client.get(response.json()['next'])
+
+    def test_triggers_survive_table_rebuilds(self):
+        # 0007 rebuilds the menu item and category tables, and the index with them
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE %s", [f'%{FTS_TABLE}%'])
+            triggers = {name for name, in cursor.fetchall()}
+        self.assertEqual(
+            triggers, {'menuitem_fts_insert', 'menuitem_fts_update', 'menuitem_fts_delete', 'category_fts_update'}
+        )
+
+    def test_results_and_ranking(self):
+        # Most relevant first: two matches in a short title before one in a long title
+        self.assertEqual(self.search('lemon'), ['Lemon lemon sorbet', 'Grilled fish with lemon butter sauce'])
+        self.assertEqual(self.search('LEM sor'), ['Lemon lemon sorbet']) # prefixes, every word must match
+        self.assertEqual(self.search('creme brulee'), ['Crème brûlée']) # diacritics are ignored
+        self.assertEqual(len(self.search('dess')), 3) # the category title and slug are indexed too
+        self.assertEqual(self.search('lemon', ordering='title'), ['Grilled fish with lemon butter sauce', 'Lemon lemon sorbet'])
+        self.assertEqual(self.search('pizza'), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_index_follows_writes(self):
+        sorbet = MenuItem.objects.get(title='Lemon lemon sorbet')
+        MenuItem.objects.filter(pk=sorbet.pk).update(title='Orange sorbet')
+        self.assertEqual(self.search('lemon'), ['Grilled fish with lemon butter sauce'])
+        Category.objects.filter(slug='desserts').update(title='Puddings')
+        self.assertEqual(len(self.search('pudd')), 3)
+        MenuItem.objects.filter(title='Crème brûlée').delete()
+        self.assertEqual(self.search('creme'), [])
+
+
+class SparseFieldsetTests(OrderDataMixin, APITestCase):
+    """
+    ?fields= and ?expand= trim the list items, and the .values() path renders
+    exactly what the serializers render.
+    """
+
+    def test_fields_and_expand(self):
+        self.create_orders(2)
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/orders', {'fields': 'id,order_items', 'expand': ''})
+        self.assertEqual(response.status_code, 200)
+        order = response.data['results'][0]
+        self.assertEqual(set(order), {'id', 'order_items'})
+        self.assertEqual(order['order_items'], list(OrderItem.objects.filter(order=order['id']).values_list('pk', flat=True)))
+
+        response = self.client.get('/api/menu-items', {'fields': 'title,category', 'expand': ''})
+        self.assertEqual(response.data['results'][0], {'title': 'Dish 0', 'category': self.menu_items[0].category_id})
+
+        response = self.client.get('/api/orders', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+    def test_values_path_matches_serializers(self):
+        self.create_orders(3)
+        Order.objects.filter(pk=Order.objects.first().pk).update(delivery_crew=None)
+        self.client.force_authenticate(self.manager)
+        no_values_path = mock.patch.object(ValuesSerializer, 'for_serializer', return_value=None)
+        for path, params in (
+            ('/api/orders', {}),
+            ('/api/orders', {'expand': '', 'pagination': 'keyset', 'ordering': '-delivery_crew__username'}),
+            ('/api/orders', {'fields': 'id,total,date'}),
+            ('/api/menu-items', {}),
+            ('/api/menu-items', {'fields': 'id,price,category', 'ordering': '-price'}),
+        ):
+            cache.clear()
+            fast = self.client.get(path, params)
+            cache.clear()
+            with no_values_path:
+                regular = self.client.get(path, params)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, regular.content, (path, params))
+
+
+class RoleCacheTests(OrderDataMixin, APITestCase):
+    """
+    A user's group set is loaded once and cached across requests, in every worker,
+    until their memberships change.
+    """
+
+    def fresh(self, user):
+        # Every request loads its own user object
+        return User.objects.get(pk=user.pk)
+
+    def test_cached_across_requests(self):
+        user, other = self.fresh(self.manager), self.fresh(self.manager)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_roles(user), {'Manager'})
+            self.assertEqual(get_roles(user), {'Manager'})
+            self.assertEqual(get_roles(other), {'Manager'})
+        self.assertEqual(prime_roles([self.crew.pk, self.customer.pk]), 2)
+        crew, customer = self.fresh(self.crew), self.fresh(self.customer)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_roles(crew), {'Delivery crew'})
+            self.assertEqual(get_roles(customer), set())
+
+    def test_membership_changes_invalidate(self):
+        for user in (self.manager, self.crew, self.customer):
+            get_roles(self.fresh(user))
+        Group.objects.get(name='Delivery crew').user_set.add(self.customer)
+        self.assertEqual(get_roles(self.fresh(self.customer)), {'Delivery crew'})
+        self.fresh(self.crew).groups.clear()
+        self.assertEqual(get_roles(self.fresh(self.crew)), set())
+        group = Group.objects.get(name='Manager')
+        group.name = 'Managers'
+        group.save()
+        self.assertEqual(get_roles(self.fresh(self.manager)), {'Managers'})
+
+        # A change handled by another worker process, which has a cache of its own
+        child = multiprocessing.get_context('fork').Process(target=invalidate_roles, args=(self.manager.pk,))
+        child.start()
+        child.join()
+        user = self.fresh(self.manager)
+        with self.assertNumQueries(1):
+            get_roles(user)
+
+    def test_demoted_manager_rejected(self):
+        other = User.objects.create_user('manager2', password='manager2')
+        Group.objects.get(name='Manager').user_set.add(other)
+
+        def list_managers(user):
+            self.client.force_authenticate(self.fresh(user))
+            return self.client.get('/api/groups/manager/users').status_code
+
+        self.assertEqual(list_managers(other), 200)
+        self.client.force_authenticate(self.fresh(self.manager))
+        self.assertEqual(self.client.delete(f'/api/groups/manager/users/{other.pk}').status_code, 200)
+        self.assertEqual(list_managers(other), 403)
+
+
+class TokenCacheTests(OrderDataMixin, APITestCase):
+    """
+    Tokens are resolved once and cached across requests, and a revoked token is
+    rejected straight away, whichever worker process revoked it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_across_requests(self):
+        authentication = CachedTokenAuthentication()
+        with self.assertNumQueries(2): # the token with its user, the user's groups
+            user, token = authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            self.assertEqual(authentication.authenticate_credentials(self.token.key), (user, token))
+
+    def test_requests_get_their_own_user(self):
+        authentication = CachedTokenAuthentication()
+        for authenticate in (authentication.authenticate_credentials, async_to_sync(authentication.aauthenticate_credentials)):
+            token_cache.clear()
+            first, _ = authenticate(self.token.key) # fills the cache entry
+            first.from_first_request = True
+            second, _ = authenticate(self.token.key)
+            self.assertIsNot(second, first)
+            self.assertFalse(hasattr(second, 'from_first_request'))
+
+    def test_logout(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertEqual(self.client.post('/auth/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_deactivation(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_revoked_by_another_process(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        # Deactivated by another worker process: the row changes, and that process bumps the user's version
+        User.objects.filter(pk=self.customer.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        child = multiprocessing.get_context('fork').Process(target=invalidate_users, args=(self.customer.pk,))
+        child.start()
+        child.join()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+
+class CatalogCacheTests(OrderDataMixin, APITestCase):
+    """
+    The menu items and categories lists are served from the cache, JSON only, until
+    the catalog is written to.
+    """
+
+    def test_browsable_api_not_cached(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/menu-items', HTTP_ACCEPT='text/html')
+        self.assertContains(response, '>manager<', html=False)
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/menu-items', HTTP_ACCEPT='text/html')
+        self.assertNotContains(response, '>manager<', html=False)
+
+    def test_vary(self):
+        for path in ('/api/menu-items', '/api/categories'):
+            fresh = self.client.get(path)
+            cached = self.client.get(path)
+            self.assertEqual(fresh.content, cached.content)
+            self.assertIn('Accept', cached['Vary'])
+            self.assertEqual(cached['Vary'], fresh['Vary'])
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get('/api/menu-items')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/menu-items')
+            not_modified = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((cached.content, cached['ETag']), (response.content, etag))
+        self.assertEqual((not_modified.status_code, not_modified.content, not_modified['ETag']), (304, b'', etag))
+        self.assertEqual(self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_writes_invalidate(self):
+        etags = {path: self.client.get(path)['ETag'] for path in ('/api/menu-items', '/api/categories')}
+
+        def assert_changed(*paths):
+            for path in paths:
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etags[path])
+                self.assertEqual(response.status_code, 200, path)
+                etags[path] = response['ETag']
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etags[path]).status_code, 304, path)
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(
+            '/api/menu-items',
+            {'title': 'Dish 3', 'price': '7.00', 'featured': False, 'category_id': self.menu_items[0].category_id},
+        )
+        self.assertEqual(response.status_code, 201)
+        assert_changed('/api/menu-items')
+        self.assertEqual(self.client.get('/api/menu-items', {'page': 2}).json()['count'], 4)
+
+        MenuItem.objects.filter(pk=self.menu_items[0].pk).get().delete()
+        assert_changed('/api/menu-items')
+        category = Category.objects.get()
+        category.title = 'Main courses'
+        category.save()
+        assert_changed('/api/menu-items', '/api/categories')
+        self.assertEqual(self.client.get('/api/categories').json()['results'][0]['title'], 'Main courses')
+
+    def test_invalidated_across_processes(self):
+        # Cache hits are plain HttpResponses, the responses built by the view have .data
+        self.assertTrue(hasattr(self.client.get('/api/menu-items'), 'data'))
+        self.assertFalse(hasattr(self.client.get('/api/menu-items'), 'data'))
+        # A write handled by another worker process, which has a cache of its own
+        child = multiprocessing.get_context('fork').Process(target=bump_catalog_version)
+        child.start()
+        child.join()
+        self.assertTrue(hasattr(self.client.get('/api/menu-items'), 'data'))
+
+
+class FragmentCacheTests(OrderDataMixin, APITestCase):
+    """
+    Menu item pages are joined from cached per-item JSON, re-rendered only for the
+    items (or categories) that changed, and identical to the serializer output.
+    """
+
+    def setUp(self):
+        super().setUp()
+        fragment_cache.clear()
+
+    def get_page(self, num_queries):
+        with self.assertNumQueries(num_queries):
+            response = self.client.get('/api/menu-items', {'ordering': 'title'})
+        self.assertEqual(response.status_code, 200)
+        cache.clear() # the regular path must not be answered from the catalog cache
+        with mock.patch.object(FragmentCacheMixin, 'get_fragment_serializer', return_value=None):
+            self.assertEqual(response.content, self.client.get('/api/menu-items', {'ordering': 'title'}).content)
+        cache.clear()
+        fragment_cache.clear()
+        return response
+
+    def test_fragments(self):
+        # count, ids and timestamps of the page, the items missing from the cache
+        self.get_page(3)
+        self.client.get('/api/menu-items', {'ordering': 'title'})
+        bump_catalog_version() # the page is no longer cached, its items still are
+        self.get_page(2)
+
+        self.client.get('/api/menu-items', {'ordering': 'title'})
+        category = self.menu_items[0].category
+        category.title = 'Main courses'
+        category.save()
+        response = self.get_page(3)
+        self.assertEqual({item['category']['title'] for item in response.json()['results']}, {'Main courses'})
+
+
+def encode_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginationTests(OrderDataMixin, APITestCase):
+    """
+    Following the cursors visits every row once, in the requested order, whatever the
+    duplicates and NULLs in the ordering columns. A cursor that does not decode, or whose
+    values don't fit the ordering columns, is a 400.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_orders(7)
+        other = User.objects.create_user('another crew')
+        orders = list(Order.objects.order_by('pk'))
+        # Duplicates and NULLs in every ordering column
+        for order, crew, total, days in zip(orders, [None, other, None, self.crew, other, None, self.crew], [15, 10, 15, 20, 10, 15, 10], [0, 1, 1, 2, 0, 1, 2]):
+            Order.objects.filter(pk=order.pk).update(delivery_crew=crew, total=total, date=date.today() - timedelta(days=days))
+        self.orders = list(Order.objects.select_related('delivery_crew'))
+
+    def pages(self, params):
+        """The ids on every page, following the next links, straight through KeysetPagination."""
+        view = OrdersListCreateView()
+        params = {'page_size': 2, **params}
+        pages = []
+        while True:
+            paginator = KeysetPagination()
+            request = Request(APIRequestFactory().get('/api/orders', params))
+            pages.append([order.pk for order in paginator.paginate_queryset(Order.objects.all(), request, view)])
+            link = paginator.get_next_link()
+            if link is None:
+                return pages
+            params = {name: value[0] for name, value in parse_qs(urlparse(link).query).items()}
+
+    def test_round_trips(self):
+        crew = lambda order: (order.delivery_crew is not None, order.delivery_crew.username if order.delivery_crew else '')
+        orderings = {
+            'delivery_crew__username': lambda order: (crew(order), order.pk), # NULLs first
+            'total': lambda order: (order.total, order.pk),
+            '-date': lambda order: (order.date, order.pk),
+            'date,-delivery_crew__username': lambda order: (order.date, not crew(order)[0], tuple(-ord(c) for c in crew(order)[1]), -order.pk),
+        }
+        for ordering, key in orderings.items():
+            expected = [order.pk for order in sorted(self.orders, key=key, reverse=ordering.startswith('-'))]
+            pages = self.pages({'ordering': ordering})
+            self.assertEqual([len(page) for page in pages], [2, 2, 2, 1], ordering)
+            self.assertEqual(sum(pages, []), expected, ordering)
+        # Descending on a nullable column puts the NULLs last
+        self.assertEqual(
+            sum(self.pages({'ordering': '-delivery_crew__username'}), []),
+            [order.pk for order in sorted(self.orders, key=orderings['delivery_crew__username'], reverse=True)],
+        )
+
+    def test_page_size(self):
+        self.assertEqual([len(page) for page in self.pages({'page_size': 5})], [5, 2])
+        self.assertEqual([len(page) for page in self.pages({'page_size': 0})], [1] * 7)
+        self.assertEqual(len(self.pages({'page_size': 1000})[0]), 7)
+        with mock.patch.object(KeysetPagination, 'max_page_size', 3):
+            self.assertEqual([len(page) for page in self.pages({'page_size': 1000})], [3, 3, 1])
+        paginator = KeysetPagination()
+        self.assertEqual(paginator.get_page_size(Request(APIRequestFactory().get('/', {'page_size': 10**6}))), 100)
+        self.assertEqual(paginator.get_page_size(Request(APIRequestFactory().get('/', {'page_size': 'many'}))), 2)
+
+    def test_invalid_cursors(self):
+        self.client.force_authenticate(self.manager)
+        cursors = [
+            '!!!',
+            'bm90IGpzb24', # not JSON
+            encode_cursor(None),
+            encode_cursor([['-date', '-id']]),
+            encode_cursor([['id'], [1]]), # another ordering
+            encode_cursor([['-date', '-id'], ['2024-01-01']]),
+            encode_cursor([['-date', '-id'], [{'date': 1}, 1]]),
+            encode_cursor([['-date', '-id'], ['yesterday', 1]]),
+            encode_cursor([['-date', '-id'], ['2024-02-30', 1]]),
+            encode_cursor([['-date', '-id'], ['2024-01-01', 'one']]),
+        ]
+        for cursor in cursors:
+            response = self.client.get('/api/orders', {'ordering': '-date', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {'detail': 'Invalid cursor'})
+        for cursor in (encode_cursor([['total', 'id'], ['lots', 1]]), encode_cursor([['total', 'id'], [float('inf'), 1]]), encode_cursor([['total', 'id'], [15, float('inf')]]), encode_cursor([['total', 'id'], [15, float('nan')]])):
+            self.assertEqual(self.client.get('/api/orders', {'ordering': 'total', 'cursor': cursor}).status_code, 400, cursor)
+        # Out of range for the column, but not invalid: nothing sorts after it
+        response = self.client.get('/api/orders', {'ordering': '-date', 'cursor': encode_cursor([['-date', '-id'], ['2024-01-01', 2**70]])})
+        self.assertEqual((response.status_code, response.data['results']), (200, []))
+        # A cursor from a next link works
+        response = self.client.get('/api/orders', {'ordering': '-date', 'cursor': encode_cursor([['-date', '-id'], [date.today().isoformat(), 10**6]])})
+        self.assertEqual(response.status_code, 200)
+
+
+class OrderDispatchTests(OrderDataMixin, APITestCase):
+    """
+    Dispatch spreads the unassigned open orders over the delivery crew, always
+    to the member with the fewest open orders.
+    """
+
+    def test_dispatch_balances_open_orders(self):
+        other_crew = User.objects.create_user('crew2', password='crew2')
+        Group.objects.get(name='Delivery crew').user_set.add(other_crew)
+        self.create_orders(3) # open orders of self.crew
+        Order.objects.create(user=self.customer, delivery_crew=other_crew, status=True, total=5, date=date.today())
+        Order.objects.bulk_create(Order(user=self.customer, total=5, date=date.today()) for _ in range(5))
+        delivered = Order.objects.create(user=self.customer, status=True, total=5, date=date.today())
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/api/orders/dispatch')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned'], 5)
+        self.assertEqual(response.data['crew'], [
+            {'id': self.crew.pk, 'username': 'crew', 'assigned': 1, 'open_orders': 4},
+            {'id': other_crew.pk, 'username': 'crew2', 'assigned': 4, 'open_orders': 4},
+        ])
+        self.assertEqual(Order.objects.filter(status=False, delivery_crew=other_crew).count(), 4)
+        self.assertFalse(Order.objects.filter(status=False, delivery_crew__isnull=True).exists())
+        delivered.refresh_from_db()
+        self.assertIsNone(delivered.delivery_crew) # delivered orders are left alone
+
+        response = self.client.post('/api/orders/dispatch')
+        self.assertEqual(response.data['assigned'], 0)
+
+    def test_dispatch_needs_a_manager_and_a_crew(self):
+        self.client.force_authenticate(self.crew)
+        self.assertEqual(self.client.post('/api/orders/dispatch').status_code, 403)
+        Group.objects.get(name='Delivery crew').user_set.clear()
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.post('/api/orders/dispatch').status_code, 400)
+
+
+class OrderStatusUpdateTests(OrderDataMixin, APITestCase):
+    """
+    The bulk status update follows the rules of a PATCH on a single order,
+    with one UPDATE for the whole batch.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_orders(2)
+        self.other = Order.objects.create(user=self.customer, total=5, date=date.today())
+        self.crew_orders = list(Order.objects.filter(delivery_crew=self.crew).values_list('pk', flat=True))
+
+    def test_crew_updates_their_own_orders(self):
+        self.client.force_authenticate(User.objects.get(pk=self.crew.pk))
+        cache.clear()
+        ids = self.crew_orders + [self.other.pk, 999999]
+        # roles, ids and crew, UPDATE, and the savepoint the transaction becomes inside a test case
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/orders/status', {'orders': ids, 'status': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.crew_orders[0], 'result': 'updated'},
+            {'id': self.crew_orders[1], 'result': 'updated'},
+            {'id': self.other.pk, 'result': 'not assigned to you'},
+            {'id': 999999, 'result': 'not found'},
+        ])
+        self.assertEqual(set(Order.objects.filter(status=True).values_list('pk', flat=True)), set(self.crew_orders))
+
+    def run_after_the_check(self, change, ids, crew):
+        """set_status(ids, True, crew), with `change` made by another request right after the ids are read."""
+        changed = []
+
+        def wrapper(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if sql.startswith('SELECT') and not changed:
+                changed.append(sql)
+                change()
+            return result
+
+        with connections['default'].execute_wrapper(wrapper):
+            return set_status(ids, True, crew=crew)
+
+    def test_orders_changed_after_the_check(self):
+        moved, kept = self.crew_orders
+        results = self.run_after_the_check(lambda: Order.objects.filter(pk=moved).update(delivery_crew=None), [moved, kept], self.crew)
+        self.assertEqual(results, [{'id': moved, 'result': 'not assigned to you'}, {'id': kept, 'result': 'updated'}])
+        self.assertEqual(list(Order.objects.filter(status=True).values_list('pk', flat=True)), [kept])
+
+        results = self.run_after_the_check(lambda: Order.objects.filter(pk=self.other.pk).delete(), [self.other.pk, moved], None)
+        self.assertEqual(results, [{'id': self.other.pk, 'result': 'not found'}, {'id': moved, 'result': 'updated'}])
+
+    def test_role_rules(self):
+        self.client.force_authenticate(self.crew)
+        response = self.client.post('/api/orders/status', {'orders': self.crew_orders, 'status': True, 'delivery_crew': None}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/status', {'orders': self.crew_orders, 'status': True}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/api/orders/status', {'orders': [self.other.pk], 'status': True}, format='json')
+        self.assertEqual(response.data['results'], [{'id': self.other.pk, 'result': 'updated'}])
+        self.assertTrue(Order.objects.get(pk=self.other.pk).status)
+
+
+class JobQueueTests(OrderDataMixin, APITestCase):
+    """
+    Checkout leaves the sales aggregates to the job queue: the job is written with the
+    order and takes effect once, when the worker runs it.
+    """
+
+    def checkout(self):
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menuitem=item, quantity=2, unit_price=5, price=10) for item in self.menu_items
+        )
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, 200)
+        return Order.objects.get(user=self.customer)
+
+    def test_checkout_defers_the_sales_aggregates(self):
+        order = self.checkout()
+        self.assertEqual(order.total, 30)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(DailySales.objects.exists())
+        job = Job.objects.get()
+        self.assertEqual((job.key, job.state), (f'sales:checkout:{order.pk}', Job.PENDING))
+
+        self.assertEqual(jobs.run_jobs(), (1, 0))
+        self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(), (1, 30))
+        self.assertEqual(jobs.run_jobs(), (0, 0)) # done once
+
+        self.client.force_authenticate(self.manager)
+        self.client.delete(f'/api/orders/{order.pk}')
+        self.assertEqual(jobs.run_jobs(), (1, 0))
+        self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(), (0, 0))
+
+    def test_checkout_total(self):
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menuitem=item, quantity=1, unit_price=price, price=price)
+            for item, price in zip(self.menu_items, ('0.10', '0.20', '0.30'))
+        )
+        self.client.force_authenticate(self.customer)
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertEqual(self.client.post('/api/orders').status_code, 200)
+        # Summed by the database from the inserted order items
+        self.assertTrue(any('SUM(' in query['sql'] for query in queries if query['sql'].startswith('UPDATE')))
+        self.assertEqual(Order.objects.get(user=self.customer).total, Decimal('0.60'))
+
+    def test_without_the_queue_checkout_records_its_sales(self):
+        with self.settings(JOB_QUEUE=False):
+            self.checkout()
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(), (1, 30))
+
+    def test_keys_retries_and_failures(self):
+        ran = []
+
+        def fail(payload):
+            OrderItem.objects.all().delete() # rolled back with the failing job
+            raise RuntimeError('boom')
+
+        with mock.patch.dict(jobs.HANDLERS, {'test.ok': ran.append, 'test.fail': fail}), \
+                mock.patch.object(jobs, 'MAX_ATTEMPTS', 2):
+            self.create_orders(1)
+            jobs.enqueue('test.ok', {'n': 1}, key='once')
+            jobs.enqueue('test.ok', {'n': 2}, key='once')
+            jobs.enqueue('test.fail', {})
+            self.assertEqual(jobs.run_jobs(), (1, 1))
+            self.assertEqual(ran, [{'n': 1}])
+            self.assertEqual(OrderItem.objects.count(), 3)
+            failing = Job.objects.get(name='test.fail')
+            self.assertEqual((failing.state, failing.attempts, failing.last_error), (Job.PENDING, 1, 'RuntimeError: boom'))
+            self.assertGreater(failing.run_after, timezone.now())
+            self.assertEqual(jobs.run_jobs(), (0, 0)) # not due yet
+
+            Job.objects.filter(pk=failing.pk).update(run_after=timezone.now())
+            self.assertEqual(jobs.run_jobs(), (0, 1))
+            self.assertEqual(Job.objects.get(pk=failing.pk).state, Job.FAILED)
+            with self.assertRaises(ValueError):
+                jobs.enqueue('test.unknown', {})
+
+
+class SalesTests(OrderDataMixin, APITestCase):
+    """
+    The sales report reads the per day and per menu item aggregates. The request paths
+    keep them up to date (inline here, with JOB_QUEUE = False), and rebuild_sales()
+    recomputes them from the orders to the same totals.
+    """
+
+    def aggregates(self):
+        return (
+            set(DailySales.objects.exclude(orders=0).values_list('date', 'orders', 'revenue')),
+            set(DailyMenuItemSales.objects.exclude(quantity=0).values_list('date', 'menuitem', 'quantity', 'revenue')),
+        )
+
+    def recompute(self):
+        """The aggregates summed up in Python from every order and order item."""
+        days, menu_items = {}, {}
+        for order in OrderHistory.objects.all():
+            orders, revenue = days.get(order.date, (0, Decimal(0)))
+            days[order.date] = (orders + 1, revenue)
+        for item in OrderHistoryItem.objects.select_related('order'):
+            orders, revenue = days[item.order.date]
+            days[item.order.date] = (orders, revenue + item.price)
+            quantity, revenue = menu_items.get((item.order.date, item.menuitem_id), (0, Decimal(0)))
+            menu_items[item.order.date, item.menuitem_id] = (quantity + item.quantity, revenue + item.price)
+        return (
+            {(day, orders, revenue) for day, (orders, revenue) in days.items()},
+            {(day, menuitem, quantity, revenue) for (day, menuitem), (quantity, revenue) in menu_items.items()},
+        )
+
+    def checkout(self, quantities):
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menuitem=item, quantity=quantity, unit_price=5, price=5 * quantity)
+            for item, quantity in zip(self.menu_items, quantities)
+        )
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.post('/api/orders').status_code, 200)
+        return Order.objects.latest('pk')
+
+    def test_report(self):
+        self.create_orders(3)
+        first, second = date.today() - timedelta(days=2), date.today() - timedelta(days=1)
+        orders = list(Order.objects.order_by('pk'))
+        Order.objects.filter(pk__in=[orders[0].pk, orders[1].pk]).update(date=first)
+        Order.objects.filter(pk=orders[2].pk).update(date=second)
+        OrderItem.objects.filter(order=orders[0], menuitem=self.menu_items[2]).update(quantity=3, price=15)
+        rebuild_sales()
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/reports/sales')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['start'], response.data['end']), (None, None))
+        self.assertEqual((response.data['orders'], Decimal(response.data['revenue'])), (3, 55))
+        self.assertEqual(
+            [(day['date'], day['orders'], Decimal(day['revenue'])) for day in response.data['days']],
+            [(first.isoformat(), 2, 40), (second.isoformat(), 1, 15)],
+        )
+        # Best selling first, ties by menu item
+        self.assertEqual(
+            [(item['menuitem'], item['title'], item['quantity'], Decimal(item['revenue'])) for item in response.data['menu_items']],
+            [
+                (self.menu_items[2].pk, 'Dish 2', 5, 25),
+                (self.menu_items[0].pk, 'Dish 0', 3, 15),
+                (self.menu_items[1].pk, 'Dish 1', 3, 15),
+            ],
+        )
+
+        response = self.client.get('/api/reports/sales', {'start': second.isoformat()})
+        self.assertEqual((response.data['orders'], len(response.data['days'])), (1, 1))
+        self.assertEqual([item['quantity'] for item in response.data['menu_items']], [1, 1, 1])
+        response = self.client.get('/api/reports/sales', {'start': first.isoformat(), 'end': first.isoformat()})
+        self.assertEqual((response.data['start'], response.data['end']), (first.isoformat(), first.isoformat()))
+        self.assertEqual((response.data['orders'], Decimal(response.data['revenue'])), (2, 40))
+        self.assertEqual(self.client.get('/api/reports/sales', {'end': 'yesterday'}).status_code, 400)
+
+        for user in (self.crew, self.customer):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get('/api/reports/sales').status_code, 403)
+
+    def test_request_paths_record_inline(self):
+        with self.settings(JOB_QUEUE=False):
+            first = self.checkout([1, 2, 3])
+            self.assertEqual(self.aggregates(), self.recompute())
+            self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(), (1, 30))
+            second = self.checkout([4, 1, 1])
+            self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(), (2, 60))
+
+            # A new date moves the order's sales to that day
+            self.client.force_authenticate(self.manager)
+            yesterday = date.today() - timedelta(days=1)
+            response = self.client.patch(f'/api/orders/{first.pk}', {'date': yesterday.isoformat()})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.aggregates(), self.recompute())
+            self.assertEqual(DailySales.objects.get(date=yesterday).orders, 1)
+
+            # Deleting takes it out again (sign=-1)
+            self.client.delete(f'/api/orders/{second.pk}')
+            self.assertFalse(Order.objects.filter(pk=second.pk).exists())
+            self.assertEqual(self.aggregates(), self.recompute())
+            self.assertEqual(DailySales.objects.values_list('orders', 'revenue').get(date=date.today()), (0, 0))
+        self.assertFalse(Job.objects.exists())
+
+    def test_rebuild_matches_a_recomputation(self):
+        with self.settings(JOB_QUEUE=False):
+            orders = [self.checkout(quantities) for quantities in ([1, 2, 3], [2, 1, 1], [1, 5, 1], [3, 3, 3])]
+        # Written outside the API: the aggregates no longer add up
+        Order.objects.filter(pk=orders[0].pk).update(date=date.today() - timedelta(days=3))
+        Order.objects.filter(pk=orders[1].pk).delete()
+        OrderItem.objects.filter(order=orders[2]).update(quantity=2, price=10)
+        self.create_orders(2)
+        Order.objects.filter(pk=orders[3].pk).update(status=True, date=archive_cutoff() - timedelta(days=1))
+        archive_orders()
+        self.assertNotEqual(self.aggregates(), self.recompute())
+
+        self.assertEqual(rebuild_sales(), (3, 9))
+        self.assertEqual(self.aggregates(), self.recompute())
+        # Rebuilding again changes nothing
+        rebuild_sales()
+        self.assertEqual(self.aggregates(), self.recompute())
+
+
+class OrderExportTests(OrderDataMixin, APITestCase):
+    """
+    The export streams every order matching the list filters as NDJSON or CSV, reading
+    the orders and their items EXPORT_CHUNK_SIZE orders at a time.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_orders(5)
+        self.orders = list(Order.objects.order_by('pk'))
+        Order.objects.filter(pk=self.orders[0].pk).update(delivery_crew=None, date=date.today() - timedelta(days=1))
+        self.client.force_authenticate(self.manager)
+
+    def export(self, params=None):
+        response = self.client.get('/api/orders/export', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.ndjson"')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.pk for order in self.orders])
+        self.assertEqual(
+            {key: value for key, value in rows[0].items() if key != 'order_items'},
+            {
+                'id': self.orders[0].pk, 'user': self.customer.pk, 'delivery_crew': None, 'status': False,
+                'total': '15.00', 'date': (date.today() - timedelta(days=1)).isoformat(),
+            },
+        )
+        item = OrderItem.objects.filter(order=self.orders[0]).order_by('pk').first()
+        self.assertEqual(len(rows[0]['order_items']), 3)
+        self.assertEqual(
+            rows[0]['order_items'][0],
+            {'id': item.pk, 'menuitem': item.menuitem_id, 'quantity': 1, 'unit_price': '5.00', 'price': '5.00'},
+        )
+
+    def test_csv(self):
+        response, content = self.export({'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [order.pk for order in self.orders])
+        self.assertEqual(rows[1][1:6], [str(self.customer.pk), '', 'False', '15.00', (date.today() - timedelta(days=1)).isoformat()])
+        self.assertEqual([item['quantity'] for item in json.loads(rows[1][6])], [1, 1, 1])
+        # The header alone when nothing matches
+        self.assertEqual(self.export({'format': 'csv', 'user': 'nobody'})[1].splitlines(), [','.join(rows[0])])
+
+    def test_chunks(self):
+        with mock.patch('LittleLemonAPI.views.EXPORT_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connections['default']) as queries:
+            content = self.export()[1]
+        self.assertEqual(len(content.splitlines()), 5)
+        # One order items query per chunk of 2 orders
+        self.assertEqual(len(self.item_queries(queries)), 3)
+
+    async def read_export(self, token, queries):
+        """The export lines, read through the ASGI handler, and the order items queries run by the time the first one was out."""
+        response = await self.async_client.get('/api/orders/export', headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = aiter(response.streaming_content)
+        first = await anext(content)
+        item_queries = len(self.item_queries(queries))
+        return [first] + [chunk async for chunk in content], item_queries
+
+    def item_queries(self, queries):
+        return [query for query in queries if OrderHistoryItem._meta.db_table in query['sql']]
+
+    def test_streams_under_asgi(self):
+        token = Token.objects.create(user=self.manager)
+        with mock.patch('LittleLemonAPI.views.EXPORT_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connections['default']) as queries:
+            lines, first_line_item_queries = async_to_sync(self.read_export)(token, queries)
+        # The first line is out before the second chunk of orders is read
+        self.assertEqual(first_line_item_queries, 1)
+        self.assertEqual(len(self.item_queries(queries)), 3)
+        self.assertEqual([json.loads(line)['id'] for line in lines], [order.pk for order in self.orders])
+
+    def test_filters(self):
+        ids = lambda params: [json.loads(line)['id'] for line in self.export(params)[1].splitlines()]
+        self.assertEqual(ids({'date': date.today().isoformat()}), [order.pk for order in self.orders[1:]])
+        self.assertEqual(ids({'delivery_crew': 'crew'}), [order.pk for order in self.orders[1:]])
+        self.assertEqual(ids({'ordering': '-date'})[-1], self.orders[0].pk)
+        self.assertEqual(ids({'user': 'customer', 'total': '15.00'}), [order.pk for order in self.orders])
+        self.assertEqual(ids({'user': 'manager'}), [])
+
+        for user in (self.crew, self.customer):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get('/api/orders/export').status_code, 403)
+
+
+class ConditionalGetTests(OrderDataMixin, APITestCase):
+    """
+    The menu item and order detail views answer conditional GETs with a 304 from a
+    single-row lookup, on their own throttle budget.
+    """
+
+    def test_menu_item_detail(self):
+        item = self.menu_items[0]
+        path = f'/api/menu-items/{item.pk}'
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(path)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content, response['ETag']), (304, b'', etag))
+        response = self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        category = item.category
+        category.title = 'Main courses'
+        category.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category']['title'], 'Main courses')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_order_detail(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        path = f'/api/orders/{order.pk}'
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Other users get what an unconditional request gets
+        self.client.force_authenticate(self.crew)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        self.client.post('/api/orders/status', {'orders': [order.pk], 'status': True}, format='json')
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_not_modified_throttle_budget(self):
+        path = f'/api/menu-items/{self.menu_items[0].pk}'
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get(path)['ETag']
+        # More 304s than the 20/minute of full reads, which are left untouched
+        for _ in range(25):
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+        with mock.patch.dict(NotModifiedRateThrottle.THROTTLE_RATES, {'not_modified': '1/minute'}):
+            bucket_store.clear()
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 429)
+
+
+class ServerTimingTests(OrderDataMixin, APITestCase):
+    """
+    API responses say where their time went, and slow requests are kept,
+    with their SQL, for superusers to read.
+    """
+
+    def setUp(self):
+        super().setUp()
+        timing.traces.clear()
+        self.addCleanup(timing.traces.clear)
+        self.create_orders(2)
+
+    def metrics(self, response):
+        return {metric.split(';')[0].strip() for metric in response['Server-Timing'].split(',')}
+
+    def test_server_timing_header(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/orders')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.metrics(response), {'db', 'throttle', 'serialize', 'render', 'app', 'total'})
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+        self.assertNotIn('Server-Timing', self.client.get('/admin/login/'))
+
+    def test_slow_request_traces(self):
+        user = User.objects.create_superuser('admin', password='admin')
+        self.client.force_authenticate(self.customer)
+        with mock.patch.object(timing, 'SLOW_REQUEST_MS', 0):
+            self.client.get('/api/orders', {'ordering': '-date'})
+        self.assertEqual(self.client.get('/api/debug/traces').status_code, 403)
+
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/debug/traces')
+        self.assertEqual(response.status_code, 200)
+        trace, = response.data
+        self.assertEqual((trace['path'], trace['view'], trace['status']), ('/api/orders?ordering=-date', 'OrdersListCreateView', 200))
+        self.assertEqual(trace['queries'], len(trace['sql']))
+        self.assertTrue(any('ORDER BY' in query['sql'] for query in trace['sql']))
+
+
+READ_ENDPOINTS = [
+    ('menu-items', MenuItemsView, AsyncMenuItemsView),
+    ('categories', CategoriesView, AsyncCategoriesView),
+    ('cart/menu-items', CartItemsView, AsyncCartItemsView),
+    ('orders', OrdersListCreateView, AsyncOrdersListView),
+]
+
+
+def read_urls(async_views):
+    """The endpoints with an async read path, their GETs served by the async views or by the sync ones."""
+    with override_settings(ASYNC_READ_VIEWS=async_views):
+        return [path(f'api/{route}', read_view(view, async_view)) for route, view, async_view in READ_ENDPOINTS]
+
+
+class AsyncReadURLConf:
+    urlpatterns = read_urls(True)
+
+
+class SyncReadURLConf:
+    urlpatterns = read_urls(False)
+
+
+@override_settings(ROOT_URLCONF=AsyncReadURLConf)
+class AsyncReadViewTests(OrderDataMixin, APITestCase):
+    """
+    With ASYNC_READ_VIEWS on, the GETs of the read endpoints go through AsyncAPIView:
+    token authentication, the role lookup and the throttles awaited, the pages fetched
+    with the async ORM. They answer exactly what the sync views answer.
+    """
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.tokens = {user: Token.objects.create(user=user).key for user in (self.manager, self.crew, self.customer)}
+        self.create_orders(3)
+        Order.objects.filter(pk=Order.objects.latest('pk').pk).update(delivery_crew=None)
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menuitem=item, quantity=1, unit_price=5, price=5) for item in self.menu_items
+        )
+
+    def headers(self, user):
+        return {'Authorization': f'Token {self.tokens[user]}'} if user else {}
+
+    async def get(self, path, user=None, params=None):
+        return await self.async_client.get(path, params, headers=self.headers(user))
+
+    def assertAsyncView(self, response):
+        if hasattr(response, 'renderer_context'): # not a catalog cache hit
+            self.assertIsInstance(response.renderer_context['view'], AsyncAPIView)
+
+    async def pages(self, path, user=None, params=None):
+        """The results of every page, following the next links."""
+        response = await self.get(path, user, params)
+        results = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertAsyncView(response)
+            results += response.json()['results']
+            if not response.json()['next']:
+                return results
+            response = await self.get(response.json()['next'], user)
+
+    async def test_role_gating(self):
+        response = await self.get('/api/cart/menu-items')
+        self.assertEqual(response.status_code, 401)
+        self.assertAsyncView(response)
+        # The anonymous throttle is checked too
+        self.assertEqual((await self.get('/api/orders')).status_code, 429)
+        response = await self.async_client.get('/api/orders', headers={'Authorization': 'Token invalid'})
+        self.assertEqual(response.status_code, 401)
+
+        for user in (self.manager, self.crew):
+            response = await self.get('/api/cart/menu-items', user)
+            self.assertEqual(response.status_code, 403)
+            self.assertAsyncView(response)
+        response = await self.get('/api/cart/menu-items', self.customer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+        # Every order for the manager, the assigned ones for the crew, their own for the customer
+        self.assertEqual(len(await self.pages('/api/orders', self.manager)), 3)
+        self.assertEqual(len(await self.pages('/api/orders', self.crew)), 2)
+        self.assertEqual(len(await self.pages('/api/orders', self.customer)), 3)
+        self.assertEqual(await self.pages('/api/orders', self.manager, {'user': 'crew'}), [])
+
+    async def test_menu_item_pages(self):
+        titles = ['Dish 0', 'Dish 1', 'Dish 2']
+        response = await self.get('/api/menu-items', self.customer)
+        self.assertEqual((response.json()['count'], len(response.json()['results'])), (3, 2))
+        self.assertEqual([item['title'] for item in await self.pages('/api/menu-items', self.customer)], titles)
+        pages = await self.pages('/api/menu-items', self.customer, {'pagination': 'keyset', 'ordering': '-title'})
+        self.assertEqual([item['title'] for item in pages], titles[::-1])
+
+        # Served from the catalog cache the second time, without reaching the view's handler
+        first = await self.get('/api/menu-items', self.customer, {'ordering': 'price'})
+        second = await self.get('/api/menu-items', self.customer, {'ordering': 'price'})
+        self.assertTrue(hasattr(first, 'data'))
+        self.assertFalse(hasattr(second, 'data'))
+        self.assertEqual(second.json(), first.json())
+
+    async def test_order_pages(self):
+        ids = [order['id'] for order in await self.pages('/api/orders', self.manager)]
+        self.assertEqual(ids, sorted(ids))
+        pages = await self.pages('/api/orders', self.manager, {'pagination': 'keyset', 'ordering': '-date', 'page_size': 2})
+        self.assertEqual([order['id'] for order in pages], ids[::-1])
+        self.assertEqual([len(order['order_items']) for order in pages], [3, 3, 3])
+
+    def test_bodies_match_sync_views(self):
+        requests = [
+            ('/api/menu-items', None, {}),
+            ('/api/menu-items', self.customer, {'page': 2}),
+            ('/api/menu-items', self.customer, {'pagination': 'keyset', 'ordering': 'price', 'fields': 'id,title'}),
+            ('/api/categories', self.customer, {}),
+            ('/api/cart/menu-items', self.customer, {'fields': 'menuitem,quantity,price'}),
+            ('/api/orders', self.manager, {}),
+            ('/api/orders', self.manager, {'pagination': 'keyset', 'ordering': '-delivery_crew__username', 'expand': ''}),
+            ('/api/orders', self.crew, {'fields': 'id,total,order_items', 'page': 1}),
+            ('/api/orders', self.customer, {'ordering': '-total'}),
+        ]
+        for path, user, params in requests:
+            response = async_to_sync(self.get)(path, user, params)
+            self.assertEqual(response.status_code, 200, (path, params))
+            self.assertAsyncView(response)
+            cache.clear() # the catalog cache is shared with the sync views
+            with override_settings(ROOT_URLCONF=SyncReadURLConf):
+                expected = self.client.get(path, params, headers=self.headers(user))
+            self.assertNotIsInstance(expected.renderer_context['view'], AsyncAPIView)
+            self.assertEqual(response.json(), expected.json(), (path, params))
+            cache.clear()
+
+
+class WarmUpTests(OrderDataMixin, APITestCase):
+    """
+    The warm-up fills the caches the first requests of a worker would otherwise fill,
+    without charging any throttle bucket.
+    """
+
+    def test_warm_up(self):
+        Token.objects.create(user=self.manager)
+        # Not the replica's connection, in the tests it is a second connection to the test database
+        with self.settings(WARMUP_HOST='testserver'), mock.patch.object(warmup, 'connections', {'default': connections['default']}):
+            # The requests go through Django's WSGI handler, which closes the database connections
+            # after a request, as the test client does not: not the test's connection
+            request_started.disconnect(close_old_connections)
+            request_finished.disconnect(close_old_connections)
+            try:
+                report = warm_up()
+            finally:
+                request_started.connect(close_old_connections)
+                request_finished.connect(close_old_connections)
+        self.assertEqual([name for name, _, _ in report], [name for name, _ in STEPS])
+        self.assertFalse([detail for _, _, detail in report if detail.startswith('failed')])
+        self.assertRegex(dict((name, detail) for name, _, detail in report)['requests'], r'^status 200 200 (200|404)$')
+
+        manager = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_roles(manager), {'Manager'})
+            self.assertEqual(self.client.get('/api/menu-items').status_code, 200)
+        # The detail view allows anonymous clients one call a minute, the warm-up did not use it
+        self.assertEqual(self.client.get(f'/api/menu-items/{self.menu_items[0].pk}').status_code, 200)
+
+    def test_opt_in(self):
+        with mock.patch.object(warmup, 'warm_up', return_value=[]) as warm_up_mock, mock.patch.object(warmup, 'logger'):
+            warmup.warm_up_on_start() # WARMUP_ON_START is off unless LITTLELEMON_WARMUP=1
+            self.assertFalse(warm_up_mock.called)
+            with self.settings(WARMUP_ON_START=True):
+                warmup.warm_up_on_start()
+            self.assertTrue(warm_up_mock.called)
+
+
+class ReplicaRoutingTests(OrderDataMixin, APITestCase):
+    """
+    The listings are read from the replica, except by users who just wrote to their cart
+    or orders and while the replica lacks a catalog write. The replica is the test
+    database itself here, the responses read from it carry its lag in Server-Timing.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for patch in (mock.patch.object(replica, 'replica_configured', return_value=True), mock.patch.object(replica, 'REPLICA', 'default')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        replica_state.set_synced_at(time.time())
+
+    def from_replica(self, path, user=None):
+        self.client.force_authenticate(user)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return 'replica;' in response['Server-Timing']
+
+    def test_listings_read_from_the_replica(self):
+        self.assertTrue(self.from_replica('/api/menu-items'))
+        self.assertTrue(self.from_replica('/api/categories'))
+        self.assertTrue(self.from_replica('/api/orders', self.customer))
+        self.assertFalse(self.from_replica('/api/cart/menu-items', self.customer))
+
+        replica_state.set_synced_at(time.time() - replica.MAX_LAG - 1) # lagging too far behind
+        self.assertFalse(self.from_replica('/api/orders', self.customer))
+        replica_state.clear() # never synced
+        self.assertFalse(self.from_replica('/api/orders', self.customer))
+
+    def test_read_your_writes(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/cart/menu-items', {'menuitem': self.menu_items[0].pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.from_replica('/api/orders', self.customer))
+        self.assertTrue(self.from_replica('/api/orders', self.crew))
+
+        with mock.patch.object(replica, 'STICKY_SECONDS', 0):
+            # Past the window the replica must still have been synced after the write
+            self.assertFalse(self.from_replica('/api/orders', self.customer))
+            replica_state.set_synced_at(time.time())
+            self.assertTrue(self.from_replica('/api/orders', self.customer))
+
+    def test_catalog_writes(self):
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            category = self.menu_items[0].category
+            category.title = 'Main courses'
+            category.save()
+        self.assertFalse(self.from_replica('/api/menu-items'))
+        self.assertTrue(self.from_replica('/api/orders', self.customer))
+
+    def test_replica_status(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', password='admin'))
+        status = self.client.get('/api/debug/replica').json()
+        self.assertEqual((status['configured'], status['serving_reads']), (True, True))
+        self.assertLess(status['lag'], 5)
+
+
+class OrderArchiveTests(OrderDataMixin, APITestCase):
+    """
+    Delivered orders older than the hot window move to the archive tables with their items.
+    The listings only read the archive when the request reaches outside the hot window,
+    the detail view always finds an archived order, and nothing changes the sales.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_orders(4)
+        old = archive_cutoff() - timedelta(days=1)
+        self.orders = list(Order.objects.order_by('pk'))
+        # Two old delivered orders, an old open one and a recent delivered one
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[:3]]).update(date=old)
+        Order.objects.filter(pk__in=[self.orders[0].pk, self.orders[1].pk, self.orders[3].pk]).update(status=True)
+        self.old_date = old.isoformat()
+        rebuild_sales()
+        self.sales = (list(DailySales.objects.values_list('date', 'orders', 'revenue')), list(DailyMenuItemSales.objects.values_list('date', 'menuitem', 'quantity')))
+        self.etag = self.get_order(self.orders[0].pk)['ETag']
+        self.assertEqual(archive_orders(batch_size=1), 2)
+
+    def get_order(self, pk, **headers):
+        self.client.force_authenticate(self.customer)
+        return self.client.get(f'/api/orders/{pk}', **headers)
+
+    def test_history_views_match_models(self):
+        # The views are created by migration 0008 from its own copy of the column lists
+        for model in (OrderHistory, OrderHistoryItem):
+            with connections['default'].cursor() as cursor:
+                cursor.execute(f'SELECT * FROM "{model._meta.db_table}" LIMIT 0')
+                self.assertEqual(
+                    [column[0] for column in cursor.description], [field.column for field in model._meta.concrete_fields]
+                )
+        self.assertEqual(OrderHistory.objects.count(), 4)
+        self.assertEqual(OrderHistoryItem.objects.count(), 12)
+
+    def list_ids(self, params):
+        """The ids of every page of the manager's order list."""
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/orders', params)
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [order['id'] for order in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_orders_move_with_their_items(self):
+        archived = [order.pk for order in self.orders[:2]]
+        self.assertEqual(list(ArchivedOrder.objects.values_list('pk', flat=True)), archived)
+        self.assertEqual(set(ArchivedOrderItem.objects.values_list('order', flat=True)), set(archived))
+        self.assertEqual(OrderItem.objects.filter(order__in=archived).count(), 0)
+        self.assertEqual(list(Order.objects.values_list('pk', flat=True)), [order.pk for order in self.orders[2:]])
+        self.assertEqual(archive_orders(), 0)
+
+        rebuild_sales()
+        self.assertEqual(
+            (list(DailySales.objects.values_list('date', 'orders', 'revenue')), list(DailyMenuItemSales.objects.values_list('date', 'menuitem', 'quantity'))),
+            self.sales,
+        )
+
+    def test_listings(self):
+        ids = [order.pk for order in self.orders]
+        self.assertEqual(self.list_ids({}), ids[2:])
+        self.assertEqual(self.list_ids({'history': 'true'}), ids)
+        self.assertEqual(self.list_ids({'date': self.old_date}), ids[:3])
+        self.assertEqual(self.list_ids({'history': 'true', 'pagination': 'keyset', 'ordering': '-date'}), ids[::-1])
+        # The values path reads the archived order items too
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/orders', {'history': 'true', 'fields': 'id,order_items', 'page': 2})
+        self.assertEqual([len(order['order_items']) for order in response.data['results']], [3, 3])
+        response = self.client.get('/api/orders/export')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+    def test_history_link(self):
+        self.client.force_authenticate(self.manager)
+        # The last page of the hot orders says where the archived ones are
+        response = self.client.get('/api/orders')
+        self.assertEqual((response.data['next'], response.data['history']), (None, 'http://testserver/api/orders?history=true'))
+        response = self.client.get('/api/orders', {'pagination': 'keyset', 'ordering': '-date', 'page_size': 1})
+        self.assertNotIn('history', response.data)
+        response = self.client.get(response.data['next'])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            parse_qs(urlparse(response.data['history']).query),
+            {'pagination': ['keyset'], 'ordering': ['-date'], 'page_size': ['1'], 'history': ['true']},
+        )
+        self.assertEqual(self.list_ids(parse_qs(urlparse(response.data['history']).query)), [order.pk for order in self.orders[::-1]])
+        # Not when no archived order matches, nor on the history list itself
+        self.assertNotIn('history', self.client.get('/api/orders', {'date': date.today().isoformat()}).data)
+        self.assertNotIn('history', self.client.get('/api/orders', {'history': 'true', 'page': 2}).data)
+        self.client.force_authenticate(self.crew)
+        self.assertIn('history', self.client.get('/api/orders').data)
+        Order.objects.update(delivery_crew=None)
+        ArchivedOrder.objects.update(delivery_crew=None)
+        self.assertNotIn('history', self.client.get('/api/orders').data)
+
+    def test_archived_order_detail(self):
+        pk = self.orders[0].pk
+        response = self.get_order(pk)
+        self.assertEqual((response.status_code, len(response.data['order_items'])), (200, 3))
+        self.assertEqual(self.get_order(pk, HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+        # Archived orders are read-only
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.patch(f'/api/orders/{pk}', {'status': False}).status_code, 404)
+        response = self.client.post('/api/orders/status', {'orders': [pk], 'status': False}, format='json')
+        self.assertEqual(response.data['results'], [{'id': pk, 'result': 'not found'}])
+
+
+def consume_tokens(attempts):
+    return sum(bucket_store.consume('test', capacity=10, refill_rate=10 / 86400)[0] for _ in range(attempts))
+
+
+def call_throttle(attempts):
+    request = RequestFactory().get('/api/menu-items/1', REMOTE_ADDR='10.0.0.1')
+    request.user = AnonymousUser()
+    return sum(OneCallPerMinute().allow_request(request, None) for _ in range(attempts))
+
+
+class TokenBucketThrottleTests(IsolatedThrottleStoreMixin, SimpleTestCase):
+
+    def test_bucket_refills_over_time(self):
+        allowed = [bucket_store.consume('refill', capacity=2, refill_rate=1, now=100)[0] for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+        self.assertEqual(bucket_store.consume('refill', capacity=2, refill_rate=1, now=100.5), (False, 0.5))
+        self.assertEqual(bucket_store.consume('refill', capacity=2, refill_rate=1, now=101)[0], True)
+
+    def run_in_processes(self, target, processes=4, attempts=10):
+        # Worker processes are forked, like gunicorn workers, and share only the store file
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            return sum(pool.map(target, [attempts] * processes))
+
+    def test_limit_holds_across_processes(self):
+        self.assertEqual(self.run_in_processes(consume_tokens), 10)
+
+    def test_throttle_rate_holds_across_processes(self):
+        # "one": "1/minute" in DEFAULT_THROTTLE_RATES
+        self.assertEqual(self.run_in_processes(call_throttle), 1)
+
+
+def checkout_rounds(path, customer_id, menu_item_ids, rounds):
+    """Fill the cart and check out `rounds` times in the database file `path`. Returns the "database is locked" errors."""
+    connection = connections['default']
+    # Drop the in-memory test database inherited from the parent (closing it would empty it) for the file
+    connection.connection = None
+    connection.settings_dict = {**connection.settings_dict, 'NAME': path, 'OPTIONS': {'transaction_mode': 'IMMEDIATE'}}
+    customer = User.objects.get(pk=customer_id)
+    factory = APIRequestFactory()
+    add_to_cart = CartItemsView.as_view(throttle_classes=[])
+    checkout = OrdersListCreateView.as_view(throttle_classes=[])
+    errors = 0
+    for _ in range(rounds):
+        try:
+            for menu_item_id in menu_item_ids:
+                request = factory.post('/api/cart/menu-items', {'menuitem': menu_item_id, 'quantity': 1})
+                force_authenticate(request, user=customer)
+                add_to_cart(request)
+            request = factory.post('/api/orders')
+            force_authenticate(request, user=customer)
+            checkout(request)
+        except OperationalError:
+            errors += 1
+    connection.close()
+    return errors
+
+
+class ConcurrentCheckoutTests(IsolatedThrottleStoreMixin, TransactionTestCase):
+    """
+    With the production profile's transaction_mode = "IMMEDIATE", concurrent checkouts
+    wait for the write lock instead of failing with "database is locked".
+    """
+
+    def test_concurrent_checkouts(self):
+        category = Category.objects.create(slug='mains', title='Mains')
+        menu_items = [
+            MenuItem.objects.create(title=f'Dish {i}', price=5, featured=False, category=category).pk for i in range(3)
+        ]
+        customers = [User.objects.create_user(f'customer{i}').pk for i in range(4)]
+        # Worker processes share a database file, the test database is in memory: copy it
+        path = str(Path(self.temp_directory) / 'db.sqlite3')
+        connections['default'].ensure_connection()
+        target = sqlite3.connect(path)
+        connections['default'].connection.backup(target)
+        target.close()
+
+        rounds = 5
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 5000}):
+            with multiprocessing.get_context('fork').Pool(len(customers)) as pool:
+                errors = pool.starmap(checkout_rounds, [(path, customer, menu_items, rounds) for customer in customers])
+        self.assertEqual(sum(errors), 0)
+        database = sqlite3.connect(path)
+        try:
+            orders = database.execute('SELECT COUNT(*), SUM(total) FROM LittleLemonAPI_order').fetchone()
+            self.assertEqual(orders, (len(customers) * rounds, len(customers) * rounds * 15))
+            self.assertEqual(database.execute('SELECT COUNT(*) FROM LittleLemonAPI_cart').fetchone(), (0,))
+        finally:
+            database.close()
@@ -1,5 +1,112 @@
-from rest_framework.throttling import AnonRateThrottle
-from django.core.cache import cache
-
-class OneCallPerMinute(AnonRateThrottle):
-    scope = "one"
\ No newline at end of file
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework import throttling
+
+from .db import SQLiteFileStore
+from .timing import phase
+
+
+class TokenBucketStore(SQLiteFileStore):
+    """
+    Token buckets kept in a small SQLite file, so every worker process on the host
+    shares the same buckets (the default LocMem cache is per process, which let each
+    gunicorn worker hand out the full rate on its own).
+
+    A bucket is a single row (tokens left, last refill time) per (scope, ident) key,
+    updated in place under SQLite's write lock, so a check is O(1) whatever the rate.
+    """
+    schema = ["CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"]
+
+    @property
+    def path(self):
+        return str(getattr(settings, "THROTTLE_STORE_PATH", settings.BASE_DIR / "throttle.sqlite3"))
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """
+        Take one token from the bucket `key` holding at most `capacity` tokens and
+        refilling at `refill_rate` tokens per second.
+        Returns (allowed, seconds until the next token is available).
+        """
+        now = time.time() if now is None else now
+        conn = self.connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so the read-modify-write
+        # below cannot interleave with another process
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, (0 if allowed else (1 - tokens) / refill_rate)
+
+    def clear(self):
+        self.connection().execute("DELETE FROM bucket")
+
+
+bucket_store = TokenBucketStore()
+
+# Set while the warm-up (see warmup.py) sends its requests, which no bucket is charged for
+_unthrottled = ContextVar("littlelemon_unthrottled", default=False)
+
+
+@contextmanager
+def unthrottled():
+    token = _unthrottled.set(True)
+    try:
+        yield
+    finally:
+        _unthrottled.reset(token)
+
+
+class TokenBucketThrottle(throttling.SimpleRateThrottle):
+    """
+    A SimpleRateThrottle (rates still come from DEFAULT_THROTTLE_RATES) that keeps a
+    shared token bucket per (scope, ident) instead of a per-process request history.
+    """
+    store = bucket_store
+
+    def allow_request(self, request, view):
+        if self.rate is None or _unthrottled.get():
+            return True
+        with phase("throttle"):
+            self.key = self.get_cache_key(request, view)
+            if self.key is None:
+                return True
+            allowed, self.wait_seconds = self.store.consume(self.key, self.num_requests, self.num_requests / self.duration)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonRateThrottle(TokenBucketThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(TokenBucketThrottle, throttling.UserRateThrottle):
+    pass
+
+
+class OneCallPerMinute(AnonRateThrottle):
+    scope = "one"
+
+
+class NotModifiedRateThrottle(UserRateThrottle):
+    """
+    The budget of the conditional GETs answered 304 Not Modified (see conditional.py), which
+    cost a primary key lookup and no serialization. Per user, or per IP when anonymous.
+    """
+    scope = "not_modified"
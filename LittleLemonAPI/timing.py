@@ -0,0 +1,195 @@
+"""
+Where the time of an API request goes, measured on every request.
+
+Each request gets a RequestTimings (kept in a context variable, so it follows the
+request into the threads sync_to_async runs code in). Every SQL query is timed by a
+wrapper installed on each database connection, and the stages of a DRF request time
+themselves with phase(): authentication (authentication.py), throttling
+(throttles.py), serialization (fieldsets.py) and rendering. ServerTimingMiddleware
+sends the result as a Server-Timing header on the responses of LittleLemonAPI.views,
+and keeps the slow requests, with their SQL, in a ring buffer superusers can read
+at /api/debug/traces.
+
+The cost is a few perf_counter() calls per query and per stage, so it stays on in
+production (SERVER_TIMING = False in the settings switches it off).
+"""
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Requests slower than this (in milliseconds) are candidates for the trace buffer,
+# SERVER_TIMING_SAMPLE_RATE of them are kept, the newest SERVER_TIMING_BUFFER_SIZE ones.
+SLOW_REQUEST_MS = getattr(settings, "SERVER_TIMING_SLOW_MS", 200)
+SAMPLE_RATE = getattr(settings, "SERVER_TIMING_SAMPLE_RATE", 1.0)
+BUFFER_SIZE = getattr(settings, "SERVER_TIMING_BUFFER_SIZE", 100)
+
+# Queries whose SQL is kept per request, the ones after it are only counted
+MAX_TRACE_QUERIES = 100
+
+VIEWS_MODULE = "LittleLemonAPI.views"
+
+_current = ContextVar("littlelemon_request_timings", default=None)
+
+# The slow request traces of this process, newest last
+traces = deque(maxlen=BUFFER_SIZE)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {} # stage name -> milliseconds, SQL excluded
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.queries = [] # (sql, milliseconds) of the first MAX_TRACE_QUERIES queries
+        self.active = None # the stage being timed
+        self.values = {} # name -> (milliseconds, description) of what is not a stage (the replica lag)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block, less its SQL, to stage `name` of the current request."""
+    timings = _current.get()
+    if timings is None or timings.active == name: # no request, or already inside this stage
+        yield
+        return
+    outer, timings.active = timings.active, name
+    sql_ms = timings.sql_ms
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000 - (timings.sql_ms - sql_ms)
+        timings.phases[name] = timings.phases.get(name, 0) + elapsed
+        timings.active = outer
+
+
+def add_value(name, ms, desc):
+    """Send a value other than a stage's duration (in milliseconds) in the Server-Timing header of the current request."""
+    timings = _current.get()
+    if timings is not None:
+        timings.values[name] = (ms, desc)
+
+
+def time_query(execute, sql, params, many, context):
+    """A database execute wrapper recording every query of the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings.sql_count += 1
+        timings.sql_ms += elapsed
+        if len(timings.queries) < MAX_TRACE_QUERIES:
+            timings.queries.append((sql, elapsed)) # the parameters are left out, they may hold tokens
+
+
+def install_query_timer(connection):
+    """Time the queries of a database connection (called for every new connection, see signals.py)."""
+    if getattr(settings, "SERVER_TIMING", True) and time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def api_view_name(request):
+    """The name of the LittleLemonAPI.views class that handled the request, None for any other view."""
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(match.func, "cls", None) if match is not None else None
+    if view_class is None or view_class.__module__ != VIEWS_MODULE:
+        return None
+    return view_class.__name__
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request and, for the views of LittleLemonAPI.views, sends
+
+        Server-Timing: db;dur=1.2;desc="3 queries", auth;dur=0.1, throttle;dur=0.4, ..., app;dur=2.0, total;dur=4.5
+
+    where app is what is left of the total once the measured stages are taken out.
+    Put it first in MIDDLEWARE, so the total covers the other middleware as well.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVER_TIMING", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django runs a sync hook of an async middleware in a thread, this one need not
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        return self.time_render(response)
+
+    async def aprocess_template_response(self, request, response):
+        return self.time_render(response)
+
+    @staticmethod
+    def time_render(response):
+        # DRF responses are rendered after the view has returned, time it up to the post-render callback
+        timings = _current.get()
+        if timings is not None and not response.is_rendered:
+            start = time.perf_counter()
+
+            def rendered(response):
+                elapsed = (time.perf_counter() - start) * 1000
+                timings.phases["render"] = timings.phases.get("render", 0) + elapsed
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timings):
+        view = api_view_name(request)
+        if view is None:
+            return response
+        total = (time.perf_counter() - timings.start) * 1000
+        phases = {"db": timings.sql_ms, **timings.phases}
+        phases["app"] = max(total - sum(phases.values()), 0)
+        metrics = ['db;dur=%.1f;desc="%d queries"' % (timings.sql_ms, timings.sql_count)]
+        metrics += ["%s;dur=%.1f" % (name, ms) for name, ms in phases.items() if name != "db"]
+        metrics += ['%s;dur=%.1f;desc="%s"' % (name, ms, desc) for name, (ms, desc) in timings.values.items()]
+        metrics.append("total;dur=%.1f" % total)
+        response["Server-Timing"] = ", ".join(metrics)
+        if total >= SLOW_REQUEST_MS and random.random() < SAMPLE_RATE:
+            traces.append({
+                "time": datetime.now(timezone.utc).isoformat(),
+                "method": request.method,
+                "path": request.get_full_path(),
+                "view": view,
+                "status": response.status_code,
+                "total_ms": round(total, 2),
+                "phases_ms": {name: round(ms, 2) for name, ms in phases.items()},
+                "queries": timings.sql_count,
+                "sql": [{"sql": sql, "ms": round(ms, 2)} for sql, ms in timings.queries],
+            })
+        return response
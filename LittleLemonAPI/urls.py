@@ -1,15 +1,22 @@
-from django.urls import path
-from . import views
-
-urlpatterns = [
-    path("menu-items", views.MenuItemsView.as_view()),
-    path("categories", views.CategoriesView.as_view()),
-    path("menu-items/<int:pk>", views.MenuItemDetailView.as_view()),
-    path("groups/manager/users", views.ManagersListView.as_view()),
-    path("groups/manager/users/<int:pk>", views.ManagerRemoveView.as_view()),
-    path("groups/delivery-crew/users", views.DeliveryCrewListView.as_view()),
-    path("groups/delivery-crew/users/<int:pk>", views.DeliveryCrewRemoveView.as_view()),
-    path("cart/menu-items", views.CartItemsView.as_view()),
-    path("orders", views.OrdersListCreateView.as_view()),   
-    path("orders/<int:pk>", views.OrderDetailView.as_view()),
+from django.urls import path
+from . import views
+from .asyncviews import read_view
+
+urlpatterns = [
+    path("menu-items", read_view(views.MenuItemsView, views.AsyncMenuItemsView)),
+    path("categories", read_view(views.CategoriesView, views.AsyncCategoriesView)),
+    path("menu-items/<int:pk>", views.MenuItemDetailView.as_view()),
+    path("groups/manager/users", views.ManagersListView.as_view()),
+    path("groups/manager/users/<int:pk>", views.ManagerRemoveView.as_view()),
+    path("groups/delivery-crew/users", views.DeliveryCrewListView.as_view()),
+    path("groups/delivery-crew/users/<int:pk>", views.DeliveryCrewRemoveView.as_view()),
+    path("cart/menu-items", read_view(views.CartItemsView, views.AsyncCartItemsView)),
+    path("orders", read_view(views.OrdersListCreateView, views.AsyncOrdersListView)),   
+    path("orders/export", views.OrdersExportView.as_view()),
+    path("orders/dispatch", views.OrderDispatchView.as_view()),
+    path("orders/status", views.OrderStatusUpdateView.as_view()),
+    path("orders/<int:pk>", views.OrderDetailView.as_view()),
+    path("reports/sales", views.SalesReportView.as_view()),
+    path("debug/traces", views.TraceBufferView.as_view()),
+    path("debug/replica", views.ReplicaStatusView.as_view()),
 ]
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Version counters shared by all the worker processes on the host.
+
+The caches that outlive a request (the catalog responses, the users' group sets, the
+resolved auth tokens) live in each process, so a write handled by one worker cannot clear them in the others. Instead every cached entry
+records the version of what it was built from, and a write bumps that version here: the
+entries built for an older version are never used again, in any process.
+
+A version is read on every request that uses a cached entry, a single primary key
+lookup in a small SQLite file that stays in the page cache.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .db import SQLiteFileStore
+
+
+class VersionStore(SQLiteFileStore):
+    """key -> version. A key that was never bumped is at version 0."""
+    schema = ["CREATE TABLE IF NOT EXISTS version (key TEXT PRIMARY KEY, version INTEGER NOT NULL)"]
+
+    @property
+    def path(self):
+        return str(getattr(settings, "VERSION_STORE_PATH", settings.BASE_DIR / "versions.sqlite3"))
+
+    def get(self, key):
+        row = self.connection().execute("SELECT version FROM version WHERE key = ?", (key,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = dict(
+            self.connection().execute(
+                f"SELECT key, version FROM version WHERE key IN ({', '.join('?' * len(keys)) or 'NULL'})", keys
+            )
+        )
+        return {key: found.get(key, 0) for key in keys}
+
+    def bump(self, *keys):
+        # A key starts from the clock rather than 1, so that when the file is lost the
+        # new versions are still ahead of those the live cache entries were built for
+        self.connection().executemany(
+            "INSERT INTO version (key, version) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET version = version + 1",
+            [(key, time.time_ns()) for key in keys],
+        )
+
+    def clear(self):
+        self.connection().execute("DELETE FROM version")
+
+
+version_store = VersionStore()
+
+
+def bump_versions(*keys):
+    """
+    Make the entries built from `keys` stale in every process: now, and again once the
+    current transaction commits, since a request that reads in between still sees the
+    old rows and may cache them under the new version.
+    """
+    if keys:
+        version_store.bump(*keys)
+        transaction.on_commit(lambda: version_store.bump(*keys))
+
+
+
+def user_key(user_id):
+    """The version of everything cached about a user (their group set, active flag and tokens)."""
+    return f"user:{user_id}"
@@ -1,382 +1,722 @@
-from datetime import date
-from django.shortcuts import render
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
-from .models import MenuItem, Category, Cart, Order, OrderItem
-from rest_framework import generics, status
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .serializers import MenuItemSerializer, CategorySerializer, UserSerializer, CartItemSerializer, OrderSerializer, OrderDetailSerializer
-from django.contrib.auth.models import User, Group
-from django.shortcuts import get_object_or_404
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
-from .throttles import OneCallPerMinute
-
-# Create your views here.
-
-# Menu-items views
-
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
-class MenuItemsView(generics.ListCreateAPIView):
-    queryset = MenuItem.objects.select_related('category').all() # retrieve related objects in a single query
-    serializer_class = MenuItemSerializer
-    
-    filter_backends = [SearchFilter, OrderingFilter]
-    filterset_fields = ['title', 'price', 'category__slug']
-    ordering_fields = ['title', 'price', 'category__slug']
-    search_fields = ['category__slug']
-    
-    def get(self, request):
-        category_name = request.query_params.get('category')
-        to_price = request.query_params.get('price')
-        search = request.query_params.get('search')
-        
-        if category_name:
-            self.queryset = self.queryset.filter(category__slug = category_name)
-        if to_price:
-            self.queryset = self.queryset.filter(price = to_price)
-        if search:
-            self.queryset = self.queryset.filter(category__slug__startswith = search)
-        return super().get(request)
-    
-    def post(self, request):
-        if request.user.groups.filter(name = 'Manager').exists() or request.user.is_superuser:
-            return super().post(request)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-    
-    def put(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().post(request)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-
-    def patch(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().post(request)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-
-    def delete(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().post(request)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-    
-@throttle_classes([OneCallPerMinute, UserRateThrottle])  
-class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MenuItem.objects.all()
-    serializer_class = MenuItemSerializer
-    
-    def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
-    
-    def put(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().put(request, *args, **kwargs)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-    
-    def patch(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().patch(request, *args, **kwargs)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-
-    def delete(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = 'Manager').exists():
-            return super().delete(request, *args, **kwargs)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-    
-# User group management endpoints
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class ManagersListView(generics.ListCreateAPIView):
-    queryset = User.objects.filter(groups__name = "Manager")
-    serializer_class = UserSerializer
-    
-    def get(self, request):
-        if request.user.groups.filter(name = "Manager").exists() or request.user.is_superuser:
-            return super().get(request)
-        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-    
-    def post(self, request):
-        if request.user.groups.filter(name = "Manager").exists() or request.user.is_superuser:
-            if 'username' in request.data:
-                username = request.data['username']
-                user = get_object_or_404(User, username = username)
-                managers = Group.objects.get(name = "Manager")
-                managers.user_set.add(user)
-                return Response({"message": "User added."}, status = status.HTTP_201_CREATED)
-            return Response({"message": "usernamed field required"}, status = status.HTTP_400_BAD_REQUEST)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class ManagerRemoveView(generics.DestroyAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
-    
-    def delete(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = "Manager").exists():
-            user = self.get_object()
-            managers = Group.objects.get(name = "Manager")
-            if user in managers.user_set.all():
-                managers.user_set.remove(user)
-                return Response({"message": "User removed from the Manager group."}, status=status.HTTP_200_OK)
-            return Response({"message": "User not found in the Manager group."}, status=status.HTTP_404_NOT_FOUND)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN) 
-    
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class DeliveryCrewListView(generics.ListCreateAPIView):
-    queryset = User.objects.filter(groups__name = "Delivery crew")
-    serializer_class = UserSerializer
-    
-    def get(self, request):
-        if request.user.groups.filter(name = "Manager").exists():
-            return super().get(request)
-        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-    
-    def post(self, request):
-        if request.user.groups.filter(name = "Manager").exists():
-            if 'username' in request.data:
-                username = request.data['username']
-                user = get_object_or_404(User, username = username)
-                managers = Group.objects.get(name = "Manager")
-                managers.user_set.add(user)
-                return Response({"message": "User added."}, status = status.HTTP_201_CREATED)
-            return Response({"message": "usernamed field required"}, status = status.HTTP_400_BAD_REQUEST)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-
-
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class DeliveryCrewRemoveView(generics.DestroyAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
-
-    def delete(self, request, *args, **kwargs):
-        if request.user.groups.filter(name = "Manager").exists():
-            user = self.get_object()
-            managers = Group.objects.get(name = "Delivery crew")
-            if user in managers.user_set.all():
-                managers.user_set.remove(user)
-                return Response({"message": "User removed from the Delivery crew group."}, status=status.HTTP_200_OK)
-            return Response({"message": "User not found in the Delivery crew group."}, status=status.HTTP_404_NOT_FOUND)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN) 
-
-
-# Cart management endpoints
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class CartItemsView(generics.ListCreateAPIView, generics.DestroyAPIView):
-    queryset = Cart.objects.all()
-    serializer_class = CartItemSerializer
-    
-    def get(self, request):
-        if request.user.is_authenticated:
-            if not request.user.groups.filter(name__in = ["Manager", "Delivery crew"]).exists():
-                user_cart_items = self.queryset.filter(user = request.user)
-                serializer = self.serializer_class(user_cart_items, many=True)
-                return Response(serializer.data)
-            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
-    
-    def post(self, request):
-        if request.user.is_authenticated:
-            if not request.user.groups.filter(name__in = ["Manager", "Delivery crew"]).exists():
-                # Passing the request object to the serializer (in the context dictionary) so that
-                # the serializer has access to the currently authenticated user. This allows the
-                # CurrentUserDefault to work correctly and set the current user as the user for
-                # the cart item being created.
-                serializer = self.serializer_class(data=request.data, context =  {'request': request})
-                if serializer.is_valid():
-                    serializer.save(user=request.user)
-                    return Response(serializer.data, status=status.HTTP_201_CREATED)
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
-
-    def delete(self, request, *args, **kwargs):
-        if request.user.is_authenticated:
-            if not request.user.groups.filter(name__in = ["Manager", "Delivery crew"]).exists():
-                user_carts = self.queryset.filter(user=request.user)
-                user_carts.delete()
-                return Response({"message": "Cart items deleted."}, status=status.HTTP_200_OK)
-            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
-    
-# Order management endpoints
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class OrdersListCreateView(generics.ListCreateAPIView):
-    """
-    This class defines the endpoint for retrieving and creating order and order item objects.
-    """
-    queryset = Order.objects.all() # Get all Order objects from the database
-    serializer_class = OrderSerializer # The serializer to be used for the Order objects
-    
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['user__username', 'delivery_crew__username', 'status', 'total', 'date']
-    ordering_fields = ['user__username', 'delivery_crew__username', 'status', 'total', 'date']
-    
-    def get(self, request, *args, **kwargs):
-        """
-        Handle GET requests to the endpoint.
-        Returns all orders with order items based on the user's role.
-        """
-        # Check if the user is authenticated
-        if request.user.is_authenticated:
-            
-            # Filters
-            by_user = request.query_params.get('user')
-            by_delivery_crew = request.query_params.get('delivery_crew')
-            by_date = request.query_params.get('date')
-            by_total = request.query_params.get('total')
-                
-            if by_user:
-                self.queryset = self.queryset.filter(user__username = by_user)
-            if by_delivery_crew:
-                self.queryset = self.queryset.filter(delivery_crew__username = by_delivery_crew)
-            if by_date:
-                self.queryset = self.queryset.filter(date = by_date)
-            if by_total:
-                self.queryset = self.queryset.filter(total = by_total)
-            
-            # If the user is a manager
-            if request.user.groups.filter(name = "Manager").exists():
-                all_orders = self.queryset.all() # Get all Order objects
-                all_orders = self.filter_queryset(all_orders) # Apply ordering and filtering
-                serializer = self.serializer_class(all_orders, many = True) # Serialize all Order objects
-                return Response(serializer.data, status = status.HTTP_200_OK) # Return serialized data
-            # If the user is a delivery crew member
-            elif request.user.groups.filter(name = "Delivery crew").exists():
-                delivery_crew_orders = self.queryset.filter(delivery_crew = request.user) # Get Order objects assigned to the delivery crew member
-                delivery_crew_orders = self.filter_queryset(delivery_crew_orders) # Apply ordering and filtering
-                serializer = self.serializer_class(delivery_crew_orders, many = True) # Serialize Order objects
-                return Response(serializer.data) # Return serialized data
-            # If the user is a customer
-            else:   
-                user_orders = self.queryset.filter(user = request.user) # Get Order objects created by the user
-                user_orders = self.filter_queryset(user_orders) # Apply ordering and filtering
-                serializer = self.serializer_class(user_orders, many = True) # Serialize Order objects
-                return Response(serializer.data) # Return serialized data
-        return Response({"message": "You are not authenticated."}, status = status.HTTP_403_FORBIDDEN) # Return error message if the user is not authenticated
-    
-    def post(self, request):
-        """
-        Handle POST requests to the endpoint.
-        Creates a new order and order items for the current user.
-        Deletes all items from the cart for the current user.
-        """
-        # Check if the user is authenticated
-        if request.user.is_authenticated:
-            # If the user is a customer
-            if not request.user.groups.filter(name__in = ['Manager', 'Delivery crew']).exists():
-                # Get current cart items for the user
-                cart_items = Cart.objects.filter(user=request.user)
-                # If there are items in the cart
-                if cart_items.exists():
-                    # Create a new Order object for the user
-                    order = Order.objects.create(
-                        user=request.user,
-                        total=0,
-                        date = date.today()
-                        ) # total will be calculated and updated later
-                    # Create OrderItem objects from the cart items linked to the Order object for the user
-                    for item in cart_items:
-                        OrderItem.objects.create(
-                            order=order,
-                            menuitem=item.menuitem,
-                            quantity=item.quantity,
-                            unit_price=item.unit_price,
-                            price=item.price
-                        )
-                        order.total += item.price # Update the total
-                    order.save()
-                    cart_items.delete()
-                    return Response({"message": "Order created and cart items deleted."}, status=status.HTTP_200_OK)
-                return Response({"message": "No items in cart."}, status=status.HTTP_400_BAD_REQUEST)
-            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
-                
-@permission_classes([IsAuthenticated])
-@throttle_classes([OneCallPerMinute, UserRateThrottle])
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Order.objects.all()
-    serializer_class = OrderDetailSerializer
-    
-    # The get_object() method retrieves the instance of the model based
-    # on the primary key (pk) value passed in the URL
-    
-    # Necessary to completely override (*args, **kwargs) the request methods because it takes
-    # into account any other parameters that might be passed through URL
-    # routing, such as the primary key.
-    def get(self, request, *args, **kwargs):
-        order = self.get_object()
-        if order.user != request.user:
-            return Response({"message": "Order doesnt' belong to the current user."}, status = status.HTTP_403_FORBIDDEN)
-        return super().get(request, *args, **kwargs)
-    
-    def put(self, request, *args, **kwargs):
-        self.serializer_class = OrderSerializer
-        order = self.get_object()
-        if request.user.groups.filter(name = "Manager").exists():
-            serializer = self.serializer_class(order, data = request.data)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status = status.HTTP_200_OK)
-            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
-        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN) 
-    
-    def patch(self, request, *args, **kwargs):
-        self.serializer_class = OrderSerializer
-        order = self.get_object()
-        if request.user.groups.filter(name='Manager').exists():
-            if not request.data:
-                return Response({"message": "Request must contain data to update."}, status=status.HTTP_400_BAD_REQUEST)
-            serializer = self.serializer_class(order, data = request.data, partial = True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status = status.HTTP_200_OK)
-            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
-        elif request.user.groups.filter(name = 'Delivery crew').exists():
-            if not request.data:
-                return Response({"message": "Request must contain data to update."}, status=status.HTTP_400_BAD_REQUEST)
-            # Only allow update to status field
-            if (len(request.data) == 1 and 'status' not in request.data) or (len(request.data) > 1):
-                return Response({"message": "Only the status field can be updated."}, status = status.HTTP_400_BAD_REQUEST)
-            serializer = self.serializer_class(order, data = request.data, partial = True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status = status.HTTP_200_OK)
-            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
-        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN) 
-    
-    def delete(self, request, *args, **kwargs):
-        self.serializer_class = OrderSerializer
-        order = self.get_object()
-        if request.user.groups.filter(name = 'Manager').exists():
-            self.perform_destroy(order)
-            return Response({"message": "Order deleted successfully"}, status = status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-        
-            
-# Extra views (for populating tables)
-class CategoriesView(generics.ListCreateAPIView):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
-    
-    filter_backends = [SearchFilter, OrderingFilter]
-    filterset_fields = ['slug']
-    ordering_fields = ['slug']
-    search_fields = ['slug']
-    
-    def get(self, request):
-        category = request.query_params.get('category')
-        search = request.query_params.get('search')
-        
-        if category:
-            self.queryset = self.queryset.filter(category__slug = category)
-        if search:
-            self.queryset = self.queryset.filter(slug__startswith = search)
-        
-        return super().get(request)
-    
-    def post(self, request):
-        # Check if the user is authenticated
-        if request.user.is_authenticated:
-            if request.user.groups.filter(name = "Manager").exists() or request.user.is_superuser:
-                return super().post(request)
-            return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
-        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
-        
\ No newline at end of file
+from datetime import date
+from decimal import Decimal
+from django.shortcuts import render
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from .models import MenuItem, Category, Cart, Order, OrderItem, ArchivedOrder, OrderHistory, DailySales, DailyMenuItemSales
+from rest_framework import generics, status
+from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from .serializers import MenuItemSerializer, CategorySerializer, UserSerializer, CartItemSerializer, CartItemAddSerializer, OrderSerializer, OrderDetailSerializer, OrderStatusUpdateSerializer, SalesReportSerializer
+from django.contrib.auth.models import User, Group
+from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .throttles import AnonRateThrottle, UserRateThrottle, OneCallPerMinute
+from .pagination import PageNumberOrKeysetPagination
+from .export import EXPORT_CHUNK_SIZE, NDJSONRenderer, CSVRenderer
+from .cart import CART_BATCH_SIZE, add_to_cart
+from .sales import defer_record_order
+from .dispatch import dispatch_orders, set_status
+from . import timing
+from .search import MenuItemSearchFilter
+from .catalog import CatalogCacheMixin
+from .conditional import ConditionalGetMixin
+from .asyncviews import AsyncGenericAPIView, AsyncListModelMixin
+from .fieldsets import SparseFieldsetMixin
+from .fragments import FragmentCacheMixin, FragmentJSONRenderer
+from .archive import HISTORY_PARAM, reads_history
+from .replica import CATALOG, MAX_LAG, ReplicaReadMixin, StickyWriteMixin, replica_configured, replica_lag
+from .roles import MANAGER, DELIVERY_CREW, is_manager, is_delivery_crew, is_customer
+
+# Create your views here.
+
+# Menu-items views
+
+class MenuItemsListMixin(ReplicaReadMixin, CatalogCacheMixin, FragmentCacheMixin, SparseFieldsetMixin):
+    """
+    The menu item list, shared by the sync view and its async (ASGI) read view.
+    ?fields= and ?expand= trim the items (see fieldsets.py), the full items are
+    joined from pre-rendered JSON fragments (see fragments.py). GETs read from the
+    replica when there is one (see replica.py).
+    """
+    write_scopes = [CATALOG] # read from the primary while the replica lacks a catalog write
+    queryset = MenuItem.objects.select_related('category').order_by('id') # retrieve related objects in a single query, in a stable order for the pages
+    serializer_class = MenuItemSerializer
+    renderer_classes = [FragmentJSONRenderer, BrowsableAPIRenderer] # the default renderers, JSON joining the fragments
+    pagination_class = PageNumberOrKeysetPagination # ?pagination=keyset for keyset pages
+    cache_query_params = ['category', 'price', 'search', 'ordering', 'page', 'pagination', 'cursor', 'page_size', 'fields', 'expand'] # the list response depends only on these
+    
+    filter_backends = [MenuItemSearchFilter, OrderingFilter] # ?search= uses the full-text index
+    filterset_fields = ['title', 'price', 'category__slug']
+    ordering_fields = ['title', 'price', 'category__slug']
+    search_fields = ['^category__slug', 'title', 'category__title'] # only used without full-text search support
+    
+    def filter_by_query_params(self, queryset):
+        category_name = self.request.query_params.get('category')
+        to_price = self.request.query_params.get('price')
+        
+        if category_name:
+            queryset = queryset.filter(category__slug = category_name)
+        if to_price:
+            queryset = queryset.filter(price = to_price)
+        return queryset
+
+@throttle_classes([AnonRateThrottle, UserRateThrottle])
+class MenuItemsView(MenuItemsListMixin, generics.ListCreateAPIView):
+    
+    def get(self, request):
+        self.queryset = self.filter_by_query_params(self.queryset)
+        return super().get(request)
+    
+    def post(self, request):
+        if is_manager(request.user) or request.user.is_superuser:
+            return super().post(request)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+    
+    def put(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().post(request)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+    def patch(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().post(request)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+    def delete(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().post(request)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+    
+@throttle_classes([OneCallPerMinute, UserRateThrottle])  
+class MenuItemDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = MenuItem.objects.all()
+    serializer_class = MenuItemSerializer
+    
+    def get(self, request, *args, **kwargs):
+        # A matching If-None-Match / If-Modified-Since was answered from updated_at alone
+        if self.not_modified is not None:
+            return self.not_modified
+        return super().get(request, *args, **kwargs)
+    
+    def put(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().put(request, *args, **kwargs)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+    
+    def patch(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().patch(request, *args, **kwargs)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+    def delete(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            return super().delete(request, *args, **kwargs)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+    
+# User group management endpoints
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class ManagersListView(generics.ListCreateAPIView):
+    queryset = User.objects.filter(groups__name = MANAGER).order_by('id')
+    serializer_class = UserSerializer
+    
+    def get(self, request):
+        if is_manager(request.user) or request.user.is_superuser:
+            return super().get(request)
+        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+    
+    def post(self, request):
+        if is_manager(request.user) or request.user.is_superuser:
+            if 'username' in request.data:
+                username = request.data['username']
+                user = get_object_or_404(User, username = username)
+                managers = Group.objects.get(name = MANAGER)
+                managers.user_set.add(user)
+                return Response({"message": "User added."}, status = status.HTTP_201_CREATED)
+            return Response({"message": "usernamed field required"}, status = status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class ManagerRemoveView(generics.DestroyAPIView):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+    
+    def delete(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            user = self.get_object()
+            managers = Group.objects.get(name = MANAGER)
+            if user in managers.user_set.all():
+                managers.user_set.remove(user)
+                return Response({"message": "User removed from the Manager group."}, status=status.HTTP_200_OK)
+            return Response({"message": "User not found in the Manager group."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN) 
+    
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class DeliveryCrewListView(generics.ListCreateAPIView):
+    queryset = User.objects.filter(groups__name = DELIVERY_CREW).order_by('id')
+    serializer_class = UserSerializer
+    
+    def get(self, request):
+        if is_manager(request.user):
+            return super().get(request)
+        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+    
+    def post(self, request):
+        if is_manager(request.user):
+            if 'username' in request.data:
+                username = request.data['username']
+                user = get_object_or_404(User, username = username)
+                managers = Group.objects.get(name = MANAGER)
+                managers.user_set.add(user)
+                return Response({"message": "User added."}, status = status.HTTP_201_CREATED)
+            return Response({"message": "usernamed field required"}, status = status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class DeliveryCrewRemoveView(generics.DestroyAPIView):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+
+    def delete(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            user = self.get_object()
+            managers = Group.objects.get(name = DELIVERY_CREW)
+            if user in managers.user_set.all():
+                managers.user_set.remove(user)
+                return Response({"message": "User removed from the Delivery crew group."}, status=status.HTTP_200_OK)
+            return Response({"message": "User not found in the Delivery crew group."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN) 
+
+
+# Cart management endpoints
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class CartItemsView(StickyWriteMixin, SparseFieldsetMixin, generics.ListCreateAPIView, generics.DestroyAPIView):
+    queryset = Cart.objects.all()
+    serializer_class = CartItemSerializer
+    
+    def get(self, request):
+        if request.user.is_authenticated:
+            if is_customer(request.user):
+                user_cart_items = self.queryset.filter(user = request.user)
+                return self.list_queryset(user_cart_items, paginate=False) # the whole cart, ?fields= trims it
+            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    def post(self, request):
+        if request.user.is_authenticated:
+            if is_customer(request.user):
+                # Either one item or a list of items, each {"menuitem": id, "quantity": n}.
+                # Items already in the cart have their quantity increased, prices are set by the
+                # server and the whole batch is written in one transaction (see cart.add_to_cart).
+                many = isinstance(request.data, list)
+                if many and len(request.data) > CART_BATCH_SIZE:
+                    return Response({"message": f"At most {CART_BATCH_SIZE} items per request."}, status=status.HTTP_400_BAD_REQUEST)
+                if many:
+                    serializer = CartItemAddSerializer(data=request.data, many=True, allow_empty=False)
+                else:
+                    serializer = CartItemAddSerializer(data=request.data)
+                if serializer.is_valid():
+                    items = serializer.validated_data if many else [serializer.validated_data]
+                    try:
+                        cart_items = add_to_cart(request.user, [(item['menuitem'], item['quantity']) for item in items])
+                    except ValidationError as exc:
+                        return Response(exc.detail if many else exc.detail[0], status=status.HTTP_400_BAD_REQUEST)
+                    data = self.serializer_class(cart_items, many=True).data
+                    return Response(data if many else data[0], status=status.HTTP_201_CREATED)
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    def delete(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            if is_customer(request.user):
+                user_carts = self.queryset.filter(user=request.user)
+                user_carts.delete()
+                return Response({"message": "Cart items deleted."}, status=status.HTTP_200_OK)
+            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+    
+# Order management endpoints
+class OrderFiltersMixin:
+    """
+    The filters shared by the order list and the order export endpoints.
+    """
+    filter_backends = [SearchFilter, OrderingFilter]
+    search_fields = ['user__username', 'delivery_crew__username', 'status', 'total', 'date']
+    ordering_fields = ['user__username', 'delivery_crew__username', 'status', 'total', 'date']
+    ordering = ['id'] # Default ordering, pagination needs a stable order
+    
+    def filter_by_query_params(self, queryset):
+        by_user = self.request.query_params.get('user')
+        by_delivery_crew = self.request.query_params.get('delivery_crew')
+        by_date = self.request.query_params.get('date')
+        by_total = self.request.query_params.get('total')
+            
+        if by_user:
+            queryset = queryset.filter(user__username = by_user)
+        if by_delivery_crew:
+            queryset = queryset.filter(delivery_crew__username = by_delivery_crew)
+        if by_date:
+            queryset = queryset.filter(date = by_date)
+        if by_total:
+            queryset = queryset.filter(total = by_total)
+        return queryset
+
+class OrdersListMixin(ReplicaReadMixin, OrderFiltersMixin, SparseFieldsetMixin):
+    """
+    The order list, shared by the sync view and its async (ASGI) read view.
+    ?fields= and ?expand= trim the orders, ?expand= without order_items lists their ids only.
+    GETs read from the replica when there is one, unless the user wrote recently (see replica.py).
+    Only the hot orders are listed unless the request reaches outside the hot window, with
+    ?history=true or an old ?date= (see archive.py). The last page of a hot-only list has
+    a "history" link, the same list with ?history=true, when archived orders match too.
+    """
+    # Get all Order objects from the database together with their users (needed by the
+    # user__username / delivery_crew__username filters and ordering) and, in one extra
+    # query per page, their order items. This keeps a page at a fixed number of queries.
+    queryset = Order.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')
+    # The same for the hot and the archived orders together
+    history_queryset = OrderHistory.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')
+    serializer_class = OrderSerializer # The serializer to be used for the Order objects
+    pagination_class = PageNumberOrKeysetPagination # ?pagination=keyset for keyset pages that cost the same at any depth
+    
+    def get_orders(self, user, orders = None):
+        """
+        The orders the user may list, with the query parameter filters, the filter backends
+        and the ordering applied. From `orders` when given.
+        """
+        if orders is None:
+            orders = self.history_queryset if reads_history(self.request) else self.queryset
+        orders = self.filter_by_query_params(orders) # Filters
+        
+        # If the user is a manager
+        if is_manager(user):
+            orders = orders.all() # Get all Order objects
+        # If the user is a delivery crew member
+        elif is_delivery_crew(user):
+            orders = orders.filter(delivery_crew = user) # Get Order objects assigned to the delivery crew member
+        # If the user is a customer
+        else:
+            orders = orders.filter(user = user) # Get Order objects created by the user
+        return self.filter_queryset(orders) # Apply ordering and filtering
+    
+    def archived_orders(self, user, response):
+        """
+        The archived orders matching the request, when `response` is the last page of a
+        list that left them out. None otherwise, so the archive is only checked once the
+        hot orders are exhausted.
+        """
+        if reads_history(self.request) or response.status_code != 200 or response.data.get('next'):
+            return None
+        return self.get_orders(user, ArchivedOrder.objects.all())
+    
+    def add_history_link(self, response):
+        url = self.request.build_absolute_uri()
+        for param in ('page', 'cursor'): # the history list starts from its first page
+            url = remove_query_param(url, param)
+        response.data['history'] = replace_query_param(url, HISTORY_PARAM, 'true')
+
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class OrdersListCreateView(StickyWriteMixin, OrdersListMixin, generics.ListCreateAPIView):
+    """
+    This class defines the endpoint for retrieving and creating order and order item objects.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handle GET requests to the endpoint.
+        Returns all orders with order items based on the user's role.
+        """
+        # Check if the user is authenticated
+        if request.user.is_authenticated:
+            orders = self.get_orders(request.user)
+            response = self.list_queryset(orders) # Only the current page is loaded (with its order items)
+            archived = self.archived_orders(request.user, response)
+            if archived is not None and archived.exists():
+                self.add_history_link(response) # older orders were left out, say where they are
+            return response
+        return Response({"message": "You are not authenticated."}, status = status.HTTP_403_FORBIDDEN) # Return error message if the user is not authenticated
+    
+    def post(self, request):
+        """
+        Handle POST requests to the endpoint.
+        Creates a new order and order items for the current user.
+        Deletes all items from the cart for the current user.
+        """
+        # Check if the user is authenticated
+        if request.user.is_authenticated:
+            # If the user is a customer
+            if is_customer(request.user):
+                # Checkout runs in a single transaction so a failure part-way through
+                # never leaves a half-built order or a cart that was only partly emptied.
+                # The production profile starts it with BEGIN IMMEDIATE (see settings.py).
+                with transaction.atomic():
+                    # One select of the cart joined to the menu item
+                    cart_items = list(Cart.objects.select_related('menuitem').filter(user=request.user))
+                    # If there are items in the cart
+                    if cart_items:
+                        # Create a new Order object for the user
+                        order = Order.objects.create(
+                            user=request.user,
+                            total=0,
+                            date = date.today()
+                            ) # total is computed by the database below
+                        # Create all OrderItem objects from the cart items in one bulk insert
+                        OrderItem.objects.bulk_create([
+                            OrderItem(
+                                order=order,
+                                menuitem=item.menuitem,
+                                quantity=item.quantity,
+                                unit_price=item.unit_price,
+                                price=item.price
+                            )
+                            for item in cart_items
+                        ])
+                        # Let the database sum the inserted order items into the order total
+                        Order.objects.filter(pk=order.pk).update(total=Subquery(
+                            OrderItem.objects.filter(order=OuterRef('pk'))
+                            .values('order')
+                            .annotate(total=Sum('price'))
+                            .values('total')
+                        ))
+                        # The daily sales aggregates are updated by the job queue worker, off the request
+                        # path; the job commits (or rolls back) with the order, see jobs.py
+                        defer_record_order(order.date, cart_items, key = f'sales:checkout:{order.pk}')
+                        Cart.objects.filter(user=request.user).delete()
+                        return Response({"message": "Order created and cart items deleted."}, status=status.HTTP_200_OK)
+                return Response({"message": "No items in cart."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+                
+@throttle_classes([UserRateThrottle])
+class OrdersExportView(OrderFiltersMixin, generics.GenericAPIView):
+    """
+    Streams every order matching the order list filters (user, delivery_crew, date, total,
+    ordering) as NDJSON (default) or CSV, with the order items inlined. Managers only.
+    Rows are read in chunks with a server-side iterator and written out as they are read,
+    so memory use does not grow with the number of exported orders. Archived orders included.
+    Under ASGI the response streams from the async ORM: Django would otherwise read a
+    synchronous iterator to the end before sending the first byte.
+    """
+    queryset = OrderHistory.objects.select_related('user', 'delivery_crew')
+    renderer_classes = [NDJSONRenderer, CSVRenderer] # ?format=ndjson|csv or the Accept header
+    
+    def get(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            orders = self.filter_queryset(self.filter_by_query_params(self.get_queryset()))
+            orders = orders.prefetch_related('order_items')
+            renderer = request.accepted_renderer
+            if isinstance(request._request, ASGIRequest):
+                content = renderer.astream(orders.aiterator(chunk_size = EXPORT_CHUNK_SIZE))
+            else:
+                content = renderer.stream(orders.iterator(chunk_size = EXPORT_CHUNK_SIZE))
+            response = StreamingHttpResponse(content, content_type = renderer.media_type)
+            response['Content-Disposition'] = f'attachment; filename="orders.{renderer.format}"'
+            return response
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+@throttle_classes([UserRateThrottle])
+class OrderDispatchView(StickyWriteMixin, generics.GenericAPIView):
+    """
+    Assigns every unassigned open order to the delivery crew in one go, each order to the
+    crew member with the fewest open orders (see dispatch.py). Managers only.
+    Returns the number of orders assigned and the resulting load of every crew member.
+    """
+    
+    def post(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            assigned, crew = dispatch_orders()
+            if not crew:
+                return Response({"message": "There is no delivery crew to assign orders to."}, status = status.HTTP_400_BAD_REQUEST)
+            return Response({"assigned": assigned, "crew": crew}, status = status.HTTP_200_OK)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+@permission_classes([IsAuthenticated])
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class OrderStatusUpdateView(StickyWriteMixin, generics.GenericAPIView):
+    """
+    Sets the status of many orders at once: {"orders": [ids], "status": true}.
+    The role rules of OrderDetailView.patch apply: managers may change any order and
+    delivery crew only the status, here of the orders assigned to them. The change is
+    made with one UPDATE and the response has a result for every id (see dispatch.set_status).
+    """
+    serializer_class = OrderStatusUpdateSerializer
+    
+    def post(self, request, *args, **kwargs):
+        if is_manager(request.user) or is_delivery_crew(request.user):
+            if not isinstance(request.data, dict) or set(request.data) - {'orders', 'status'}:
+                return Response({"message": "Only the status field can be updated."}, status = status.HTTP_400_BAD_REQUEST)
+            serializer = self.get_serializer(data = request.data)
+            if serializer.is_valid():
+                crew = None if is_manager(request.user) else request.user # delivery crew only reach their own orders
+                results = set_status(serializer.validated_data['orders'], serializer.validated_data['status'], crew = crew)
+                return Response({"status": serializer.validated_data['status'], "results": results}, status = status.HTTP_200_OK)
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+@throttle_classes([UserRateThrottle])
+class SalesReportView(generics.GenericAPIView):
+    """
+    Orders and revenue per day, and quantities and revenue per menu item, between ?start=
+    and ?end= (ISO dates, both optional and inclusive). Managers only.
+    Everything is read from the sales aggregates (see sales.py), never from the orders,
+    so orders show up once the run_jobs worker has recorded them.
+    """
+    
+    def get(self, request, *args, **kwargs):
+        if is_manager(request.user):
+            try:
+                start, end = (
+                    date.fromisoformat(value) if value else None
+                    for value in (request.query_params.get('start'), request.query_params.get('end'))
+                )
+            except ValueError:
+                return Response({"message": "start and end must be dates (YYYY-MM-DD)."}, status = status.HTTP_400_BAD_REQUEST)
+            days = DailySales.objects.order_by('date')
+            menu_items = DailyMenuItemSales.objects.all()
+            if start:
+                days = days.filter(date__gte = start)
+                menu_items = menu_items.filter(date__gte = start)
+            if end:
+                days = days.filter(date__lte = end)
+                menu_items = menu_items.filter(date__lte = end)
+            days = list(days)
+            menu_items = (
+                menu_items.values('menuitem', 'menuitem__title')
+                .annotate(quantity = Sum('quantity'), revenue = Sum('revenue'))
+                .order_by('-revenue', 'menuitem')
+            )
+            serializer = SalesReportSerializer({
+                'start': start,
+                'end': end,
+                'orders': sum(day.orders for day in days),
+                'revenue': sum((day.revenue for day in days), Decimal(0)),
+                'days': days,
+                'menu_items': menu_items,
+            })
+            return Response(serializer.data)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+@permission_classes([IsAuthenticated])
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class OrderDetailView(StickyWriteMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Order.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')
+    # Delivered orders move to the archive after ARCHIVE_AFTER_DAYS (see archive.py), they can still be read
+    archive_queryset = ArchivedOrder.objects.select_related('user', 'delivery_crew').prefetch_related('order_items')
+    serializer_class = OrderDetailSerializer
+    
+    def get_updated_at(self, request):
+        # Read the owner along with updated_at and apply the ownership check of get(),
+        # so a 304 never says anything about another user's order
+        for model in (Order, ArchivedOrder):
+            row = model.objects.filter(pk = self.kwargs['pk']).values_list('updated_at', 'user_id').first()
+            if row is not None:
+                return row[0] if row[1] == request.user.pk else None
+        return None
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # An order missing from the hot table may be archived, archived orders are only read
+            if self.request.method not in ('GET', 'HEAD'):
+                raise
+            self.queryset = self.archive_queryset
+            return super().get_object()
+    
+    # The get_object() method retrieves the instance of the model based
+    # on the primary key (pk) value passed in the URL
+    
+    # Necessary to completely override (*args, **kwargs) the request methods because it takes
+    # into account any other parameters that might be passed through URL
+    # routing, such as the primary key.
+    def get(self, request, *args, **kwargs):
+        # A matching If-None-Match / If-Modified-Since was answered from updated_at alone
+        if self.not_modified is not None:
+            return self.not_modified
+        order = self.get_object()
+        if order.user_id != request.user.pk:
+            return Response({"message": "Order doesnt' belong to the current user."}, status = status.HTTP_403_FORBIDDEN)
+        # Serialize the order we already fetched instead of fetching it a second time
+        serializer = self.get_serializer(order)
+        return Response(serializer.data)
+    
+    def save(self, serializer):
+        """
+        Save the order, moving its sales to the new date in the aggregates
+        when the date changed (in the same transaction).
+        """
+        order = serializer.instance
+        old_date = order.date
+        with transaction.atomic():
+            serializer.save()
+            if order.date != old_date:
+                order_items = list(order.order_items.all())
+                defer_record_order(old_date, order_items, sign = -1)
+                defer_record_order(order.date, order_items)
+    
+    def put(self, request, *args, **kwargs):
+        self.serializer_class = OrderSerializer
+        order = self.get_object()
+        if is_manager(request.user):
+            serializer = self.serializer_class(order, data = request.data)
+            if serializer.is_valid():
+                self.save(serializer)
+                return Response(serializer.data, status = status.HTTP_200_OK)
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN) 
+    
+    def patch(self, request, *args, **kwargs):
+        self.serializer_class = OrderSerializer
+        order = self.get_object()
+        if is_manager(request.user):
+            if not request.data:
+                return Response({"message": "Request must contain data to update."}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = self.serializer_class(order, data = request.data, partial = True)
+            if serializer.is_valid():
+                self.save(serializer)
+                return Response(serializer.data, status = status.HTTP_200_OK)
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+        elif is_delivery_crew(request.user):
+            if not request.data:
+                return Response({"message": "Request must contain data to update."}, status=status.HTTP_400_BAD_REQUEST)
+            # Only allow update to status field
+            if (len(request.data) == 1 and 'status' not in request.data) or (len(request.data) > 1):
+                return Response({"message": "Only the status field can be updated."}, status = status.HTTP_400_BAD_REQUEST)
+            serializer = self.serializer_class(order, data = request.data, partial = True)
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data, status = status.HTTP_200_OK)
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN) 
+    
+    def delete(self, request, *args, **kwargs):
+        self.serializer_class = OrderSerializer
+        order = self.get_object()
+        if is_manager(request.user):
+            with transaction.atomic():
+                # Only the request that really deletes the order takes it out of the sales aggregates
+                if Order.objects.filter(pk = order.pk).delete()[0]:
+                    # The order items are prefetched with the order
+                    defer_record_order(order.date, order.order_items.all(), sign = -1, key = f'sales:delete:{order.pk}')
+            return Response({"message": "Order deleted successfully"}, status = status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+        
+            
+# Instrumentation
+class TraceBufferView(generics.GenericAPIView):
+    """
+    The slow request traces (timings and SQL) kept by timing.ServerTimingMiddleware in
+    this worker process, newest first. Superusers only.
+    """
+    
+    def get(self, request, *args, **kwargs):
+        if request.user.is_superuser:
+            return Response(list(reversed(timing.traces)))
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+class ReplicaStatusView(generics.GenericAPIView):
+    """
+    Whether a read replica is configured and how far it lags behind the primary (seconds
+    since its last sync, see replica.py). Reads go to the primary above max_lag. Superusers only.
+    """
+    
+    def get(self, request, *args, **kwargs):
+        if request.user.is_superuser:
+            configured = replica_configured()
+            lag = replica_lag() if configured else None
+            return Response({
+                "configured": configured,
+                "lag": lag, # None until the replica is first synced
+                "max_lag": MAX_LAG,
+                "serving_reads": lag is not None and lag <= MAX_LAG,
+            })
+        return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+
+# Extra views (for populating tables)
+class CategoriesListMixin(ReplicaReadMixin, CatalogCacheMixin):
+    """
+    The category list, shared by the sync view and its async (ASGI) read view.
+    GETs read from the replica when there is one (see replica.py).
+    """
+    write_scopes = [CATALOG]
+    queryset = Category.objects.order_by('id') # pagination needs a stable order
+    serializer_class = CategorySerializer
+    cache_query_params = ['category', 'search', 'ordering', 'page'] # the list response depends only on these
+    
+    filter_backends = [SearchFilter, OrderingFilter]
+    filterset_fields = ['slug']
+    ordering_fields = ['slug']
+    search_fields = ['slug']
+    
+    def filter_by_query_params(self, queryset):
+        category = self.request.query_params.get('category')
+        search = self.request.query_params.get('search')
+        
+        if category:
+            queryset = queryset.filter(category__slug = category)
+        if search:
+            queryset = queryset.filter(slug__startswith = search)
+        return queryset
+
+class CategoriesView(CategoriesListMixin, generics.ListCreateAPIView):
+    
+    def get(self, request):
+        self.queryset = self.filter_by_query_params(self.queryset)
+        return super().get(request)
+    
+    def post(self, request):
+        # Check if the user is authenticated
+        if request.user.is_authenticated:
+            if is_manager(request.user) or request.user.is_superuser:
+                return super().post(request)
+            return Response({"message": "You are not authorized"}, status = status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+# Async read views, served in place of the GET of the views above under ASGI (see asyncviews.read_view)
+@throttle_classes([AnonRateThrottle, UserRateThrottle])
+class AsyncMenuItemsView(MenuItemsListMixin, AsyncGenericAPIView):
+    
+    async def get(self, request):
+        self.queryset = self.filter_by_query_params(self.queryset)
+        return await self.alist(request)
+
+class AsyncCategoriesView(CategoriesListMixin, AsyncListModelMixin, AsyncGenericAPIView):
+    
+    async def get(self, request):
+        self.queryset = self.filter_by_query_params(self.queryset)
+        return await self.alist(request)
+
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class AsyncCartItemsView(SparseFieldsetMixin, AsyncGenericAPIView):
+    queryset = Cart.objects.all()
+    serializer_class = CartItemSerializer
+    
+    async def get(self, request):
+        if request.user.is_authenticated:
+            if is_customer(request.user): # the roles were loaded during authentication
+                user_cart_items = self.queryset.filter(user = request.user)
+                return await self.alist_queryset(user_cart_items, paginate=False)
+            return Response({"message": "You are not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"message": "You are not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+
+@throttle_classes([OneCallPerMinute, UserRateThrottle])
+class AsyncOrdersListView(OrdersListMixin, AsyncGenericAPIView):
+    
+    async def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            orders = self.get_orders(request.user)
+            response = await self.alist_queryset(orders)
+            archived = self.archived_orders(request.user, response)
+            if archived is not None and await archived.aexists():
+                self.add_history_link(response)
+            return response
+        return Response({"message": "You are not authenticated."}, status = status.HTTP_403_FORBIDDEN)
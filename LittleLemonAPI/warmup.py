@@ -0,0 +1,201 @@
+"""
+Warm-up of a fresh worker process, before it takes traffic.
+
+The first requests a worker serves otherwise pay for work done once per process:
+importing the views and what they use (DRF, djoser), compiling the URL resolver,
+building the serializer field trees, loading the translation catalogs, connecting to the
+database and filling the catalog, fragment and role caches. warm_up() does all of it up
+front and returns how long each step took.
+
+wsgi.py and asgi.py call warm_up_on_start() once the application is created, which warms
+up when WARMUP_ON_START is set (LITTLELEMON_WARMUP=1, off by default: everything else that
+imports them, a management command or a shell, starts as before). `manage.py warm_up` runs
+it by hand and measures the start-up and the first requests of a cold and of a warmed process.
+
+The catalog responses are cached per host, the WARMUP_HOST setting should name the host
+the clients use.
+"""
+import asyncio
+import inspect
+import io
+import logging
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.urls import Resolver404, URLPattern, URLResolver, get_resolver, resolve
+from django.utils import translation
+from rest_framework.authtoken.models import Token
+from rest_framework.serializers import BaseSerializer
+
+from . import serializers
+from .roles import prime_roles
+from .throttles import bucket_store, unthrottled
+
+logger = logging.getLogger(__name__)
+
+# Anonymous GETs sent through Django's WSGI handler (the middleware, the URL resolver and the
+# views), they fill the catalog and fragment caches and run the request path once
+# (authentication, rendering, error handling). They are not throttled, a worker starting up
+# must not use up the budget of the local address.
+WARMUP_URLS = getattr(settings, "WARMUP_URLS", ["/api/menu-items", "/api/categories", "/api/menu-items/1"])
+# The users, most recently logged in first, whose roles are loaded into the cache
+WARMUP_ROLE_USERS = getattr(settings, "WARMUP_ROLE_USERS", 1000)
+
+
+def warmup_host():
+    host = getattr(settings, "WARMUP_HOST", None)
+    if host:
+        return host
+    # The first allowed host that is a plain name, "localhost" is allowed whenever DEBUG is on
+    return next((host for host in settings.ALLOWED_HOSTS if host != "*" and not host.startswith(".")), "localhost")
+
+
+def iter_routes(patterns, prefix=""):
+    """(path, pattern) of every URL pattern below `patterns`, the path of a nested pattern including its prefix."""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern
+
+
+def sample_path(route):
+    """A path matching `route`, with 1 for every path parameter, or None for a regex route with a real pattern in it."""
+    path = re.sub(r"<(?:\w+:)?\w+>", "1", route.replace("^", "").replace("$", "").replace("\\Z", ""))
+    if re.search(r"[\\()\[\]?*+{}|]", path):
+        return None
+    return "/" + path
+
+
+def build_urls():
+    """Compile the URL resolver, every route's regex, and resolve a path of every route."""
+    resolver = get_resolver()
+    resolver.reverse_dict # compiles the reverse lookup of every pattern
+    resolved = 0
+    for route, pattern in iter_routes(resolver.url_patterns):
+        pattern.pattern.regex
+        path = sample_path(route)
+        if path is None:
+            continue
+        try:
+            resolve(path)
+        except Resolver404: # a parameter 1 does not match (a format suffix)
+            continue
+        resolved += 1
+    return f"{resolved} routes"
+
+
+def build_serializers():
+    """Instantiate every serializer of serializers.py and build its field tree."""
+    built = 0
+    for _, serializer_class in inspect.getmembers(serializers, inspect.isclass):
+        if issubclass(serializer_class, BaseSerializer) and serializer_class.__module__ == serializers.__name__:
+            serializer_class().fields
+            built += 1
+    return f"{built} serializers"
+
+
+def load_translations():
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext("Not found.")
+    translation.deactivate()
+
+
+def connect_databases():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    bucket_store.connection()
+    return ", ".join(connections)
+
+
+def load_roles():
+    user_ids = Token.objects.order_by("-created").values_list("user_id", flat=True)[:WARMUP_ROLE_USERS]
+    return f"{prime_roles(list(user_ids))} users"
+
+
+def request_environ(path, host):
+    """The WSGI environ of an anonymous GET of `path`."""
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+    }
+
+
+def send_requests():
+    handler = WSGIHandler()
+    host = warmup_host()
+    statuses = []
+    with unthrottled():
+        for url in WARMUP_URLS:
+            response = handler(request_environ(url, host), lambda status, headers, exc_info=None: None)
+            try:
+                b"".join(response)
+            finally:
+                response.close() # request_finished, as the server would send it
+            statuses.append(response.status_code)
+    return "status " + " ".join(map(str, statuses))
+
+
+# (name, function), the function returns a short description of what it did, or None
+# The database connections last: the requests close them at the end, as every request
+# does when they are not kept between requests (CONN_MAX_AGE)
+STEPS = [
+    ("urls", build_urls),
+    ("serializers", build_serializers),
+    ("translations", load_translations),
+    ("roles", load_roles),
+    ("requests", send_requests),
+    ("database", connect_databases),
+]
+
+
+def warm_up():
+    """
+    Run the warm-up steps in order. Returns a list of (step, milliseconds, detail); a step that
+    fails is reported (detail is the error) and the others still run, a warm-up never stops a worker.
+    """
+    report = []
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            detail = step()
+        except Exception as exc:
+            detail = f"failed: {exc!r}"
+        report.append((name, (time.perf_counter() - start) * 1000, detail or ""))
+    return report
+
+
+def warm_up_on_start():
+    """The start-up hook of wsgi.py and asgi.py: warm up when WARMUP_ON_START is set, and log the report."""
+    if not getattr(settings, "WARMUP_ON_START", False):
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        report = warm_up()
+    else:
+        # Imported by an ASGI server that already runs its event loop (uvicorn): the sync
+        # ORM and the WSGI handler, which runs the async views with async_to_sync, need a
+        # thread of their own
+        with ThreadPoolExecutor(1) as executor:
+            report = executor.submit(warm_up).result()
+    logger.info(
+        "Warm-up done in %.1f ms: %s",
+        sum(ms for _, ms, _ in report),
+        ", ".join(f"{name} {ms:.1f} ms" + (f" ({detail})" if detail else "") for name, ms, detail in report),
+    )